@@ -7,17 +7,26 @@ import os
 import json
 import time
 import re
+import hashlib
+import hmac
+import sys
+import tempfile
+import random
+import threading
+from datetime import datetime, timezone
 from io import BytesIO
-from flask import Flask, request, render_template, jsonify, session, redirect, url_for, send_file
-from functools import wraps
+from collections import OrderedDict, deque
+from urllib.parse import quote, unquote
+from flask import Flask, request, render_template, jsonify, session, redirect, url_for, send_file, g
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+from functools import wraps, lru_cache
+from contextlib import contextmanager
 import secrets
 import logging
-import markdown2
 
-# Google OAuth imports
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+# Google API errors are caught everywhere; the client, OAuth flow and export
+# libraries are imported on first use (or up front by preload_modules)
 from googleapiclient.errors import HttpError
 
 # Configure logging
@@ -34,7 +43,7 @@ app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour
-app.config['SESSION_REFRESH_EACH_REQUEST'] = True
+app.config['SESSION_REFRESH_EACH_REQUEST'] = True  # Cookie sessions only; server-side sessions extend at half-life
 
 # Google OAuth Configuration
 SCOPES = [
@@ -66,15 +75,1315 @@ else:
     # Local development
     REDIRECT_URI = "http://localhost:5001/oauth2callback"
 
+# ============================================================================
+# STARTUP
+# ============================================================================
+
+def build_service(name, version, **kwargs):
+    """Build a Google API client from the discovery document bundled with
+    googleapiclient, never fetching one over the network"""
+    from googleapiclient.discovery import build
+
+    return build(name, version, static_discovery=True, **kwargs)
+
+
+def preload_modules():
+    """Import cold-path modules and shared export state ahead of requests.
+
+    gunicorn.conf.py calls this in the master after preloading the app, so
+    forked workers share it copy-on-write instead of each paying for the
+    OAuth flow, Drive/Gmail clients, ReportLab and EbookLib on a first request.
+    """
+    started = time.perf_counter()
+
+    import google_auth_oauthlib.flow  # noqa: F401
+    import google.oauth2.credentials  # noqa: F401
+    import google.auth.transport.requests  # noqa: F401
+    import google_auth_httplib2  # noqa: F401
+    import googleapiclient.discovery  # noqa: F401
+    import googleapiclient.http  # noqa: F401
+    import markdown2  # noqa: F401
+    import ebooklib.epub  # noqa: F401
+    import PIL.Image  # noqa: F401
+    import email.header  # noqa: F401
+    import email.utils  # noqa: F401
+    import reportlab.platypus  # noqa: F401
+
+    # Default-layout PDF styles, as most exports use them
+    get_pdf_renderer()
+
+    # One private token directory for all workers
+    credential_manager.store_dir
+
+    logger.info(f"Preloaded export and Google API modules in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+# ============================================================================
+# STATIC ASSETS
+# ============================================================================
+
+# Bundles loaded by the editor and dashboard, as files under static/.
+# tools/build_assets.py concatenates each into a fingerprinted file in
+# static/dist/ with gzip and brotli copies, and records it in the manifest.
+ASSET_BUNDLES = {
+    'editor.css': ['css/variables.css', 'css/reset.css', 'css/animations.css',
+                   'css/buttons.css', 'css/components.css', 'css/editor.css'],
+    'editor.js': ['js/preview.js', 'js/editor.js'],
+    'preview-worker.js': ['js/preview-worker.js'],
+    'dashboard.css': ['css/variables.css', 'css/reset.css', 'css/animations.css',
+                      'css/buttons.css', 'css/components.css', 'css/dashboard.css'],
+    'dashboard.js': ['js/utils.js', 'js/dashboard.js'],
+}
+
+ASSET_DIST_DIR = os.path.join(app.static_folder, 'dist')
+ASSET_MANIFEST_FILE = os.path.join(ASSET_DIST_DIR, 'manifest.json')
+
+# Precompressed copies, in order of preference
+ASSET_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def load_asset_manifest():
+    """Bundle name -> fingerprinted filename from the last build ({} if never built)"""
+    try:
+        with open(ASSET_MANIFEST_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+_asset_manifest = load_asset_manifest()
+_asset_files = set(_asset_manifest.values())
+
+
+@app.template_global()
+def asset_urls(bundle):
+    """URLs that load a bundle: its built file, or its sources if unbuilt or in debug mode"""
+    built = _asset_manifest.get(bundle)
+    if built and not app.debug:
+        return [url_for('static_asset', filename=built)]
+    return [url_for('static', filename=source) for source in ASSET_BUNDLES[bundle]]
+
+
+@app.route('/assets/<filename>')
+def static_asset(filename):
+    """Serve a built bundle, precompressed if the browser accepts it.
+
+    Bundle names change with their content, so they are cached for a year
+    and never revalidated.
+    """
+    import mimetypes
+
+    if filename not in _asset_files:
+        return "Not found", 404
+
+    path = os.path.join(ASSET_DIST_DIR, filename)
+    encoding = None
+    for name, extension in ASSET_ENCODINGS:
+        if name in request.accept_encodings and os.path.exists(path + extension):
+            path, encoding = path + extension, name
+            break
+
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+# ============================================================================
+# COMPRESSION
+# ============================================================================
+
+# Responses smaller than this aren't worth compressing
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+
+# Dynamic responses favour speed; static bundles are precompressed at full strength
+COMPRESS_GZIP_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 5
+
+# Types worth compressing besides text/* (including event streams); downloads (EPUB, PDF, ZIP, images) are compressed already
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/javascript'}
+
+# Largest request body accepted, both as sent and once decompressed
+MAX_REQUEST_BODY_BYTES = 32 * 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BODY_BYTES
+
+
+@lru_cache(maxsize=None)
+def brotli_module():
+    """The brotli package, or None when it isn't installed (gzip only)"""
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def supported_encodings():
+    return ('br', 'gzip') if brotli_module() else ('gzip',)
+
+
+class StreamCompressor:
+    """Incremental gzip or brotli compressor"""
+
+    def __init__(self, encoding):
+        import zlib
+
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli_module().Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data, flush=False):
+        """Compress a chunk; with flush, everything so far can be decoded by the client"""
+        import zlib
+
+        if self.encoding == 'br':
+            out = self._compressor.process(data)
+            return out + self._compressor.flush() if flush else out
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def decompress_body(encoding, data, limit):
+    """Inflate a gzip or brotli body; ValueError if it exceeds `limit` bytes"""
+    if encoding == 'br':
+        decompressor, out = brotli_module().Decompressor(), []
+        size = 0
+        # Feed small slices so a brotli bomb can't balloon far past the limit
+        for start in range(0, len(data), 4096):
+            chunk = decompressor.process(data[start:start + 4096])
+            size += len(chunk)
+            if size > limit:
+                raise ValueError('Request body too large')
+            out.append(chunk)
+        return b''.join(out)
+
+    import zlib
+
+    decompressor = zlib.decompressobj(47)  # gzip or zlib header
+    body = decompressor.decompress(data, limit + 1)
+    if len(body) > limit or decompressor.unconsumed_tail:
+        raise ValueError('Request body too large')
+    return body
+
+
+class CompressionStats:
+    """Bytes in/out and CPU time spent compressing, per direction and encoding.
+
+    Counters are per worker process and reset on restart.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, direction, encoding, raw_bytes, encoded_bytes, cpu_seconds):
+        with self._lock:
+            stats = self._stats.setdefault((direction, encoding), {
+                'count': 0, 'raw_bytes': 0, 'encoded_bytes': 0, 'cpu_seconds': 0.0
+            })
+            stats['count'] += 1
+            stats['raw_bytes'] += raw_bytes
+            stats['encoded_bytes'] += encoded_bytes
+            stats['cpu_seconds'] += cpu_seconds
+
+    def snapshot(self):
+        """{'responses': {encoding: stats}, 'requests': {...}} with ratio and CPU per MB"""
+        report = {'responses': {}, 'requests': {}}
+        with self._lock:
+            for (direction, encoding), stats in self._stats.items():
+                stats = dict(stats)
+                stats['ratio'] = round(stats['raw_bytes'] / stats['encoded_bytes'], 2) if stats['encoded_bytes'] else None
+                stats['cpu_ms_per_mb'] = (round(stats['cpu_seconds'] * 1000 / (stats['raw_bytes'] / 1048576), 2)
+                                          if stats['raw_bytes'] else None)
+                stats['cpu_seconds'] = round(stats['cpu_seconds'], 4)
+                report[direction][encoding] = stats
+        return report
+
+
+compression_stats = CompressionStats()
+
+
+class RequestDecompressor:
+    """WSGI middleware that inflates gzip/brotli request bodies before Flask reads them.
+
+    Failures are left in the environ for reject_bad_request_body to answer,
+    so errors come back as the usual JSON.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding and encoding != 'identity':
+            if encoding not in supported_encodings():
+                environ['jugaadpress.body_error'] = (415, f'Unsupported Content-Encoding: {encoding}')
+            else:
+                limit = app.config['MAX_CONTENT_LENGTH']
+                length = int(environ.get('CONTENT_LENGTH') or 0)
+                # Never read more than the limit, whatever the client declared
+                data = b'' if length > limit else environ['wsgi.input'].read(length or limit + 1)
+                started = time.thread_time()
+                try:
+                    if length > limit or len(data) > limit:
+                        raise ValueError('Request body too large')
+                    body = decompress_body(encoding, data, limit)
+                except ValueError as e:
+                    environ['jugaadpress.body_error'] = (413, str(e))
+                    body = b''
+                except Exception:
+                    environ['jugaadpress.body_error'] = (400, f'Malformed {encoding} request body')
+                    body = b''
+                else:
+                    compression_stats.record('requests', encoding, len(body), len(data),
+                                             time.thread_time() - started)
+                environ['wsgi.input'] = BytesIO(body)
+                environ['CONTENT_LENGTH'] = str(len(body))
+                del environ['HTTP_CONTENT_ENCODING']
+        return self.wsgi_app(environ, start_response)
+
+
+app.wsgi_app = RequestDecompressor(app.wsgi_app)
+
+
+@app.before_request
+def reject_bad_request_body():
+    error = request.environ.get('jugaadpress.body_error')
+    if error:
+        return jsonify({'error': error[1]}), error[0]
+
+
+def compress_stream(chunks, compressor):
+    """Compress a streamed body chunk by chunk, flushing so each part arrives promptly"""
+    raw_bytes = encoded_bytes = 0
+    cpu_seconds = 0.0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            started = time.thread_time()
+            out = compressor.compress(chunk, flush=True)
+            cpu_seconds += time.thread_time() - started
+            raw_bytes += len(chunk)
+            encoded_bytes += len(out)
+            yield out
+        out = compressor.finish()
+        encoded_bytes += len(out)
+        yield out
+    finally:
+        # Also reached when the client goes away mid-stream
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        compression_stats.record('responses', compressor.encoding, raw_bytes, encoded_bytes, cpu_seconds)
+
+
+@app.after_request
+def compress_response(response):
+    """gzip or brotli text and JSON responses for clients that accept it"""
+    # HEAD goes through the same negotiation, so it reports what GET would send
+    if (response.direct_passthrough  # send_file: downloads and precompressed bundles
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype.startswith('text/') or response.mimetype in COMPRESSIBLE_MIMETYPES)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(supported_encodings())
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, StreamCompressor(encoding))
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        started = time.thread_time()
+        compressor = StreamCompressor(encoding)
+        encoded = compressor.compress(data) + compressor.finish()
+        compression_stats.record('responses', encoding, len(data), len(encoded), time.thread_time() - started)
+        response.set_data(encoded)
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# ============================================================================
+# SESSIONS
+# ============================================================================
+
+# Where sessions live: 'sqlite' (default), 'file', or 'cookie' for Flask's
+# signed-cookie sessions. Server-side backends keep only an opaque ID in the cookie.
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sqlite').lower()
+SESSION_STORE_PATH = os.environ.get('SESSION_STORE_PATH') or os.path.join(
+    tempfile.gettempdir(), 'jugaadpress-sessions.db' if SESSION_BACKEND == 'sqlite' else 'jugaadpress-sessions')
+
+# How often each worker deletes expired sessions
+SESSION_SWEEP_INTERVAL = 300
+
+SESSION_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class SessionStore:
+    """Storage for server-side sessions; subclass to add a backend"""
+
+    def load(self, sid):
+        """Return (data, expires_at) for a session, or None"""
+        raise NotImplementedError
+
+    def save(self, sid, data, expires_at):
+        raise NotImplementedError
+
+    def touch(self, sid, expires_at):
+        """Extend a session without rewriting its data"""
+        loaded = self.load(sid)
+        if loaded:
+            self.save(sid, loaded[0], expires_at)
+
+    def delete(self, sid):
+        raise NotImplementedError
+
+    def sweep(self, now):
+        """Delete sessions that expired before `now`; returns how many"""
+        raise NotImplementedError
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a local SQLite database, shared by all workers on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS sessions '
+                       '(sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)')
+            db.execute('CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)')
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads (or forks)
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            import sqlite3
+
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def load(self, sid):
+        row = self._connection().execute(
+            'SELECT data, expires_at FROM sessions WHERE sid = ?', (sid,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def save(self, sid, data, expires_at):
+        with self._connection() as db:
+            db.execute('INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)',
+                       (sid, json.dumps(data), expires_at))
+
+    def touch(self, sid, expires_at):
+        with self._connection() as db:
+            db.execute('UPDATE sessions SET expires_at = ? WHERE sid = ?', (expires_at, sid))
+
+    def delete(self, sid):
+        with self._connection() as db:
+            db.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def sweep(self, now):
+        with self._connection() as db:
+            return db.execute('DELETE FROM sessions WHERE expires_at < ?', (now,)).rowcount
+
+
+class FileSessionStore(SessionStore):
+    """Sessions as one JSON file each in a directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, f"{sid}.json")
+
+    def load(self, sid):
+        try:
+            with open(self._path(sid)) as f:
+                stored = json.load(f)
+            return stored['data'], stored['expires_at']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, sid, data, expires_at):
+        path = self._path(sid)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'data': data, 'expires_at': expires_at}, f)
+        os.replace(tmp_path, path)
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except OSError:
+            pass
+
+    def sweep(self, now):
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            sid = name[:-len('.json')]
+            loaded = self.load(sid)
+            if loaded is None or loaded[1] < now:
+                self.delete(sid)
+                removed += 1
+        return removed
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session data kept server-side under an opaque ID"""
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.new = sid is None
+        self.modified = False
+        self.rotate = False
+
+    def regenerate(self):
+        """Move the session to a fresh ID (call after sign-in)"""
+        self.rotate = True
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface backed by a SessionStore.
+
+    The cookie carries only the session ID. Data is written when it changes,
+    and the expiry is extended once half the lifetime has passed, so most
+    requests neither serialize nor write the session.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._last_sweep = 0
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and SESSION_ID_RE.match(sid):
+            loaded = self.store.load(sid)
+            if loaded and loaded[1] > time.time():
+                return ServerSideSession(loaded[0], sid=sid, expires_at=loaded[1])
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        now = time.time()
+        if now - self._last_sweep > SESSION_SWEEP_INTERVAL:
+            self._last_sweep = now
+            try:
+                removed = self.store.sweep(now)
+                if removed:
+                    logger.info(f"Swept {removed} expired sessions")
+            except Exception as e:
+                logger.warning(f"Session sweep failed: {e}")
+
+        cookie_name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.sid and session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(cookie_name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        if session.rotate and session.sid:
+            self.store.delete(session.sid)
+            session.sid = None
+
+        if session.sid is None:
+            session.sid = secrets.token_hex(32)
+        elif not session.modified and session.expires_at - now > lifetime / 2:
+            return
+
+        session.expires_at = now + lifetime
+        if session.modified:
+            self.store.save(session.sid, dict(session), session.expires_at)
+        else:
+            self.store.touch(session.sid, session.expires_at)
+
+        response.set_cookie(
+            cookie_name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+        response.vary.add('Cookie')
+
+
+if SESSION_BACKEND == 'sqlite':
+    app.session_interface = ServerSideSessionInterface(SQLiteSessionStore(SESSION_STORE_PATH))
+elif SESSION_BACKEND == 'file':
+    app.session_interface = ServerSideSessionInterface(FileSessionStore(SESSION_STORE_PATH))
+
+# ============================================================================
+# LINK INDEX
+# ============================================================================
+
+# Internal page links as inserted by the editor: [Page Name](./Page%20Name.md)
+INTERNAL_LINK_RE = re.compile(r'(\[[^\]]*\]\(\./)([^)\s]+\.md)(\))')
+
+# Each page's outbound links are kept in its manifest entry ('links'), so the
+# link index costs no Drive calls of its own. Links to a renamed page are
+# rewritten in the background, by a small pool in each worker.
+LINK_REWRITE_WORKERS = 1
+
+_link_rewriter = None
+_link_rewriter_pid = None
+_link_rewriter_lock = threading.Lock()
+
+
+def encode_page_link(filename):
+    """URL-encode a page filename the same way the editor builds links"""
+    return quote(filename, safe="/-_.!~*'")
+
+
+def extract_page_links(content):
+    """Return the sorted internal page links found in markdown content"""
+    return sorted({unquote(m.group(2)) for m in INTERNAL_LINK_RE.finditer(content or '')})
+
+
+def rewrite_page_links(content, old_filename, new_filename):
+    """Point every internal link to old_filename at new_filename instead"""
+    def _replace(match):
+        if unquote(match.group(2)) != old_filename:
+            return match.group(0)
+        return f"{match.group(1)}{encode_page_link(new_filename)}{match.group(3)}"
+
+    return INTERNAL_LINK_RE.sub(_replace, content)
+
+
+def build_backlinks(links):
+    """Invert a {page: [targets]} map into {target: [pages linking to it]}"""
+    backlinks = {}
+    for page, targets in links.items():
+        for target in targets:
+            backlinks.setdefault(target, []).append(page)
+    for sources in backlinks.values():
+        sources.sort()
+    return backlinks
+
+
+def start_link_rewrite(dm, book_name, old_filename, new_filename):
+    """Rewrite links to a renamed page in the background; editors hear of
+    each rewritten page through the change feed"""
+    global _link_rewriter, _link_rewriter_pid
+    with _link_rewriter_lock:
+        if _link_rewriter_pid != os.getpid():
+            # Threads don't survive a fork; start a pool in each worker
+            from concurrent.futures import ThreadPoolExecutor
+
+            _link_rewriter = ThreadPoolExecutor(max_workers=LINK_REWRITE_WORKERS, thread_name_prefix='links')
+            _link_rewriter_pid = os.getpid()
+
+    def _run():
+        try:
+            dm.rewrite_inbound_links(book_name, old_filename, new_filename)
+        except Exception as e:
+            logger.error(f"Rewriting links to {new_filename} failed: {e}")
+
+    _link_rewriter.submit(_run)
+
+
+def find_broken_links(links):
+    """Return {page: [targets]} for links pointing at pages that don't exist"""
+    broken = {}
+    for page, targets in links.items():
+        missing = [t for t in targets if t not in links]
+        if missing:
+            broken[page] = missing
+    return broken
+
+
+# ============================================================================
+# BOOK MANIFEST
+# ============================================================================
+
+# Drive file listing each book's pages, maintained by DriveManager on every
+# page create/rename/delete/write so reads don't need folder listings
+MANIFEST_FILE = '.book_index.json'
+
+# How long a cached manifest is used before checking its Drive version
+MANIFEST_CHECK_TTL = 5  # seconds
+
+# How often a manifest is reconciled against a folder listing, to pick up
+# pages changed outside the app
+MANIFEST_VERIFY_INTERVAL = 300  # seconds
+
+# How long book folder IDs are cached
+BOOK_ID_TTL = 60  # seconds
+
+# Times a manifest change is reapplied when another worker saved the manifest first
+MANIFEST_SAVE_ATTEMPTS = 4
+
+# Lock files serializing manifest changes between workers on this machine
+MANIFEST_LOCK_DIR = os.environ.get('MANIFEST_LOCK_DIR') or os.path.join(tempfile.gettempdir(), 'jugaadpress-locks')
+
+# Per-book locks for this worker's threads, keyed by book folder ID
+_book_locks = {}
+_book_locks_lock = threading.Lock()
+
+# In-process manifests keyed by book folder ID:
+# {'file_id', 'drive_version', 'checked_at', 'verified_at', 'data'}
+_manifest_cache = {}
+
+# Book folder IDs keyed by (root folder ID, book name): (book_id, cached_at)
+_book_id_cache = {}
+
+# Root folder IDs keyed by user: (root_id, cached_at)
+ROOT_FOLDER_TTL = 600
+_root_folder_cache = {}
+
+# Settings files keyed by (parent folder ID, filename): (settings, cached_at)
+SETTINGS_TTL = 60
+_settings_cache = {}
+
+# Recently read or prefetched page content, keyed by file ID and checked
+# against the manifest md5 so edits made through the app are never stale
+PAGE_CACHE_TTL = 120
+PAGE_CACHE_MAX_BYTES = 8 * 1024 * 1024
+_page_cache = OrderedDict()
+_page_cache_lock = threading.Lock()
+
+
+def cached_page(file_id, md5):
+    """Cached content of a page if it matches `md5` and is fresh, else None"""
+    with _page_cache_lock:
+        entry = _page_cache.get(file_id)
+        if not entry or entry[0] != md5 or time.time() - entry[2] > PAGE_CACHE_TTL:
+            return None
+        _page_cache.move_to_end(file_id)
+        return entry[1]
+
+
+def cache_page(file_id, md5, content):
+    """Remember page content, evicting least recently used pages over budget"""
+    with _page_cache_lock:
+        _page_cache[file_id] = (md5, content, time.time())
+        _page_cache.move_to_end(file_id)
+        total = sum(len(entry[1]) for entry in _page_cache.values())
+        while total > PAGE_CACHE_MAX_BYTES and len(_page_cache) > 1:
+            _, evicted = _page_cache.popitem(last=False)
+            total -= len(evicted[1])
+
+
+def book_lock(book_id):
+    """This worker's lock for a book's cached manifest; held while it's loaded or changed"""
+    with _book_locks_lock:
+        lock = _book_locks.get(book_id)
+        if lock is None:
+            lock = _book_locks[book_id] = threading.RLock()
+        return lock
+
+
+@contextmanager
+def manifest_lock(book_id):
+    """Hold the locks for changing a book's manifest: this worker's book lock,
+    then a file lock shared with the other workers on this machine.
+
+    Other instances aren't covered; _update_manifest's version check
+    catches their changes.
+    """
+    with book_lock(book_id):
+        try:
+            import fcntl
+        except ImportError:
+            # No flock (Windows dev servers): rely on the version check alone
+            yield
+            return
+
+        os.makedirs(MANIFEST_LOCK_DIR, exist_ok=True)
+        name = hashlib.sha256(book_id.encode('utf-8')).hexdigest()[:32]
+        with open(os.path.join(MANIFEST_LOCK_DIR, f"{name}.lock"), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def copy_manifest(data):
+    """Copy of manifest data that can be changed without touching the original"""
+    return {
+        'version': data.get('version', 1),
+        'pages': {name: dict(entry) for name, entry in data['pages'].items()},
+        'order': list(data['order'])
+    }
+
+
+def drive_query_string(value):
+    """Quote a value for a Drive search query"""
+    return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def page_revision(content):
+    """Revision of page content: its md5, as Drive reports in md5Checksum"""
+    return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+
+def count_words(content):
+    """Word count of a page's markdown"""
+    return len(content.split())
+
+
+def insert_page_order(order, page, after=None):
+    """Insert a page into a chapter order, in place.
+
+    With `after` the page goes right behind that page (or first when
+    `after` is ''). Otherwise it lands before the first page whose name
+    sorts after it, so books named 01_, 02_, ... keep their filename order.
+    """
+    if after is not None:
+        index = order.index(after) + 1 if after in order else (0 if after == '' else len(order))
+    else:
+        index = next((i for i, name in enumerate(order) if name > page), len(order))
+    order.insert(index, page)
+    return order
+
+
+# ============================================================================
+# DRIVE READ COALESCING
+# ============================================================================
+
+class SingleFlight:
+    """Lets concurrent identical Drive reads share one call.
+
+    The first caller for a key makes the call; callers arriving while it's
+    in flight wait for it and get the same result, or the same exception.
+    Keys are (scope, kind, ...) with a folder ID as the scope: forget(scope)
+    after a write makes later reads start a fresh call instead of joining
+    one that began before the write.
+    """
+
+    def __init__(self):
+        self._flights = {}   # key -> {'done': Event, 'result', 'error'}
+        self._counts = {}    # kind -> {'calls', 'collapsed'}
+        self._invalidated = 0
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Result of func(), shared with any identical call already in flight"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = {'done': threading.Event(), 'result': None, 'error': None}
+            counts = self._counts.setdefault(key[1], {'calls': 0, 'collapsed': 0})
+            counts['calls' if leader else 'collapsed'] += 1
+
+        if not leader:
+            flight['done'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return flight['result']
+
+        try:
+            flight['result'] = func()
+            return flight['result']
+        except BaseException as e:
+            flight['error'] = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight['done'].set()
+
+    def forget(self, scope):
+        """Stop new callers joining reads in `scope` that are already in flight"""
+        with self._lock:
+            stale = [key for key in self._flights if key[0] == scope]
+            for key in stale:
+                del self._flights[key]
+            self._invalidated += len(stale)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'by_kind': {kind: dict(counts) for kind, counts in self._counts.items()},
+                'calls': sum(counts['calls'] for counts in self._counts.values()),
+                'collapsed': sum(counts['collapsed'] for counts in self._counts.values()),
+                'invalidated': self._invalidated
+            }
+
+
+# In-flight Drive reads of every user this worker serves
+drive_reads = SingleFlight()
+
+
+# ============================================================================
+# CHANGE FEED
+# ============================================================================
+
+# Recent page events kept per book, so a reconnecting editor can catch up
+CHANGE_FEED_BACKLOG = 100
+
+# Keep-alive comment interval for idle event streams (proxies drop silent ones)
+CHANGE_FEED_HEARTBEAT = 15  # seconds
+
+# How often an open stream checks Drive for changes made by other workers
+# or devices. Edits made directly in Drive surface when the manifest is next
+# reconciled (MANIFEST_VERIFY_INTERVAL).
+CHANGE_FEED_POLL = 20  # seconds
+
+# Streams are closed after this long; browsers reconnect with Last-Event-ID
+CHANGE_FEED_MAX_AGE = 120  # seconds
+
+# Open streams per worker. Each holds one of the worker's threads, so leave
+# most of them (GUNICORN_THREADS) for ordinary requests
+CHANGE_FEED_MAX_STREAMS = int(os.environ.get('CHANGE_FEED_MAX_STREAMS')
+                              or max(1, int(os.environ.get('GUNICORN_THREADS') or 16) // 2))
+
+# When a worker has no stream to spare, the browser is told to try again this much later
+CHANGE_FEED_BUSY_RETRY = 30  # seconds
+
+
+def manifest_changes(old, new):
+    """Page events between two versions of a book manifest.
+
+    Events are dicts with a 'type' of created, updated, renamed, deleted or
+    order. Renames are recognised by the Drive file ID staying the same.
+    """
+    old_pages, new_pages = old.get('pages', {}), new.get('pages', {})
+    names_by_id = {page['id']: name for name, page in old_pages.items()}
+    removed = set(old_pages) - set(new_pages)
+    events = []
+
+    for name, page in new_pages.items():
+        previous = old_pages.get(name)
+        if previous is None:
+            old_name = names_by_id.get(page['id'])
+            if old_name in removed:
+                removed.discard(old_name)
+                events.append({'type': 'renamed', 'page': old_name, 'to': name, 'revision': page.get('md5')})
+            else:
+                events.append({'type': 'created', 'page': name, 'revision': page.get('md5')})
+        elif previous.get('md5') != page.get('md5'):
+            events.append({'type': 'updated', 'page': name, 'revision': page.get('md5')})
+
+    for name in sorted(removed):
+        events.append({'type': 'deleted', 'page': name})
+    if old.get('order') != new.get('order'):
+        events.append({'type': 'order', 'order': list(new.get('order', []))})
+    return events
+
+
+class ChangeFeed:
+    """Page change events per book, for the editor's event stream.
+
+    Manifest changes are published here whether they come from this
+    worker's own writes or were detected on Drive. Event IDs carry a
+    per-process epoch, so IDs from another worker (or before a restart)
+    are recognised and answered with a full resync instead.
+    """
+
+    def __init__(self, backlog):
+        self.backlog = backlog
+        self._events = {}   # book_id -> deque of (seq, event)
+        self._dropped = {}  # book_id -> newest seq that fell out of the backlog
+        self._seq = 0
+        self._epoch = None
+        self._epoch_pid = None
+        self._changed = threading.Condition()
+
+    @property
+    def epoch(self):
+        # Workers fork from one master; give each its own epoch
+        if self._epoch_pid != os.getpid():
+            self._epoch = secrets.token_hex(4)
+            self._epoch_pid = os.getpid()
+        return self._epoch
+
+    def position(self):
+        """Sequence number of the newest event, in any book"""
+        with self._changed:
+            return self._seq
+
+    def parse_event_id(self, event_id):
+        """Sequence number from a Last-Event-ID, or None if it isn't ours"""
+        epoch, _, seq = (event_id or '').partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def event_id(self, seq):
+        return f"{self.epoch}-{seq}"
+
+    def publish(self, book_id, events):
+        """Record events for a book and wake its streams"""
+        if not events:
+            return
+        with self._changed:
+            queue = self._events.setdefault(book_id, deque())
+            for event in events:
+                self._seq += 1
+                queue.append((self._seq, event))
+                if len(queue) > self.backlog:
+                    self._dropped[book_id] = queue.popleft()[0]
+            self._changed.notify_all()
+
+    def since(self, book_id, seq):
+        """Events for a book after `seq`, or None if some were already dropped"""
+        with self._changed:
+            if self._dropped.get(book_id, 0) > seq:
+                return None
+            return [(s, event) for s, event in self._events.get(book_id, ()) if s > seq]
+
+    def wait(self, book_id, seq, timeout):
+        """Block until a book has events after `seq` (or timeout); returns them"""
+        def _newer():
+            queue = self._events.get(book_id)
+            return bool(queue) and queue[-1][0] > seq
+
+        with self._changed:
+            self._changed.wait_for(_newer, timeout)
+        return self.since(book_id, seq)
+
+
+change_feed = ChangeFeed(CHANGE_FEED_BACKLOG)
+change_feed_streams = threading.BoundedSemaphore(CHANGE_FEED_MAX_STREAMS)
+
+
+# ============================================================================
+# CREDENTIALS
+# ============================================================================
+
+# Access tokens are refreshed in the background once they are this close to
+# expiring (google-auth itself only refreshes inside a request, 3m45s out)
+TOKEN_REFRESH_MARGIN = 600
+
+# How often the background refresher looks for tokens about to expire
+TOKEN_REFRESH_INTERVAL = 60
+
+# Users idle this long are dropped from the in-process credential cache
+CREDENTIALS_IDLE_TTL = 3600
+
+# Refreshed access tokens are written here so other workers reuse them. It must be a
+# directory only this user can read; by default a private one is made at startup
+TOKEN_STORE_DIR = os.environ.get('TOKEN_STORE_DIR')
+
+# Idle Google API connections kept open per user for the next request, from any thread
+HTTP_POOL_IDLE = 8
+
+HTTP_TIMEOUT = 120  # seconds
+
+
+def credentials_to_dict(credentials):
+    """Session form of OAuth credentials, including when the token expires"""
+    return {
+        'token': credentials.token,
+        'refresh_token': credentials.refresh_token,
+        'token_uri': credentials.token_uri,
+        'client_id': credentials.client_id,
+        'client_secret': credentials.client_secret,
+        'scopes': credentials.scopes,
+        'expiry': credentials.expiry.isoformat() if credentials.expiry else None
+    }
+
+
+def credentials_from_dict(data):
+    """Credentials from their session form (older sessions have no expiry)"""
+    from google.oauth2.credentials import Credentials
+
+    info = dict(data)
+    expiry = info.pop('expiry', None)
+    credentials = Credentials(**info)
+    if expiry:
+        credentials.expiry = datetime.fromisoformat(expiry)
+    return credentials
+
+
+class AuthorizedHttpPool:
+    """Thread-safe stand-in for an authorized httplib2.Http.
+
+    httplib2 connections can't be used from two threads at once, so each
+    request borrows an idle AuthorizedHttp (opening one if none is free)
+    and hands it back when done. Open connections are reused by whichever
+    thread makes the next call; at most HTTP_POOL_IDLE are kept.
+    """
+
+    def __init__(self, credentials, idle=HTTP_POOL_IDLE):
+        self.credentials = credentials
+        self.idle = idle
+        self.opened = 0
+        self._free = []
+        self._lock = threading.Lock()
+
+    def request(self, *args, **kwargs):
+        http = self._borrow()
+        try:
+            response = http.request(*args, **kwargs)
+        except BaseException:
+            # Don't hand out a connection left in an unknown state
+            http.close()
+            raise
+        self._give_back(http)
+        return response
+
+    def close(self):
+        with self._lock:
+            free, self._free = self._free, []
+        for http in free:
+            http.close()
+
+    def _borrow(self):
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+            self.opened += 1
+
+        import httplib2
+        import google_auth_httplib2
+
+        http = httplib2.Http(timeout=HTTP_TIMEOUT)
+        # Resumable uploads (Gmail sends) answer 308 without a Location; it isn't a redirect
+        http.redirect_codes = http.redirect_codes - {308}
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=http)
+
+    def _give_back(self, http):
+        with self._lock:
+            if len(self._free) < self.idle:
+                self._free.append(http)
+                return
+        http.close()
+
+
+class UserCredentials:
+    """One user's OAuth credentials and the Google API clients built on them.
+
+    Clients are shared by every thread: they send requests through an
+    AuthorizedHttpPool, so Drive and Gmail calls from concurrent requests
+    (and from export and change-feed threads) share open connections and
+    token refreshes without sharing a connection at the same time.
+    """
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+        self.http = AuthorizedHttpPool(credentials)
+        self._services = {}
+
+    def service(self, name, version):
+        """API client for this user, e.g. service('gmail', 'v1'); safe to use from any thread"""
+        key = (name, version)
+        service = self._services.get(key)
+        if service is None:
+            service = self._services.setdefault(key, build_service(name, version, http=self.http))
+        return service
+
+    def drive_manager(self, root_folder_id=None):
+        """A DriveManager on this user's shared Drive client"""
+        dm = DriveManager(self.credentials, service=self.service('drive', 'v3'))
+        dm.root_folder_id = root_folder_id
+        return dm
+
+    def expires_in(self):
+        """Seconds until the access token expires, or None if unknown"""
+        if not self.credentials.expiry:
+            return None
+        # google-auth keeps expiry as naive UTC
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (self.credentials.expiry - now).total_seconds()
+
+    def refresh(self, margin=0):
+        """Refresh the token if it expires within `margin` seconds; True if it was refreshed"""
+        from google.auth.transport.requests import Request
+
+        with self.lock:
+            remaining = self.expires_in()
+            if (remaining is not None and remaining > margin) or not self.credentials.refresh_token:
+                return False
+            self.credentials.refresh(Request())
+            return True
+
+
+class CredentialManager:
+    """Per-user credentials shared by every request a worker serves.
+
+    A daemon thread refreshes tokens ahead of expiry and persists them to
+    a private store directory, so requests rarely pay for a refresh round
+    trip. Token files are named by an HMAC of the user key under the app's
+    secret key, so they can't be found from an email address.
+    """
+
+    def __init__(self, store_dir=None):
+        self._store_dir_setting = store_dir
+        self._store_dir = False  # not resolved yet
+        self._store_dir_lock = threading.Lock()
+        self._users = {}
+        self._lock = threading.Lock()
+        self._refresher_pid = None
+
+    def get(self, user_key, session_credentials):
+        """Credentials for a user, seeded from their session on first use"""
+        self._ensure_refresher()
+        with self._lock:
+            user = self._users.get(user_key)
+            if user is None:
+                credentials = credentials_from_dict(session_credentials)
+                self._adopt_stored_token(user_key, credentials)
+                user = self._users[user_key] = UserCredentials(credentials)
+        user.last_used = time.time()
+
+        # Only block on a refresh when the token is already (nearly) unusable
+        if user.credentials.expired and user.refresh(TOKEN_REFRESH_MARGIN):
+            self._save_token(user_key, user.credentials)
+        return user
+
+    def register(self, user_key, credentials):
+        """Replace a user's credentials after a fresh sign-in"""
+        with self._lock:
+            self._users[user_key] = UserCredentials(credentials)
+        self._save_token(user_key, credentials)
+
+    def forget(self, user_key):
+        """Drop a user's cached credentials and stored token"""
+        with self._lock:
+            self._users.pop(user_key, None)
+        if not self.store_dir:
+            return
+        try:
+            os.remove(self._token_path(user_key))
+        except OSError:
+            pass
+
+    @property
+    def store_dir(self):
+        """The token directory, made on first use; None keeps tokens in memory.
+
+        preload_modules() resolves it in the gunicorn master, so every worker
+        forks with the same directory.
+        """
+        if self._store_dir is False:
+            with self._store_dir_lock:
+                if self._store_dir is False:
+                    self._store_dir = self._private_store_dir(self._store_dir_setting)
+        return self._store_dir
+
+    @staticmethod
+    def _private_store_dir(store_dir):
+        """A token directory only this user can use, or None to keep tokens in memory"""
+        if not store_dir:
+            return tempfile.mkdtemp(prefix='jugaadpress-tokens-')
+        try:
+            os.makedirs(store_dir, mode=0o700, exist_ok=True)
+            info = os.stat(store_dir)
+        except OSError as e:
+            logger.warning(f"Token store unavailable, keeping tokens in memory: {e}")
+            return None
+        if info.st_uid != os.getuid() or info.st_mode & 0o077:
+            logger.warning(f"Token store {store_dir} is open to other users, keeping tokens in memory")
+            return None
+        return store_dir
+
+    def _token_path(self, user_key):
+        secret_key = app.secret_key.encode('utf-8') if isinstance(app.secret_key, str) else app.secret_key
+        name = hmac.new(secret_key, user_key.encode('utf-8'), hashlib.sha256).hexdigest()
+        return os.path.join(self.store_dir, f"{name}.json")
+
+    def _adopt_stored_token(self, user_key, credentials):
+        """Use a token refreshed by another worker if it outlives the session's"""
+        if not self.store_dir:
+            return
+        try:
+            with open(self._token_path(user_key)) as f:
+                stored = json.load(f)
+            expiry = datetime.fromisoformat(stored['expiry'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        if credentials.expiry is None or expiry > credentials.expiry:
+            credentials.token = stored['token']
+            credentials.expiry = expiry
+
+    def _save_token(self, user_key, credentials):
+        """Persist an access token (never the refresh token) for other workers"""
+        if not self.store_dir or not credentials.token or not credentials.expiry:
+            return
+        try:
+            path = self._token_path(user_key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'token': credentials.token, 'expiry': credentials.expiry.isoformat()}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not persist refreshed token: {e}")
+
+    def _ensure_refresher(self):
+        """Start the background refresher (again, after a fork)"""
+        if self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+            threading.Thread(target=self._refresh_loop, name='token-refresher', daemon=True).start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(TOKEN_REFRESH_INTERVAL)
+            now = time.time()
+            with self._lock:
+                users = list(self._users.items())
+                for user_key, user in users:
+                    if now - user.last_used > CREDENTIALS_IDLE_TTL:
+                        del self._users[user_key]
+
+            for user_key, user in users:
+                if now - user.last_used > CREDENTIALS_IDLE_TTL:
+                    continue
+                try:
+                    if user.refresh(TOKEN_REFRESH_MARGIN):
+                        self._save_token(user_key, user.credentials)
+                        logger.info("Refreshed access token ahead of expiry")
+                except Exception as e:
+                    logger.warning(f"Background token refresh failed: {e}")
+
+
+credential_manager = CredentialManager(TOKEN_STORE_DIR)
+
+
 # ============================================================================
 # HELPER CLASSES
 # ============================================================================
 
 class DriveManager:
-    """Manages Google Drive operations for a user"""
+    """Manages Google Drive operations for a user.
 
-    def __init__(self, credentials):
-        self.service = build('drive', 'v3', credentials=credentials)
+    Safe to use from several threads when built on a thread-safe service
+    (UserCredentials.drive_manager()).
+    """
+
+    def __init__(self, credentials, service=None):
+        self.service = service or build_service('drive', 'v3', credentials=credentials)
         self.root_folder_id = None
 
     def _retry_on_error(self, func, *args, **kwargs):
@@ -156,6 +1465,8 @@ class DriveManager:
                 if folder['name'].startswith('.'):
                     continue
 
+                _book_id_cache[(self.root_folder_id, folder['name'])] = (folder['id'], time.time())
+
                 # Count pages in this book
                 page_count = self._count_pages_in_folder(folder['id'])
 
@@ -171,8 +1482,47 @@ class DriveManager:
 
         return self._retry_on_error(_execute)
 
+    def list_export_files(self, book_name=None, modified_since=None):
+        """Files to back up, as (path, file) pairs; files carry id and modifiedTime.
+
+        Covers global settings plus every book's pages, settings and chapter
+        order, or just one book's when `book_name` is given (None if it
+        doesn't exist). With `modified_since` (RFC 3339, UTC) only files
+        changed after it are listed.
+        """
+        def _execute():
+            time_filter = f" and modifiedTime > '{modified_since}'" if modified_since else ''
+            fields = 'id, name, modifiedTime'
+            files = []
+
+            if book_name:
+                book_id = self._get_book_id(book_name)
+                if not book_id:
+                    return None
+                folders = [{'id': book_id, 'name': book_name}]
+            else:
+                query = f"'{self.root_folder_id}' in parents and name='.user_settings.json' and trashed=false"
+                files.extend((f['name'], f) for f in self._list_all_files(query + time_filter, fields))
+
+                query = f"'{self.root_folder_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
+                folders = [f for f in self._list_all_files(query, 'id, name', order_by='name')
+                           if not f['name'].startswith('.')]
+
+            for folder in folders:
+                query = f"'{folder['id']}' in parents and trashed=false"
+                for f in self._list_all_files(query + time_filter, fields, order_by='name'):
+                    if f['name'].endswith('.md') or f['name'] in EXPORT_BOOK_FILES:
+                        files.append((f"{folder['name']}/{f['name']}", f))
+            return files
+
+        return self._retry_on_error(_execute)
+
     def _count_pages_in_folder(self, folder_id):
         """Count .md files in a folder"""
+        cached = _manifest_cache.get(folder_id)
+        if cached:
+            return len(cached['data']['pages'])
+
         query = f"'{folder_id}' in parents and name contains '.md' and trashed=false"
 
         results = self.service.files().list(
@@ -193,6 +1543,8 @@ class DriveManager:
             'cover': None
         }
         self._write_json_file(f'.book_settings.json', settings, book_id)
+        _book_id_cache[(self.root_folder_id, book_name)] = (book_id, time.time())
+        drive_reads.forget(self.root_folder_id)
 
         return book_id
 
@@ -207,6 +1559,11 @@ class DriveManager:
             body={'trashed': True}
         ).execute()
 
+        _book_id_cache.pop((self.root_folder_id, book_name), None)
+        _manifest_cache.pop(book_id, None)
+        _settings_cache.pop((book_id, '.book_settings.json'), None)
+        drive_reads.forget(self.root_folder_id)
+        drive_reads.forget(book_id)
         return True
 
     def rename_book(self, old_name, new_name):
@@ -224,29 +1581,44 @@ class DriveManager:
             body={'name': new_name}
         ).execute()
 
+        _book_id_cache.pop((self.root_folder_id, old_name), None)
+        _book_id_cache[(self.root_folder_id, new_name)] = (book_id, time.time())
+        drive_reads.forget(self.root_folder_id)
+
         logger.info(f"Renamed book: {old_name} -> {new_name}")
         return True
 
     def _get_book_id(self, book_name):
         """Get folder ID for a book"""
-        query = f"name='{book_name}' and '{self.root_folder_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
+        key = (self.root_folder_id, book_name)
+        cached = _book_id_cache.get(key)
+        if cached and time.time() - cached[1] < BOOK_ID_TTL:
+            return cached[0]
 
-        results = self.service.files().list(
-            q=query,
-            spaces='drive',
-            fields='files(id)'
-        ).execute()
+        def _lookup():
+            query = f"name='{book_name}' and '{self.root_folder_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
 
-        folders = results.get('files', [])
-        return folders[0]['id'] if folders else None
+            results = self.service.files().list(
+                q=query,
+                spaces='drive',
+                fields='files(id)'
+            ).execute()
 
-    def get_book_settings(self, book_name):
-        """Read book settings from .book_settings.json"""
+            folders = results.get('files', [])
+            return folders[0]['id'] if folders else None
+
+        book_id = drive_reads.do((self.root_folder_id, 'book_id', book_name), _lookup)
+        if book_id:
+            _book_id_cache[key] = (book_id, time.time())
+        return book_id
+
+    def get_book_settings(self, book_name):
+        """Read book settings from .book_settings.json"""
         book_id = self._get_book_id(book_name)
         if not book_id:
             return {}
 
-        return self._read_json_file('.book_settings.json', book_id) or {'title': book_name}
+        return self._read_settings('.book_settings.json', book_id) or {'title': book_name}
 
     def save_book_settings(self, book_name, settings):
         """Save book settings"""
@@ -254,15 +1626,88 @@ class DriveManager:
         if not book_id:
             return False
 
-        return self._write_json_file('.book_settings.json', settings, book_id)
+        return self._write_settings('.book_settings.json', settings, book_id)
+
+    def get_delivery_record(self, book_name):
+        """Read the last Kindle delivery of a book from .book_delivery.json"""
+        book_id = self._get_book_id(book_name)
+        if not book_id:
+            return {}
+
+        return self._read_json_file(DELIVERY_FILE, book_id) or {}
+
+    def save_delivery_record(self, book_name, record):
+        """Save the last Kindle delivery of a book"""
+        book_id = self._get_book_id(book_name)
+        if not book_id:
+            return False
+
+        return self._write_json_file(DELIVERY_FILE, record, book_id)
 
     def get_global_settings(self):
         """Read global settings from .user_settings.json"""
-        return self._read_json_file('.user_settings.json', self.root_folder_id) or {}
+        return self._read_settings('.user_settings.json', self.root_folder_id) or {}
 
     def save_global_settings(self, settings):
         """Save global settings"""
-        return self._write_json_file('.user_settings.json', settings, self.root_folder_id)
+        return self._write_settings('.user_settings.json', settings, self.root_folder_id)
+
+    def _read_settings(self, filename, parent_id):
+        """Read a settings file, served from cache for SETTINGS_TTL seconds"""
+        cached = _settings_cache.get((parent_id, filename))
+        if cached and time.time() - cached[1] < SETTINGS_TTL:
+            return dict(cached[0]) if cached[0] is not None else None
+
+        settings = drive_reads.do((parent_id, 'settings', filename), lambda: self._read_json_file(filename, parent_id))
+        _settings_cache[(parent_id, filename)] = (settings, time.time())
+        return dict(settings) if settings is not None else None
+
+    def _write_settings(self, filename, settings, parent_id):
+        """Write a settings file and keep the cached copy in step"""
+        success = self._write_json_file(filename, settings, parent_id)
+        drive_reads.forget(parent_id)
+        if success:
+            _settings_cache[(parent_id, filename)] = (dict(settings), time.time())
+        else:
+            _settings_cache.pop((parent_id, filename), None)
+        return success
+
+    def _download_file(self, file_id):
+        """Download a file's content as text"""
+        from googleapiclient.http import MediaIoBaseDownload
+
+        request = self.service.files().get_media(fileId=file_id)
+        file_buffer = BytesIO()
+        downloader = MediaIoBaseDownload(file_buffer, request)
+
+        done = False
+        while not done:
+            status, done = downloader.next_chunk()
+
+        return file_buffer.getvalue().decode('utf-8')
+
+    def _list_all_files(self, query, fields, order_by=None):
+        """List every file matching a query, following pagination"""
+        files = []
+        page_token = None
+        while True:
+            params = {
+                'q': query,
+                'spaces': 'drive',
+                'fields': f'nextPageToken, files({fields})',
+                'pageSize': 1000,
+            }
+            if order_by:
+                params['orderBy'] = order_by
+            if page_token:
+                params['pageToken'] = page_token
+
+            results = self.service.files().list(**params).execute()
+            files.extend(results.get('files', []))
+
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return files
 
     def _read_json_file(self, filename, parent_id):
         """Read JSON file from Drive"""
@@ -279,20 +1724,7 @@ class DriveManager:
             if not files:
                 return None
 
-            file_id = files[0]['id']
-
-            # Download content
-            from googleapiclient.http import MediaIoBaseDownload
-
-            request = self.service.files().get_media(fileId=file_id)
-            file_buffer = BytesIO()
-            downloader = MediaIoBaseDownload(file_buffer, request)
-
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-
-            content = file_buffer.getvalue().decode('utf-8')
+            content = self._download_file(files[0]['id'])
             return json.loads(content)
 
         except Exception as e:
@@ -346,6 +1778,263 @@ class DriveManager:
             logger.error(f"Error writing JSON file {filename}: {e}")
             return False
 
+    def _load_manifest(self, book_id):
+        """Get a book's manifest (.book_index.json).
+
+        A cached copy is reused while fresh, then checked against the
+        manifest's Drive version. Missing, trashed or long-unverified
+        manifests are rebuilt from a folder listing. Concurrent loads of
+        one book share those Drive calls.
+        """
+        return drive_reads.do((book_id, 'manifest'), lambda: self._fetch_manifest(book_id))
+
+    def _fetch_manifest(self, book_id):
+        with book_lock(book_id):
+            return self._fetch_manifest_locked(book_id)
+
+    def _fetch_manifest_locked(self, book_id):
+        now = time.time()
+        cached = _manifest_cache.get(book_id)
+        # Chapter order to carry into a manifest rebuilt from a folder listing
+        known_order = []
+
+        if cached and now - cached['checked_at'] >= MANIFEST_CHECK_TTL:
+            try:
+                meta = self.service.files().get(
+                    fileId=cached['file_id'],
+                    fields='version, trashed'
+                ).execute()
+            except HttpError as e:
+                if e.resp.status != 404:
+                    raise
+                meta = {'trashed': True}
+
+            if meta.get('trashed'):
+                known_order = cached['data'].get('order', [])
+                cached = None
+            elif meta['version'] != cached['drive_version']:
+                # Another worker or device changed it
+                previous = cached['data']
+                try:
+                    cached['data'] = json.loads(self._download_file(cached['file_id']))
+                except ValueError:
+                    # Keep the copy we have (and its order); the listing fixes the pages
+                    logger.warning(f"Corrupt {MANIFEST_FILE} in {book_id}, rebuilding")
+                    cached['verified_at'] = 0
+                cached['drive_version'] = meta['version']
+                cached['checked_at'] = now
+                change_feed.publish(book_id, manifest_changes(previous, cached['data']))
+            else:
+                cached['checked_at'] = now
+
+        if cached is None:
+            query = f"name='{MANIFEST_FILE}' and '{book_id}' in parents and trashed=false"
+            results = self.service.files().list(
+                q=query,
+                spaces='drive',
+                fields='files(id, version)'
+            ).execute()
+            files = results.get('files', [])
+
+            cached = {'file_id': None, 'drive_version': None, 'checked_at': now, 'verified_at': 0,
+                      'data': {'version': 1, 'pages': {}, 'order': list(known_order)}}
+            if files:
+                cached['file_id'] = files[0]['id']
+                cached['drive_version'] = files[0].get('version')
+                try:
+                    cached['data'] = json.loads(self._download_file(files[0]['id']))
+                    cached['verified_at'] = now
+                except ValueError:
+                    logger.warning(f"Corrupt {MANIFEST_FILE} in {book_id}, rebuilding")
+            _manifest_cache[book_id] = cached
+
+        # Tools that change pages behind the app's back (migrate_local_to_drive)
+        # mark the manifest stale rather than deleting it and its chapter order
+        if cached['data'].get('stale'):
+            cached['verified_at'] = 0
+
+        if not cached['file_id'] or now - cached['verified_at'] >= MANIFEST_VERIFY_INTERVAL:
+            self._reconcile_manifest(book_id, cached)
+
+        return cached['data']
+
+    def _reconcile_manifest(self, book_id, cached):
+        """Rebuild a manifest from a folder listing, saving it if it drifted"""
+        query = f"'{book_id}' in parents and name contains '.md' and trashed=false"
+        files = self._list_all_files(query, 'id, name, md5Checksum, size, version', order_by='name')
+
+        old_pages = cached['data'].get('pages', {})
+        pages = {}
+        for f in files:
+            if not f['name'].endswith('.md') or f['name'] in pages:
+                continue
+            previous = old_pages.get(f['name'])
+            pages[f['name']] = {
+                'id': f['id'],
+                'md5': f.get('md5Checksum'),
+                'size': int(f.get('size') or 0),
+                'version': f.get('version'),
+                # Word counts survive unless the content changed
+                'words': previous['words'] if previous and previous.get('md5') == f.get('md5Checksum') else None,
+                'links': previous.get('links') if previous and previous.get('md5') == f.get('md5Checksum') else None
+            }
+
+        # Keep the stored chapter order; slot in pages added outside the app
+        order = [name for name in cached['data'].get('order', []) if name in pages]
+        for name in sorted(set(pages) - set(order)):
+            insert_page_order(order, name)
+        cached['verified_at'] = time.time()
+        drifted = pages != old_pages or order != cached['data'].get('order')
+        if drifted or cached['data'].get('stale') or not cached['file_id']:
+            previous = cached['data']
+            cached['data'] = {'version': 1, 'pages': pages, 'order': order}
+            if drifted and cached['file_id']:
+                logger.info(f"Manifest for {book_id} drifted from Drive, rebuilding")
+                change_feed.publish(book_id, manifest_changes(previous, cached['data']))
+            try:
+                self._save_manifest(book_id, cached)
+            except Exception:
+                # Already logged; this load still gets the rebuilt manifest
+                pass
+
+    def _save_manifest(self, book_id, cached, data=None, check_version=False):
+        """Write manifest data (by default the cached copy) to Drive and cache it.
+
+        With check_version, nothing is written if the Drive copy changed since
+        it was cached, and False is returned; otherwise True. A failed save
+        drops the cached copy, so the next load rebuilds it, and re-raises.
+        """
+        from googleapiclient.http import MediaIoBaseUpload
+
+        if data is None:
+            data = cached['data']
+
+        if check_version and cached['file_id']:
+            try:
+                meta = self.service.files().get(fileId=cached['file_id'], fields='version, trashed').execute()
+            except HttpError as e:
+                if e.resp.status != 404:
+                    raise
+                meta = {'trashed': True}
+            if meta.get('trashed') or meta['version'] != cached['drive_version']:
+                return False
+
+        media = MediaIoBaseUpload(
+            BytesIO(json.dumps(data).encode('utf-8')),
+            mimetype='application/json',
+            resumable=False
+        )
+        try:
+            if cached['file_id']:
+                result = self.service.files().update(
+                    fileId=cached['file_id'],
+                    media_body=media,
+                    fields='version'
+                ).execute()
+            else:
+                result = self.service.files().create(
+                    body={'name': MANIFEST_FILE, 'parents': [book_id], 'mimeType': 'application/json'},
+                    media_body=media,
+                    fields='id, version'
+                ).execute()
+                cached['file_id'] = result['id']
+            cached['data'] = data
+            cached['drive_version'] = result.get('version')
+            cached['checked_at'] = time.time()
+        except Exception as e:
+            # Pages are already written; the next load rebuilds the manifest
+            logger.warning(f"Failed to save {MANIFEST_FILE} for {book_id}: {e}")
+            _manifest_cache.pop(book_id, None)
+            raise
+        return True
+
+    def _update_manifest(self, book_id, update):
+        """Apply update(manifest_data) to the latest manifest, save it and publish the changes.
+
+        `update` works on a copy. If another worker or instance saved the
+        manifest since this one cached it, the copy is reloaded from Drive
+        and `update` applied again, so their changes aren't overwritten.
+
+        Returns the manifest as saved (shared: don't modify it). Raises if
+        it couldn't be saved.
+        """
+        try:
+            with manifest_lock(book_id):
+                for attempt in range(MANIFEST_SAVE_ATTEMPTS):
+                    cached = _manifest_cache.get(book_id)
+                    if cached is None:
+                        self._fetch_manifest(book_id)
+                        cached = _manifest_cache[book_id]
+                    previous = cached['data']
+                    data = copy_manifest(previous)
+                    update(data)
+
+                    # Past the last attempt, save regardless and let the next load reconcile
+                    last = attempt == MANIFEST_SAVE_ATTEMPTS - 1
+                    if self._save_manifest(book_id, cached, data, check_version=not last):
+                        break
+
+                    logger.info(f"Manifest for {book_id} changed elsewhere, reapplying update")
+                    cached['checked_at'] = 0
+                    self._fetch_manifest(book_id)
+        finally:
+            drive_reads.forget(book_id)
+
+        change_feed.publish(book_id, manifest_changes(previous, data))
+        return data
+
+    def _invalidate_manifest(self, book_id):
+        """Force the next load to reconcile the manifest with Drive"""
+        cached = _manifest_cache.get(book_id)
+        if cached:
+            cached['verified_at'] = 0
+        drive_reads.forget(book_id)
+
+    def _find_page(self, book_id, filename):
+        """Look a page missing from the manifest up on Drive (created by another
+        instance or outside the app) and add it; returns its entry or None"""
+        results = self.service.files().list(
+            q=f"name={drive_query_string(filename)} and '{book_id}' in parents and trashed=false",
+            spaces='drive',
+            fields='files(id, md5Checksum, size, version)'
+        ).execute()
+        files = results.get('files', [])
+        if not files:
+            return None
+
+        f = files[0]
+        page = {'id': f['id'], 'md5': f.get('md5Checksum'), 'size': int(f.get('size') or 0),
+                'version': f.get('version'), 'words': None, 'links': None}
+
+        def _add(manifest):
+            if filename not in manifest['order']:
+                insert_page_order(manifest['order'], filename)
+            manifest['pages'][filename] = page
+
+        logger.info(f"Found {filename} on Drive but not in the manifest of {book_id}, adding it")
+        self._update_manifest(book_id, _add)
+        return page
+
+    def get_manifest(self, book_name):
+        """Get a copy of a book's manifest: {'pages': {name: {id, md5, size, words, version}}, 'order': [names]}"""
+        def _execute():
+            book_id = self._get_book_id(book_name)
+            if not book_id:
+                return None
+            return copy_manifest(self._load_manifest(book_id))
+
+        return self._retry_on_error(_execute)
+
+    def get_page_revision(self, book_name, filename):
+        """Current revision (content md5) of a page, or None if it doesn't exist"""
+        manifest = self.get_manifest(book_name)
+        if not manifest:
+            return None
+
+        filename_with_ext = filename if filename.endswith('.md') else f"{filename}.md"
+        page = manifest['pages'].get(filename_with_ext)
+        return page['md5'] if page else None
+
     def list_pages(self, book_name):
         """List all pages in a book"""
         def _execute():
@@ -353,15 +2042,7 @@ class DriveManager:
             if not book_id:
                 return []
 
-            query = f"'{book_id}' in parents and name contains '.md' and trashed=false"
-            results = self.service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id, name)',
-                orderBy='name'
-            ).execute()
-
-            pages = [f['name'] for f in results.get('files', []) if f['name'].endswith('.md')]
+            pages = list(self._load_manifest(book_id)['order'])
             logger.info(f"Found {len(pages)} pages in book: {book_name}")
             return pages
 
@@ -380,38 +2061,49 @@ class DriveManager:
             else:
                 filename_with_ext = filename
 
-            # Find file
-            query = f"name='{filename_with_ext}' and '{book_id}' in parents and trashed=false"
-            results = self.service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id)'
-            ).execute()
-
-            files = results.get('files', [])
-            if not files:
+            manifest = self._load_manifest(book_id)
+            entry = manifest['pages'].get(filename_with_ext) or self._find_page(book_id, filename_with_ext)
+            if not entry:
                 return None
 
-            file_id = files[0]['id']
-
-            # Download content
-            from googleapiclient.http import MediaIoBaseDownload
-
-            request = self.service.files().get_media(fileId=file_id)
-            file_buffer = BytesIO()
-            downloader = MediaIoBaseDownload(file_buffer, request)
-
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-
-            content = file_buffer.getvalue().decode('utf-8')
+            content = cached_page(entry['id'], entry.get('md5'))
+            if content is None:
+                try:
+                    content = drive_reads.do(
+                        (book_id, 'page', entry['id'], entry.get('md5')),
+                        lambda: self._download_file(entry['id'])
+                    )
+                except HttpError as e:
+                    if e.resp.status != 404:
+                        raise
+                    # Deleted outside the app; reconcile and try once more
+                    self._invalidate_manifest(book_id)
+                    entry = self._load_manifest(book_id)['pages'].get(filename_with_ext)
+                    if not entry:
+                        return None
+                    content = self._download_file(entry['id'])
+                cache_page(entry['id'], entry.get('md5'), content)
+
+            if entry.get('words') is None or entry.get('links') is None:
+                # Written outside the app: record its counts now it has been read
+                md5, words, links = entry.get('md5'), count_words(content), extract_page_links(content)
+
+                def _record(manifest):
+                    page = manifest['pages'].get(filename_with_ext)
+                    if page and page.get('md5') == md5:
+                        page['words'] = words
+                        page['links'] = links
+
+                try:
+                    self._update_manifest(book_id, _record)
+                except Exception as e:
+                    logger.warning(f"Could not record counts for {filename_with_ext}: {e}")
             return content
 
         return self._retry_on_error(_execute)
 
-    def write_page(self, book_name, filename, content):
-        """Write content to a page"""
+    def write_page(self, book_name, filename, content, after=None):
+        """Write content to a page; new pages go after `after` when given"""
         def _execute():
             from googleapiclient.http import MediaIoBaseUpload
 
@@ -425,43 +2117,61 @@ class DriveManager:
             else:
                 filename_with_ext = filename
 
+            data = content.encode('utf-8')
             media = MediaIoBaseUpload(
-                BytesIO(content.encode('utf-8')),
+                BytesIO(data),
                 mimetype='text/markdown',
                 resumable=True
             )
 
-            # Check if file exists
-            query = f"name='{filename_with_ext}' and '{book_id}' in parents and trashed=false"
-            results = self.service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id)'
-            ).execute()
-
-            files = results.get('files', [])
+            entry = self._load_manifest(book_id)['pages'].get(filename_with_ext) or self._find_page(book_id, filename_with_ext)
+            result = None
 
-            if files:
+            if entry:
                 # Update existing
-                self.service.files().update(
-                    fileId=files[0]['id'],
-                    media_body=media
-                ).execute()
-                logger.info(f"Updated existing page: {filename_with_ext}")
-            else:
+                try:
+                    result = self.service.files().update(
+                        fileId=entry['id'],
+                        media_body=media,
+                        fields='id, version'
+                    ).execute()
+                    logger.info(f"Updated existing page: {filename_with_ext}")
+                except HttpError as e:
+                    if e.resp.status != 404:
+                        raise
+                    # Deleted outside the app; create it again below
+                    self._invalidate_manifest(book_id)
+
+            if result is None:
                 # Create new
                 file_metadata = {
                     'name': filename_with_ext,
                     'parents': [book_id],
                     'mimeType': 'text/markdown'
                 }
-                self.service.files().create(
+                result = self.service.files().create(
                     body=file_metadata,
                     media_body=media,
-                    fields='id'
+                    fields='id, version'
                 ).execute()
                 logger.info(f"Created new page: {filename_with_ext}")
 
+            page = {
+                'id': result['id'],
+                'md5': hashlib.md5(data).hexdigest(),
+                'size': len(data),
+                'version': result.get('version'),
+                'words': count_words(content),
+                'links': extract_page_links(content)
+            }
+            cache_page(page['id'], page['md5'], content)
+
+            def _record(manifest):
+                if filename_with_ext not in manifest['order']:
+                    insert_page_order(manifest['order'], filename_with_ext, after)
+                manifest['pages'][filename_with_ext] = page
+
+            self._update_manifest(book_id, _record)
             return True
 
         return self._retry_on_error(_execute)
@@ -484,35 +2194,33 @@ class DriveManager:
             else:
                 new_filename_with_ext = new_filename
 
-            # Check if new name already exists
-            check_query = f"name='{new_filename_with_ext}' and '{book_id}' in parents and trashed=false"
-            check_results = self.service.files().list(
-                q=check_query,
-                spaces='drive',
-                fields='files(id)'
-            ).execute()
+            pages = self._load_manifest(book_id)['pages']
 
-            if check_results.get('files', []):
+            # Check if new name already exists
+            if new_filename_with_ext in pages:
                 return False  # New name already exists
 
-            # Find old file
-            query = f"name='{old_filename_with_ext}' and '{book_id}' in parents and trashed=false"
-            results = self.service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id)'
-            ).execute()
-
-            files = results.get('files', [])
-            if not files:
+            entry = pages.get(old_filename_with_ext)
+            if not entry:
                 return False
 
             # Rename file
-            self.service.files().update(
-                fileId=files[0]['id'],
-                body={'name': new_filename_with_ext}
+            result = self.service.files().update(
+                fileId=entry['id'],
+                body={'name': new_filename_with_ext},
+                fields='id, version'
             ).execute()
 
+            def _rename(manifest):
+                page = dict(manifest['pages'].pop(old_filename_with_ext, entry))
+                page['version'] = result.get('version')
+                manifest['pages'][new_filename_with_ext] = page
+                # A rename keeps the chapter's position
+                manifest['order'] = [new_filename_with_ext if name == old_filename_with_ext else name
+                                     for name in manifest['order']]
+
+            self._update_manifest(book_id, _rename)
+
             logger.info(f"Renamed page: {old_filename_with_ext} -> {new_filename_with_ext}")
             return True
 
@@ -531,34 +2239,140 @@ class DriveManager:
             else:
                 filename_with_ext = filename
 
-            # Find file
-            query = f"name='{filename_with_ext}' and '{book_id}' in parents and trashed=false"
-            results = self.service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id)'
-            ).execute()
-
-            files = results.get('files', [])
-            if not files:
+            entry = self._load_manifest(book_id)['pages'].get(filename_with_ext)
+            if not entry:
                 return False
 
             # Move to trash
             self.service.files().update(
-                fileId=files[0]['id'],
+                fileId=entry['id'],
                 body={'trashed': True}
             ).execute()
+            with _page_cache_lock:
+                _page_cache.pop(entry['id'], None)
+
+            def _remove(manifest):
+                manifest['pages'].pop(filename_with_ext, None)
+                manifest['order'] = [name for name in manifest['order'] if name != filename_with_ext]
+
+            self._update_manifest(book_id, _remove)
 
             logger.info(f"Deleted page: {filename}")
             return True
 
         return self._retry_on_error(_execute)
 
+    def move_page(self, book_name, filename, after=''):
+        """Move a page right after another page ('' moves it first).
+
+        Returns the new chapter order, or None if either page is unknown.
+        """
+        def _execute():
+            book_id = self._get_book_id(book_name)
+            if not book_id:
+                return None
+
+            order = self._load_manifest(book_id)['order']
+            if filename not in order or (after and after not in order) or after == filename:
+                return None
+
+            def _move(manifest):
+                # Reapplied to a newer copy, the page may have gone meanwhile
+                if filename in manifest['order']:
+                    manifest['order'].remove(filename)
+                    insert_page_order(manifest['order'], filename, after)
+
+            manifest = self._update_manifest(book_id, _move)
+            logger.info(f"Moved page {filename} after {after or '(start)'} in book: {book_name}")
+            return list(manifest['order'])
+
+        return self._retry_on_error(_execute)
+
+    def set_page_order(self, book_name, order):
+        """Replace a book's chapter order; `order` must list every page once"""
+        def _execute():
+            book_id = self._get_book_id(book_name)
+            if not book_id:
+                return False
+
+            if sorted(order) != sorted(self._load_manifest(book_id)['pages']):
+                return False
+
+            def _reorder(manifest):
+                manifest['order'] = list(order)
+
+            self._update_manifest(book_id, _reorder)
+            logger.info(f"Reordered {len(order)} pages in book: {book_name}")
+            return True
+
+        return self._retry_on_error(_execute)
+
+    def get_link_index(self, book_name):
+        """Get {page: [linked pages]} for a book.
+
+        Links come from the manifest. Pages without them (written outside
+        the app) are read once, from the page cache when possible, and
+        their links recorded in the manifest.
+        """
+        def _execute():
+            book_id = self._get_book_id(book_name)
+            if not book_id:
+                return None
+
+            pages = self._load_manifest(book_id)['pages']
+            links = {}
+            found = {}
+            for name, page in list(pages.items()):
+                if page.get('links') is not None:
+                    links[name] = page['links']
+                    continue
+                content = cached_page(page['id'], page.get('md5'))
+                if content is None:
+                    content = self._download_file(page['id'])
+                    cache_page(page['id'], page.get('md5'), content)
+                links[name] = found[name] = (page.get('md5'), extract_page_links(content))
+
+            if found:
+                def _record(manifest):
+                    for name, (md5, page_links) in found.items():
+                        page = manifest['pages'].get(name)
+                        if page and page.get('md5') == md5:
+                            page['links'] = page_links
+
+                self._update_manifest(book_id, _record)
+                links.update((name, page_links) for name, (_, page_links) in found.items())
+
+            return links
+
+        return self._retry_on_error(_execute)
+
+    def rewrite_inbound_links(self, book_name, old_filename, new_filename):
+        """Rewrite links to a renamed page across the book, returning updated pages"""
+        links = self.get_link_index(book_name) or {}
+        updated = []
+
+        for page, targets in sorted(links.items()):
+            if old_filename not in targets:
+                continue
+            content = self.read_page(book_name, page)
+            if content is None:
+                continue
+            new_content = rewrite_page_links(content, old_filename, new_filename)
+            if new_content != content and self.write_page(book_name, page, new_content):
+                updated.append(page)
+
+        logger.info(f"Rewrote links in {len(updated)} pages: {old_filename} -> {new_filename}")
+        return updated
+
 
 # ============================================================================
 # AUTHENTICATION DECORATORS
 # ============================================================================
 
+# Signed-in users (by Google account email, comma-separated) allowed to use /api/admin/*
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+
 def login_required(f):
     """Decorator to require user login"""
     @wraps(f)
@@ -569,75 +2383,685 @@ def login_required(f):
     return decorated_function
 
 
+def admin_required(f):
+    """Decorator to require a signed-in user listed in ADMIN_EMAILS"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'credentials' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+        if (session.get('user_email') or '').lower() not in ADMIN_EMAILS:
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def session_user_key():
+    """Stable key for the signed-in user's shared server-side state"""
+    return (session.get('user_email') or getattr(session, 'sid', None)
+            or session['credentials'].get('refresh_token') or session['credentials']['token'])
+
+
+def get_user_credentials():
+    """Get the current user's shared credentials, or None if not signed in"""
+    if 'credentials' not in session:
+        return None
+
+    user = credential_manager.get(session_user_key(), session['credentials'])
+
+    # Carry refreshed tokens back into the session
+    if session['credentials'].get('token') != user.credentials.token:
+        session['credentials'] = credentials_to_dict(user.credentials)
+    return user
+
+
 def get_drive_manager():
     """Get DriveManager instance for current user"""
-    if 'credentials' not in session:
+    user = get_user_credentials()
+    if not user:
         return None
 
-    credentials = Credentials(**session['credentials'])
-    dm = DriveManager(credentials)
-    dm.initialize_user_folder()
+    dm = user.drive_manager()
+
+    # The root folder lookup is a Drive query; reuse it across requests
+    user_key = session_user_key()
+    cached = _root_folder_cache.get(user_key)
+    if cached and time.time() - cached[1] < ROOT_FOLDER_TTL:
+        dm.root_folder_id = cached[0]
+    else:
+        dm.initialize_user_folder()
+        _root_folder_cache[user_key] = (dm.root_folder_id, time.time())
     return dm
 
 
 # ============================================================================
-# ROUTES
+# CACHE WARM-UP
 # ============================================================================
 
-@app.route('/')
-def landing():
-    """Landing page"""
-    if 'credentials' in session:
-        return redirect(url_for('dashboard'))
-    return render_template('landing.html')
+# Background warm-ups share a small thread pool; each user has at most one pending
+WARMUP_WORKERS = int(os.environ.get('WARMUP_WORKERS', '2'))
 
+# Most recently modified books whose settings, manifest and first page are prefetched
+WARMUP_BOOKS = 3
 
-@app.route('/login')
-def login():
-    """Initiate Google OAuth flow"""
-    flow = Flow.from_client_config(
-        {
-            "web": {
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-            }
-        },
-        scopes=SCOPES,
-        redirect_uri=REDIRECT_URI
-    )
+# A user is not warmed again within this many seconds of their last warm-up
+WARMUP_COOLDOWN = 60
 
-    authorization_url, state = flow.authorization_url(
-        access_type='offline',
-        include_granted_scopes='true'
-    )
 
-    session['state'] = state
-    session.permanent = True  # Make session persistent
-    logger.info(f"OAuth flow initiated, state: {state}")
-    return redirect(authorization_url)
+class CacheWarmer:
+    """Fills the server-side Drive caches for a user in the background.
 
+    Started at sign-in and on dashboard loads, so opening a book finds the
+    root folder, book IDs, manifests, settings and first pages already
+    cached. Warm-ups check for cancellation (sign-out) between Drive calls.
+    """
 
-@app.route('/oauth2callback')
-def oauth2callback():
-    """Handle OAuth callback"""
-    # Get state from session
-    state = session.get('state')
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+        self._executor_pid = None
+        self._pending = {}   # user_key -> cancellation Event
+        self._finished = {}  # user_key -> when their last warm-up ended
+        self._lock = threading.Lock()
 
-    logger.info(f"OAuth callback received, state in session: {state}")
-    logger.info(f"Request URL: {request.url}")
+    def start(self, user_key, user):
+        """Queue a warm-up for a user; returns False if one is pending or recent"""
+        with self._lock:
+            if user_key in self._pending or time.time() - self._finished.get(user_key, 0) < WARMUP_COOLDOWN:
+                return False
+            if self._executor_pid != os.getpid():
+                # Threads don't survive a fork; start a pool in each worker
+                from concurrent.futures import ThreadPoolExecutor
 
-    if not state:
-        logger.error("No state in session!")
-        return render_template('error.html',
-            title='Session Expired',
-            message='Your session expired. This can happen if you pressed the back button or took too long.',
-            action_text='Sign in again',
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='warmup')
+                self._executor_pid = os.getpid()
+            cancelled = self._pending[user_key] = threading.Event()
+
+        self._executor.submit(self._run, user_key, user, cancelled)
+        return True
+
+    def cancel(self, user_key):
+        """Stop a user's pending warm-up at its next step"""
+        with self._lock:
+            cancelled = self._pending.get(user_key)
+        if cancelled:
+            cancelled.set()
+
+    def _run(self, user_key, user, cancelled):
+        started = time.perf_counter()
+        try:
+            self._warm(user_key, user, cancelled)
+        except Exception as e:
+            logger.warning(f"Cache warm-up failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.pop(user_key, None)
+                if cancelled.is_set():
+                    self._finished.pop(user_key, None)
+                else:
+                    self._finished[user_key] = time.time()
+
+        state = 'cancelled' if cancelled.is_set() else 'done'
+        logger.info(f"Cache warm-up {state} in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def _warm(self, user_key, user, cancelled):
+        dm = user.drive_manager()
+        dm.initialize_user_folder()
+        _root_folder_cache[user_key] = (dm.root_folder_id, time.time())
+
+        if cancelled.is_set():
+            return
+        dm.get_global_settings()
+        books = dm.list_books()
+
+        recent = sorted(books, key=lambda book: book.get('lastModified') or '', reverse=True)
+        for book in recent[:WARMUP_BOOKS]:
+            if cancelled.is_set():
+                return
+            dm.get_book_settings(book['name'])
+            pages = dm.list_pages(book['name'])
+            if pages and not cancelled.is_set():
+                # The editor opens the first page when a book is opened
+                dm.read_page(book['name'], pages[0])
+
+
+cache_warmer = CacheWarmer(WARMUP_WORKERS)
+
+
+def warm_user_caches():
+    """Start a background cache warm-up for the signed-in user"""
+    try:
+        user = get_user_credentials()
+        if user:
+            cache_warmer.start(session_user_key(), user)
+    except Exception as e:
+        # Warming is best-effort; never fail the page that triggered it
+        logger.warning(f"Could not start cache warm-up: {e}")
+
+
+# ============================================================================
+# EXPORT ADMISSION
+# ============================================================================
+
+# Memory this worker lets export jobs (EPUB/PDF downloads, Kindle sends) use at once.
+# Render's free instance has 512 MB for the whole app, so leave room for everything else
+EXPORT_MEMORY_BUDGET = int(float(os.environ.get('EXPORT_MEMORY_BUDGET_MB', '192')) * 1024 * 1024)
+
+# Estimated peak memory per byte of markdown, by job kind, on top of a fixed cost per job.
+# PDFs hold every flowable until the document is built; Kindle sends also decode images
+EXPORT_MEMORY_FACTORS = {'epub': 6, 'pdf': 20, 'kindle': 8}
+EXPORT_MEMORY_OVERHEAD = 8 * 1024 * 1024
+
+# Covers are decoded (and for Kindle, resized) as full bitmaps
+EXPORT_COVER_FACTOR = 12
+
+# Extra memory per byte of markdown when a book's chapters go through the export pool.
+# The pool's processes themselves are taken off the budget when it starts (start_export_pool)
+EXPORT_POOL_COPY_FACTOR = 4
+
+# How long a queued export waits for memory before it's turned away with a 503
+EXPORT_QUEUE_TIMEOUT = float(os.environ.get('EXPORT_QUEUE_TIMEOUT', '10'))
+
+# Exports that may wait at once, per user and in total; more are refused straight away
+EXPORT_QUEUE_PER_USER = 2
+EXPORT_QUEUE_MAX = 16
+
+# Users who get more than one queued export per round, as "email=weight,email=weight"
+EXPORT_USER_WEIGHTS = {
+    email.strip().lower(): int(weight)
+    for email, _, weight in (entry.partition('=') for entry in os.environ.get('EXPORT_USER_WEIGHTS', '').split(','))
+    if email.strip() and weight.strip().isdigit()
+}
+
+
+def estimate_export_memory(kind, manifest, cover_base64=None):
+    """Rough peak memory of rendering a book as `kind` ('epub', 'pdf' or 'kindle')"""
+    text_bytes = sum(entry.get('size') or 0 for entry in manifest['pages'].values())
+    cover_bytes = len(cover_base64) * 3 // 4 if cover_base64 else 0
+    estimate = EXPORT_MEMORY_OVERHEAD + text_bytes * EXPORT_MEMORY_FACTORS[kind] + cover_bytes * EXPORT_COVER_FACTOR
+    if uses_export_pool(len(manifest['pages'])):
+        # Chapters are pickled out to the pool and their renders pickled back
+        estimate += text_bytes * EXPORT_POOL_COPY_FACTOR
+    return estimate
+
+
+class ExportScheduler:
+    """Admits export jobs within a memory budget, fairly across users.
+
+    A job starts at once if nobody is waiting and its estimate fits next
+    to the running jobs. Otherwise it queues under its user, and queued
+    jobs are admitted as memory frees up in weighted round robin order:
+    the user at the front of the rotation gets up to their weight in jobs,
+    then goes to the back. A job bigger than the whole budget runs alone.
+
+    Jobs that can't queue, or wait longer than the timeout, are refused so
+    the route can answer 503 rather than get the worker killed for memory.
+    """
+
+    def __init__(self, budget, weights=None):
+        self.budget = budget
+        self.weights = weights or {}
+        self._in_use = 0
+        self._running = 0
+        self._queues = OrderedDict()  # user -> deque of waiting jobs, in rotation order
+        self._turns = 0               # jobs admitted for the front user this round
+        self._average_seconds = 10.0  # moving average of job duration, for Retry-After
+        self._counts = {'admitted': 0, 'queued': 0, 'refused': 0, 'timed_out': 0}
+        self._lock = threading.Lock()
+
+    def admit(self, user, estimate, timeout=EXPORT_QUEUE_TIMEOUT):
+        """Wait until a job may run; returns a ticket for release(), or None if refused"""
+        job = {'user': user, 'estimate': min(estimate, self.budget), 'admitted': threading.Event()}
+        with self._lock:
+            if not self._queues and self._fits(job):
+                self._start(job)
+                return job
+            if len(self._queues.get(user, ())) >= EXPORT_QUEUE_PER_USER or self._waiting() >= EXPORT_QUEUE_MAX:
+                self._counts['refused'] += 1
+                return None
+            self._queues.setdefault(user, deque()).append(job)
+            self._counts['queued'] += 1
+
+        if job['admitted'].wait(timeout):
+            return job
+
+        with self._lock:
+            if job['admitted'].is_set():
+                return job
+            queue = self._queues[user]
+            queue.remove(job)
+            if not queue:
+                self._remove_user(user)
+            self._counts['timed_out'] += 1
+            # The job may have been blocking the head of the queue
+            self._dispatch()
+        return None
+
+    def release(self, job):
+        """Return a finished job's memory and admit whoever fits next"""
+        elapsed = time.monotonic() - job['started']
+        with self._lock:
+            self._in_use -= job['estimate']
+            self._running -= 1
+            self._average_seconds = 0.8 * self._average_seconds + 0.2 * elapsed
+            self._dispatch()
+
+    def retry_after(self):
+        """Seconds a refused client should wait before trying again"""
+        with self._lock:
+            rounds = 1 + self._waiting() / max(1, self._running)
+            return max(1, int(self._average_seconds * rounds + 0.5))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'budget_mb': round(self.budget / 1024 / 1024, 1),
+                'in_use_mb': round(self._in_use / 1024 / 1024, 1),
+                'running': self._running,
+                'waiting': self._waiting(),
+                'average_seconds': round(self._average_seconds, 2),
+                **self._counts
+            }
+
+    def _fits(self, job):
+        return self._running == 0 or self._in_use + job['estimate'] <= self.budget
+
+    def _waiting(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _start(self, job):
+        job['started'] = time.monotonic()
+        self._in_use += job['estimate']
+        self._running += 1
+        self._counts['admitted'] += 1
+
+    def _remove_user(self, user):
+        if next(iter(self._queues)) == user:
+            self._turns = 0
+        del self._queues[user]
+
+    def _dispatch(self):
+        while self._queues:
+            user, queue = next(iter(self._queues.items()))
+            job = queue[0]
+            if not self._fits(job):
+                # Hold smaller jobs back too, or a big one would never get in
+                return
+            queue.popleft()
+            self._start(job)
+            job['admitted'].set()
+
+            self._turns += 1
+            if not queue:
+                self._remove_user(user)
+            elif self._turns >= self.weights.get(str(user).lower(), 1):
+                self._queues.move_to_end(user)
+                self._turns = 0
+
+
+export_scheduler = ExportScheduler(EXPORT_MEMORY_BUDGET, EXPORT_USER_WEIGHTS)
+
+
+def export_busy_response():
+    """503 for an export the scheduler turned away"""
+    retry_after = export_scheduler.retry_after()
+    return jsonify({
+        'error': f'The server is busy with other exports. Please try again in {retry_after} seconds.',
+        'retry_after': retry_after
+    }), 503, {'Retry-After': str(retry_after)}
+
+
+# ============================================================================
+# PROFILER
+# ============================================================================
+
+# Shared by all workers: the profiling switch and each worker's results
+PROFILER_DIR = os.environ.get('PROFILER_DIR') or os.path.join(tempfile.gettempdir(), 'jugaadpress-profiler')
+
+PROFILER_INTERVAL = 0.005  # seconds between stack samples
+
+# How long a worker trusts its copy of the switch; all a disabled profiler costs
+PROFILER_CONFIG_TTL = 2  # seconds
+
+PROFILER_MAX_DURATION = 3600  # seconds
+PROFILER_MAX_DEPTH = 64  # innermost frames kept per sample
+
+# Samples with a frame in these modules are waiting on the network (Drive, Gmail)
+PROFILER_IO_MODULES = ('socket', 'ssl', 'select', 'selectors', 'http.client', 'httplib2')
+
+
+def collapse_stack(frame, root, stop=None):
+    """Collapsed stack ('root;outer;...;inner') for a frame up to (not including) `stop`,
+    and whether it's waiting on I/O"""
+    names = []
+    waiting = False
+    while frame is not None and frame is not stop:
+        module = frame.f_globals.get('__name__', '?')
+        if module.startswith(PROFILER_IO_MODULES):
+            waiting = True
+        names.append(f"{module}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    names = names[:PROFILER_MAX_DEPTH]
+    names.append(root)
+    return ';'.join(reversed(names)), waiting
+
+
+class ProfiledTask:
+    """Export pool task wrapper that samples the pool worker while it runs.
+
+    Returns (result, collapsed stack counts, CPU seconds) so the request
+    that submitted it can fold the worker's profile into its own.
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, *args):
+        target = threading.get_ident()
+        # Frames above this one are the pool process's own work loop; keep only the task's
+        top = sys._getframe()
+        stacks = {}
+        done = threading.Event()
+
+        def _sample():
+            while not done.wait(PROFILER_INTERVAL):
+                frame = sys._current_frames().get(target)
+                if frame is not None:
+                    stack, _ = collapse_stack(frame, '[export pool]', stop=top)
+                    stacks[stack] = stacks.get(stack, 0) + 1
+
+        sampler = threading.Thread(target=_sample, daemon=True)
+        sampler.start()
+        cpu_started = time.thread_time()
+        try:
+            result = self.func(*args)
+        finally:
+            done.set()
+            sampler.join()
+        return result, stacks, time.thread_time() - cpu_started
+
+
+class RequestProfiler:
+    """Opt-in sampling profiler for live requests.
+
+    An admin turns it on for a while with a sample rate and optional route
+    and user filters; the switch is a file in PROFILER_DIR, so every worker
+    follows it. Selected requests have their thread's stack sampled every
+    PROFILER_INTERVAL by a background thread, which only runs while such a
+    request is in flight. Each worker writes its results next to the switch
+    for report() to merge.
+    """
+
+    def __init__(self):
+        self._config = None
+        self._config_checked = 0
+        self._session = None
+        self._active = {}  # thread ident -> route
+        self._stacks = {}  # collapsed stack -> samples
+        self._routes = {}  # route -> totals
+        self._sampler = None
+        self._lock = threading.Lock()
+
+    def _config_path(self):
+        return os.path.join(PROFILER_DIR, 'config.json')
+
+    def config(self):
+        """The current profiling session, or None when profiling is off"""
+        now = time.time()
+        if now - self._config_checked >= PROFILER_CONFIG_TTL:
+            self._config_checked = now
+            try:
+                with open(self._config_path()) as f:
+                    self._config = json.load(f)
+            except (OSError, ValueError):
+                self._config = None
+        config = self._config
+        return config if config and config['until'] > now else None
+
+    def configure(self, sample_rate, route=None, user=None, duration=300):
+        """Start a new profiling session (clearing earlier results) for `duration` seconds"""
+        config = {
+            'session': secrets.token_hex(4),
+            'sample_rate': sample_rate,
+            'route': route or None,
+            'user': (user or '').lower() or None,
+            'started': time.time(),
+            'until': time.time() + duration
+        }
+        os.makedirs(PROFILER_DIR, exist_ok=True)
+        for name in os.listdir(PROFILER_DIR):
+            if name.startswith('profile-'):
+                os.remove(os.path.join(PROFILER_DIR, name))
+        tmp_path = f"{self._config_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(config, f)
+        os.replace(tmp_path, self._config_path())
+        self._config_checked = 0
+        return config
+
+    def disable(self):
+        """Stop profiling; results stay available"""
+        try:
+            os.remove(self._config_path())
+        except OSError:
+            pass
+        self._config_checked = 0
+
+    def should_profile(self, route, path, user):
+        config = self.config()
+        if not config:
+            return False
+        if config['route'] and config['route'] not in route and not path.startswith(config['route']):
+            return False
+        if config['user'] and config['user'] != (user or '').lower():
+            return False
+        return random.random() < config['sample_rate']
+
+    def start(self, route):
+        """Begin sampling the calling thread under `route`; returns a token for stop()"""
+        config = self.config()
+        with self._lock:
+            if config and self._session != config['session']:
+                # A new session was started (maybe from another worker)
+                self._session, self._stacks, self._routes = config['session'], {}, {}
+            self._active[threading.get_ident()] = route
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample_loop, name='profiler', daemon=True)
+                self._sampler.start()
+        return time.perf_counter(), time.thread_time()
+
+    def stop(self, route, token):
+        """End sampling the calling thread and save this worker's results"""
+        wall_seconds = time.perf_counter() - token[0]
+        cpu_seconds = time.thread_time() - token[1]
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+            totals = self._route_totals(route)
+            totals['requests'] += 1
+            totals['wall_seconds'] += wall_seconds
+            totals['cpu_seconds'] += cpu_seconds
+        self._save()
+
+    def current_route(self):
+        """Route being profiled on the calling thread, or None"""
+        return self._active.get(threading.get_ident())
+
+    def record_pool(self, route, stacks, cpu_seconds):
+        """Fold an export pool task's samples (from ProfiledTask) into a request's profile"""
+        with self._lock:
+            for stack, count in stacks.items():
+                key = f"{route};{stack}"
+                self._stacks[key] = self._stacks.get(key, 0) + count
+            self._route_totals(route)['pool_cpu_seconds'] += cpu_seconds
+
+    def _route_totals(self, route):
+        return self._routes.setdefault(route, {
+            'requests': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'pool_cpu_seconds': 0.0,
+            'samples': 0, 'io_samples': 0
+        })
+
+    def _sample_loop(self):
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+                active = dict(self._active)
+
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, route in active.items():
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+                    stack, waiting = collapse_stack(frame, route)
+                    self._stacks[stack] = self._stacks.get(stack, 0) + 1
+                    totals = self._route_totals(route)
+                    totals['samples'] += 1
+                    totals['io_samples'] += waiting
+            del frames
+            time.sleep(PROFILER_INTERVAL)
+
+    def _save(self):
+        with self._lock:
+            data = json.dumps({'session': self._session, 'routes': self._routes, 'stacks': self._stacks})
+        try:
+            path = os.path.join(PROFILER_DIR, f"profile-{os.getpid()}.json")
+            with open(f"{path}.tmp", 'w') as f:
+                f.write(data)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning(f"Could not save profile: {e}")
+
+    def _load_results(self):
+        """Routes and stacks merged across workers for the latest session"""
+        try:
+            with open(self._config_path()) as f:
+                session_id = json.load(f)['session']
+        except (OSError, ValueError, KeyError):
+            session_id = None
+
+        routes, stacks = {}, {}
+        try:
+            names = [name for name in os.listdir(PROFILER_DIR) if name.startswith('profile-') and name.endswith('.json')]
+        except OSError:
+            names = []
+        for name in names:
+            try:
+                with open(os.path.join(PROFILER_DIR, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if session_id and data['session'] != session_id:
+                continue
+            for route, totals in data['routes'].items():
+                merged = routes.setdefault(route, dict.fromkeys(totals, 0))
+                for key, value in totals.items():
+                    merged[key] += value
+            for stack, count in data['stacks'].items():
+                stacks[stack] = stacks.get(stack, 0) + count
+        return routes, stacks
+
+    def report(self):
+        """Per-route wall, CPU and estimated Drive I/O wait time"""
+        routes, _ = self._load_results()
+        summary = {}
+        for route, totals in routes.items():
+            io_share = totals['io_samples'] / totals['samples'] if totals['samples'] else 0
+            summary[route] = {
+                'requests': totals['requests'],
+                'wall_seconds': round(totals['wall_seconds'], 4),
+                'cpu_seconds': round(totals['cpu_seconds'], 4),
+                'io_wait_seconds': round(totals['wall_seconds'] * io_share, 4),
+                'export_pool_cpu_seconds': round(totals['pool_cpu_seconds'], 4),
+                'samples': totals['samples']
+            }
+        return summary
+
+    def collapsed_stacks(self):
+        """Samples in collapsed-stack format ('frame;frame;frame count' per line) for flame graphs"""
+        _, stacks = self._load_results()
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+request_profiler = RequestProfiler()
+
+
+@app.before_request
+def start_request_profile():
+    route = f"{request.method} {request.url_rule.rule if request.url_rule else '<unmatched>'}"
+    if request_profiler.should_profile(route, request.path, session.get('user_email')):
+        g.profile = (route, request_profiler.start(route))
+
+
+@app.teardown_request
+def finish_request_profile(exc=None):
+    profile = g.pop('profile', None)
+    if profile:
+        request_profiler.stop(*profile)
+
+
+# ============================================================================
+# ROUTES
+# ============================================================================
+
+@app.route('/')
+def landing():
+    """Landing page"""
+    if 'credentials' in session:
+        return redirect(url_for('dashboard'))
+    return render_template('landing.html')
+
+
+@app.route('/login')
+def login():
+    """Initiate Google OAuth flow"""
+    from google_auth_oauthlib.flow import Flow
+
+    flow = Flow.from_client_config(
+        {
+            "web": {
+                "client_id": GOOGLE_CLIENT_ID,
+                "client_secret": GOOGLE_CLIENT_SECRET,
+                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+                "token_uri": "https://oauth2.googleapis.com/token",
+            }
+        },
+        scopes=SCOPES,
+        redirect_uri=REDIRECT_URI
+    )
+
+    authorization_url, state = flow.authorization_url(
+        access_type='offline',
+        include_granted_scopes='true'
+    )
+
+    session['state'] = state
+    session.permanent = True  # Make session persistent
+    logger.info(f"OAuth flow initiated, state: {state}")
+    return redirect(authorization_url)
+
+
+@app.route('/oauth2callback')
+def oauth2callback():
+    """Handle OAuth callback"""
+    # Get state from session
+    state = session.get('state')
+
+    logger.info(f"OAuth callback received, state in session: {state}")
+    logger.info(f"Request URL: {request.url}")
+
+    if not state:
+        logger.error("No state in session!")
+        return render_template('error.html',
+            title='Session Expired',
+            message='Your session expired. This can happen if you pressed the back button or took too long.',
+            action_text='Sign in again',
             action_url='/'
         ), 400
 
     try:
+        from google_auth_oauthlib.flow import Flow
+
         flow = Flow.from_client_config(
             {
                 "web": {
@@ -655,25 +3079,20 @@ def oauth2callback():
         flow.fetch_token(authorization_response=request.url)
 
         credentials = flow.credentials
-        session['credentials'] = {
-            'token': credentials.token,
-            'refresh_token': credentials.refresh_token,
-            'token_uri': credentials.token_uri,
-            'client_id': credentials.client_id,
-            'client_secret': credentials.client_secret,
-            'scopes': credentials.scopes
-        }
+        session['credentials'] = credentials_to_dict(credentials)
 
         # Get user info
-        from google.oauth2.credentials import Credentials as OAuthCredentials
-        creds = OAuthCredentials(**session['credentials'])
-
-        user_info_service = build('oauth2', 'v2', credentials=creds)
+        user_info_service = build_service('oauth2', 'v2', credentials=credentials)
         user_info = user_info_service.userinfo().get().execute()
 
         session['user_email'] = user_info.get('email')
         session['user_name'] = user_info.get('name')
         session.permanent = True
+        if hasattr(session, 'regenerate'):
+            session.regenerate()
+
+        credential_manager.register(session_user_key(), credentials_from_dict(session['credentials']))
+        warm_user_caches()
 
         logger.info(f"User authenticated: {session['user_email']}")
         return redirect(url_for('dashboard'))
@@ -690,14 +3109,23 @@ def oauth2callback():
 @app.route('/logout')
 def logout():
     """Log out user"""
+    if 'credentials' in session:
+        cache_warmer.cancel(session_user_key())
+        _root_folder_cache.pop(session_user_key(), None)
+        credential_manager.forget(session_user_key())
     session.clear()
-    return redirect(url_for('landing'))
+
+    # Drop page content cached in the browser (IndexedDB) on shared machines
+    response = redirect(url_for('landing'))
+    response.headers['Clear-Site-Data'] = '"storage"'
+    return response
 
 
 @app.route('/dashboard')
 @login_required
 def dashboard():
     """Main dashboard page"""
+    warm_user_caches()
     return render_template('dashboard.html')
 
 
@@ -705,6 +3133,61 @@ def dashboard():
 # API ROUTES
 # ============================================================================
 
+@app.route('/api/metrics', methods=['GET'])
+@admin_required
+def api_metrics():
+    """Runtime metrics for this worker process"""
+    return jsonify({
+        'compression': compression_stats.snapshot(),
+        'exports': export_scheduler.snapshot(),
+        'drive_reads': drive_reads.snapshot()
+    })
+
+
+@app.route('/api/admin/profiler', methods=['GET'])
+@admin_required
+def api_profiler_report():
+    """Profiling session and per-route CPU vs Drive I/O time, merged across workers"""
+    return jsonify({'session': request_profiler.config(), 'routes': request_profiler.report()})
+
+
+@app.route('/api/admin/profiler', methods=['POST'])
+@admin_required
+def api_profiler_start():
+    """Start profiling: {sample_rate, route, user, duration} (route and user optional)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        sample_rate = float(data.get('sample_rate', 0.1))
+        duration = int(data.get('duration', 300))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'sample_rate and duration must be numbers'}), 400
+    if not 0 < sample_rate <= 1 or not 0 < duration <= PROFILER_MAX_DURATION:
+        return jsonify({'error': f'sample_rate must be in (0, 1] and duration in (0, {PROFILER_MAX_DURATION}]'}), 400
+
+    try:
+        config = request_profiler.configure(sample_rate, data.get('route'), data.get('user'), duration)
+    except OSError as e:
+        logger.error(f"Could not start profiler: {e}")
+        return jsonify({'error': 'Failed to start profiler'}), 500
+    logger.info(f"Profiler started by {session.get('user_email')}: {config}")
+    return jsonify({'success': True, 'session': config})
+
+
+@app.route('/api/admin/profiler', methods=['DELETE'])
+@admin_required
+def api_profiler_stop():
+    """Stop profiling (results are kept until the next session starts)"""
+    request_profiler.disable()
+    return jsonify({'success': True})
+
+
+@app.route('/api/admin/profiler/stacks', methods=['GET'])
+@admin_required
+def api_profiler_stacks():
+    """Collapsed stacks for flamegraph.pl, speedscope or inferno"""
+    return request_profiler.collapsed_stacks(), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+
 @app.route('/api/user')
 @login_required
 def api_user():
@@ -867,6 +3350,10 @@ def api_save_global_settings():
         if not dm:
             return jsonify({'error': 'Not authenticated'}), 401
 
+        kindle_email = (settings or {}).get('kindle_email')
+        if kindle_email and not is_valid_email(kindle_email):
+            return jsonify({'error': 'Kindle email must be a single email address'}), 400
+
         logger.info("Saving global settings")
         success = dm.save_global_settings(settings)
 
@@ -901,7 +3388,15 @@ def api_rename_page(filename):
         if success:
             # Return with .md extension added
             final_name = new_filename if new_filename.endswith('.md') else f"{new_filename}.md"
-            return jsonify({'success': True, 'new_filename': final_name}), 200
+            # Pages linking to the old name are rewritten in the background
+            updated_pages = []
+            if data.get('update_links'):
+                old_name = filename if filename.endswith('.md') else f"{filename}.md"
+                links = dm.get_link_index(book_name) or {}
+                updated_pages = sorted(page for page, targets in links.items() if old_name in targets)
+                if updated_pages:
+                    start_link_rewrite(dm, book_name, old_name, final_name)
+            return jsonify({'success': True, 'new_filename': final_name, 'updated_pages': updated_pages}), 200
         else:
             return jsonify({'error': 'Failed to rename page (may already exist)'}), 400
     except Exception as e:
@@ -909,6 +3404,76 @@ def api_rename_page(filename):
         return jsonify({'error': 'Failed to rename page'}), 500
 
 
+@app.route('/api/pages/<path:filename>/backlinks', methods=['GET'])
+@login_required
+def api_page_backlinks(filename):
+    """List pages that link to a page"""
+    try:
+        book_name = request.args.get('book')
+        if not book_name:
+            return jsonify({'error': 'Book name required'}), 400
+
+        dm = get_drive_manager()
+        if not dm:
+            return jsonify({'error': 'Not authenticated'}), 401
+
+        links = dm.get_link_index(book_name)
+        if links is None:
+            return jsonify({'error': 'Book not found'}), 404
+
+        page = filename if filename.endswith('.md') else f"{filename}.md"
+        return jsonify({
+            'page': page,
+            'backlinks': build_backlinks(links).get(page, []),
+            'links': links.get(page, [])
+        })
+    except Exception as e:
+        logger.error(f"Error getting backlinks: {e}")
+        return jsonify({'error': 'Failed to load backlinks'}), 500
+
+
+@app.route('/api/books/<book_name>/links', methods=['GET'])
+@login_required
+def api_book_links(book_name):
+    """Get the internal link graph of a book, including broken links"""
+    try:
+        dm = get_drive_manager()
+        if not dm:
+            return jsonify({'error': 'Not authenticated'}), 401
+
+        links = dm.get_link_index(book_name)
+        if links is None:
+            return jsonify({'error': 'Book not found'}), 404
+
+        return jsonify({
+            'links': links,
+            'backlinks': build_backlinks(links),
+            'broken': find_broken_links(links)
+        })
+    except Exception as e:
+        logger.error(f"Error getting book links: {e}")
+        return jsonify({'error': 'Failed to load book links'}), 500
+
+
+@app.route('/api/health/drive', methods=['GET'])
+@login_required
+def api_drive_health():
+    """Check the user's Drive folder structure for duplicates, orphans and bad settings"""
+    try:
+        from tools.verify_drive_structure import DriveScanner
+
+        # The user's Drive client is safe to share between the scanner's threads
+        drive = get_user_credentials().service('drive', 'v3')
+        scanner = DriveScanner(lambda: drive)
+        report = scanner.scan()
+
+        logger.info(f"Drive health check: {len(report['errors'])} errors, {len(report['warnings'])} warnings")
+        return jsonify(report)
+    except Exception as e:
+        logger.error(f"Error checking Drive structure: {e}")
+        return jsonify({'error': 'Failed to check Drive structure'}), 500
+
+
 @app.route('/editor/<book_name>')
 @login_required
 def editor(book_name):
@@ -939,6 +3504,174 @@ def api_list_pages():
         return jsonify({'error': 'Failed to list pages from Drive'}), 500
 
 
+@app.route('/api/books/<book_name>/revisions', methods=['GET'])
+@login_required
+def api_page_revisions(book_name):
+    """Chapter order and current revision of every page, for editor caches"""
+    try:
+        dm = get_drive_manager()
+        if not dm:
+            return jsonify({'error': 'Not authenticated'}), 401
+
+        manifest = dm.get_manifest(book_name)
+        if manifest is None:
+            return jsonify({'error': 'Book not found'}), 404
+
+        return jsonify({
+            'order': manifest['order'],
+            'revisions': {name: page['md5'] for name, page in manifest['pages'].items()}
+        })
+    except Exception as e:
+        logger.error(f"Error listing page revisions: {e}")
+        return jsonify({'error': 'Failed to list page revisions'}), 500
+
+
+def format_sse(event, data, event_id=None):
+    """One server-sent event"""
+    lines = [f"id: {event_id}"] if event_id else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+@app.route('/api/books/<book_name>/events', methods=['GET'])
+@login_required
+def api_book_events(book_name):
+    """Stream page changes in a book as server-sent events.
+
+    Events: created, updated, renamed, deleted and order (see
+    manifest_changes), plus resync with the full order and revisions when
+    the client can't be caught up from the backlog.
+
+    A worker keeps at most CHANGE_FEED_MAX_STREAMS open; past that the
+    browser gets a stream that only sets a longer reconnect delay.
+    """
+    if not change_feed_streams.acquire(blocking=False):
+        retry_ms = int(CHANGE_FEED_BUSY_RETRY * 1000 * (1 + random.random()))
+        return app.response_class(f"retry: {retry_ms}\n\n", mimetype='text/event-stream',
+                                  headers={'Cache-Control': 'no-cache'})
+    try:
+        response = open_change_feed(book_name)
+    except BaseException:
+        change_feed_streams.release()
+        raise
+    if isinstance(response, tuple):
+        # An error response: no stream was opened
+        change_feed_streams.release()
+    else:
+        response.call_on_close(change_feed_streams.release)
+    return response
+
+
+def open_change_feed(book_name):
+    """The event stream response for api_book_events, or an error response"""
+    try:
+        user = get_user_credentials()
+        dm = get_drive_manager()
+        if not dm:
+            return jsonify({'error': 'Not authenticated'}), 401
+
+        book_id = dm._get_book_id(book_name)
+        if not book_id:
+            return jsonify({'error': 'Book not found'}), 404
+    except Exception as e:
+        logger.error(f"Error opening change feed: {e}")
+        return jsonify({'error': 'Failed to open change feed'}), 500
+
+    position = change_feed.position()
+    last_seen = change_feed.parse_event_id(request.headers.get('Last-Event-ID'))
+    backlog = change_feed.since(book_id, last_seen) if last_seen is not None else None
+    root_folder_id = dm.root_folder_id
+
+    def stream():
+        feed_dm = user.drive_manager(root_folder_id)
+        started = last_poll = time.time()
+        seq = position
+        yield "retry: 2000\n\n"
+
+        if backlog is None:
+            manifest = feed_dm.get_manifest(book_name) or {'order': [], 'pages': {}}
+            yield format_sse('resync', {
+                'order': manifest['order'],
+                'revisions': {name: page['md5'] for name, page in manifest['pages'].items()}
+            }, change_feed.event_id(seq))
+        else:
+            for seq, event in backlog:
+                yield format_sse(event['type'], event, change_feed.event_id(seq))
+            seq = max(seq, position)
+
+        while time.time() - started < CHANGE_FEED_MAX_AGE:
+            events = change_feed.wait(book_id, seq, CHANGE_FEED_HEARTBEAT)
+            if events:
+                for seq, event in events:
+                    yield format_sse(event['type'], event, change_feed.event_id(seq))
+            else:
+                yield ': keep-alive\n\n'
+
+            if time.time() - last_poll >= CHANGE_FEED_POLL:
+                last_poll = time.time()
+                try:
+                    # Loading the manifest publishes anything changed elsewhere
+                    if feed_dm.get_manifest(book_name) is None:
+                        return
+                except Exception as e:
+                    logger.warning(f"Change feed poll failed for {book_name}: {e}")
+
+    return app.response_class(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.route('/api/books/<book_name>/order', methods=['PUT'])
+@login_required
+def api_set_page_order(book_name):
+    """Replace the chapter order of a book"""
+    try:
+        data = request.get_json()
+        order = data.get('order')
+
+        if not isinstance(order, list):
+            return jsonify({'error': 'Page order required'}), 400
+
+        dm = get_drive_manager()
+        if not dm:
+            return jsonify({'error': 'Not authenticated'}), 401
+
+        if dm.set_page_order(book_name, order):
+            return jsonify({'success': True, 'order': order}), 200
+        else:
+            return jsonify({'error': 'Order must list every page in the book exactly once'}), 400
+    except Exception as e:
+        logger.error(f"Error reordering pages: {e}")
+        return jsonify({'error': 'Failed to reorder pages'}), 500
+
+
+@app.route('/api/books/<book_name>/order/move', methods=['POST'])
+@login_required
+def api_move_page(book_name):
+    """Move one page to just after another ('' or no `after` moves it first)"""
+    try:
+        data = request.get_json()
+        page = data.get('page')
+        after = data.get('after') or ''
+
+        if not page:
+            return jsonify({'error': 'Page name required'}), 400
+
+        dm = get_drive_manager()
+        if not dm:
+            return jsonify({'error': 'Not authenticated'}), 401
+
+        order = dm.move_page(book_name, page, after)
+        if order is None:
+            return jsonify({'error': 'Page not found'}), 404
+        return jsonify({'success': True, 'order': order}), 200
+    except Exception as e:
+        logger.error(f"Error moving page: {e}")
+        return jsonify({'error': 'Failed to move page'}), 500
+
+
 @app.route('/api/pages/<path:filename>', methods=['GET'])
 @login_required
 def api_get_page(filename):
@@ -952,6 +3685,11 @@ def api_get_page(filename):
         if not dm:
             return "Not authenticated", 401
 
+        # Editors that already hold the current revision skip the download
+        revision = dm.get_page_revision(book_name, filename)
+        if revision and revision in request.if_none_match:
+            return '', 304, {'ETag': f'"{revision}"', 'Cache-Control': 'no-cache'}
+
         logger.info(f"Getting page: {filename} from book: {book_name}")
         content = dm.read_page(book_name, filename)
 
@@ -959,7 +3697,11 @@ def api_get_page(filename):
             return "Page not found", 404
 
         # Return plain text, not JSON
-        return content, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+        return content, 200, {
+            'Content-Type': 'text/plain; charset=utf-8',
+            'ETag': f'"{page_revision(content)}"',
+            'Cache-Control': 'no-cache'
+        }
     except Exception as e:
         logger.error(f"Error reading page: {e}")
         return f"Error: {str(e)}", 500
@@ -982,10 +3724,10 @@ def api_save_page(filename):
             return jsonify({'error': 'Not authenticated'}), 401
 
         logger.info(f"Saving page: {filename} to book: {book_name}")
-        success = dm.write_page(book_name, filename, content)
+        success = dm.write_page(book_name, filename, content, after=data.get('after'))
 
         if success:
-            return jsonify({'success': True, 'filename': filename}), 200
+            return jsonify({'success': True, 'filename': filename, 'revision': page_revision(content)}), 200
         else:
             return jsonify({'error': 'Failed to save page'}), 500
     except Exception as e:
@@ -1021,7 +3763,14 @@ def api_delete_page(filename):
 @app.route('/api/books/<book_name>/download', methods=['GET'])
 @login_required
 def api_download_book(book_name):
-    """Download book as EPUB or PDF"""
+    """Download book as EPUB or PDF.
+
+    Finished files are cached on disk by export fingerprint, so repeat
+    downloads of an unchanged book are served from disk with ETag and
+    Last-Modified, and support HEAD and Range requests (resumable downloads).
+    HEAD only reports on the cache: an export that isn't cached yet is a
+    404 rather than being generated.
+    """
     try:
         format_type = request.args.get('format', 'epub').lower()
 
@@ -1032,86 +3781,738 @@ def api_download_book(book_name):
         if not dm:
             return jsonify({'error': 'Not authenticated'}), 401
 
-        logger.info(f"Generating {format_type.upper()} for book: {book_name}")
-
         # Get book settings
         settings = dm.get_book_settings(book_name)
         book_title = settings.get('title', book_name)
         cover_base64 = settings.get('cover')
 
         # Get all pages
-        pages = dm.list_pages(book_name)
-        if not pages:
+        book_id = dm._get_book_id(book_name)
+        manifest = dm.get_manifest(book_name)
+        pages = list(manifest['order']) if manifest else []
+        if not book_id or not pages:
             return jsonify({'error': 'No pages found in book'}), 404
 
-        # Sort pages by name
-        pages.sort()
-
-        # Generate the book
-        if format_type == 'epub':
-            file_data = generate_epub(dm, book_name, book_title, pages, cover_base64)
-            mimetype = 'application/epub+zip'
-            filename = f"{book_name}.epub"
-        else:  # pdf
-            file_data = generate_pdf(dm, book_name, book_title, pages, cover_base64)
-            mimetype = 'application/pdf'
-            filename = f"{book_name}.pdf"
-
-        # Return the file
-        return send_file(
-            BytesIO(file_data),
+        mimetype = 'application/epub+zip' if format_type == 'epub' else 'application/pdf'
+        filename = f"{book_name}.{format_type}"
+        fingerprint = export_fingerprint(format_type, book_id, book_name, manifest, settings)
+
+        path = cached_export_path(fingerprint, format_type)
+        if path:
+            logger.info(f"Serving cached {format_type.upper()} for book: {book_name}")
+        elif request.method == 'HEAD':
+            return '', 404
+        else:
+            # Wait for memory to render in, or tell the client to come back later
+            ticket = export_scheduler.admit(
+                session_user_key(), estimate_export_memory(format_type, manifest, cover_base64)
+            )
+            if not ticket:
+                logger.warning(f"Export of {book_name} refused: over the export memory budget")
+                return export_busy_response()
+
+            logger.info(f"Generating {format_type.upper()} for book: {book_name}")
+            try:
+                # Generate the book
+                if format_type == 'epub':
+                    file_data = generate_epub(dm, book_name, book_title, pages, cover_base64)
+                else:  # pdf
+                    file_data = generate_pdf(dm, book_name, book_title, pages, cover_base64, settings)
+            finally:
+                export_scheduler.release(ticket)
+
+            path = store_export(fingerprint, format_type, file_data)
+            if not path:
+                return send_file(BytesIO(file_data), mimetype=mimetype, as_attachment=True, download_name=filename)
+
+        # Return the file; send_file answers If-None-Match, If-Modified-Since and Range itself
+        response = send_file(
+            path,
             mimetype=mimetype,
             as_attachment=True,
-            download_name=filename
+            download_name=filename,
+            conditional=True,
+            etag=fingerprint,
+            last_modified=os.path.getmtime(path)
         )
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
 
     except Exception as e:
         logger.error(f"Error generating {format_type}: {e}", exc_info=True)
         return jsonify({'error': f'Failed to generate {format_type.upper()}'}), 500
 
 
-def generate_epub(dm, book_name, book_title, pages, cover_base64=None):
-    """Generate EPUB file from markdown pages"""
-    from ebooklib import epub
+# ============================================================================
+# EXPORT RENDERING
+# ============================================================================
+
+# Chapter rendering fans out over a process pool; a size of 1 (the default) renders in-process
+EXPORT_POOL_SIZE = int(os.environ.get('EXPORT_POOL_SIZE') or 1)
+
+# Books with fewer chapters than this render in-process (pool IPC isn't worth it)
+EXPORT_POOL_MIN_CHAPTERS = int(os.environ.get('EXPORT_POOL_MIN_CHAPTERS') or 8)
+
+# Resident memory of one pool process: each is a fresh interpreter that imports this module
+EXPORT_POOL_PROCESS_MEMORY = int(float(os.environ.get('EXPORT_POOL_PROCESS_MEMORY_MB', '80')) * 1024 * 1024)
+
+MARKDOWN_EXTRAS = ['fenced-code-blocks', 'tables', 'header-ids']
+
+_export_pool = None
+_export_pool_lock = threading.Lock()
+_export_pool_reserved = False
+
+
+def uses_export_pool(chapter_count):
+    """Whether a book with this many chapters is rendered on the export pool"""
+    return EXPORT_POOL_SIZE > 1 and chapter_count >= EXPORT_POOL_MIN_CHAPTERS
+
+
+def start_export_pool():
+    """Start this process's chapter rendering pool.
+
+    gunicorn.conf.py calls this in each worker right after it forks. The
+    pool spawns its processes rather than forking them, as forking a worker
+    that already runs threads can copy a lock some other thread holds. Its
+    processes' memory comes out of the export budget for as long as they live.
+    """
+    global _export_pool, _export_pool_reserved
+    if EXPORT_POOL_SIZE <= 1:
+        return None
+    with _export_pool_lock:
+        if _export_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            _export_pool = ProcessPoolExecutor(
+                max_workers=EXPORT_POOL_SIZE, mp_context=multiprocessing.get_context('spawn')
+            )
+            logger.info(f"Started export pool with {EXPORT_POOL_SIZE} workers")
+        if not _export_pool_reserved:
+            reserved = EXPORT_POOL_SIZE * EXPORT_POOL_PROCESS_MEMORY
+            export_scheduler.budget = max(EXPORT_MEMORY_OVERHEAD, export_scheduler.budget - reserved)
+            _export_pool_reserved = True
+        return _export_pool
+
+
+def get_export_pool():
+    """Get the chapter rendering pool, restarting it if a worker died"""
+    return _export_pool or start_export_pool()
+
+
+def render_chapters(render_func, chapters):
+    """Render (page_file, content) pairs with render_func, preserving order.
+
+    Large books are spread across the export pool; render_func and its
+    results must be picklable.
+    """
+    if not uses_export_pool(len(chapters)):
+        return [render_func(page_file, content) for page_file, content in chapters]
+
+    global _export_pool
+    from concurrent.futures.process import BrokenProcessPool
+
+    page_files = [page_file for page_file, _ in chapters]
+    contents = [content for _, content in chapters]
+    chunksize = max(1, len(chapters) // (EXPORT_POOL_SIZE * 4))
+
+    # Requests being profiled have the pool workers sampled too
+    profiled_route = request_profiler.current_route()
+    task = ProfiledTask(render_func) if profiled_route else render_func
+
+    try:
+        results = list(get_export_pool().map(task, page_files, contents, chunksize=chunksize))
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); drop the pool and finish in-process
+        logger.warning("Export pool broken, rendering chapters in-process")
+        with _export_pool_lock:
+            _export_pool = None
+        return [render_func(page_file, content) for page_file, content in chapters]
+
+    if not profiled_route:
+        return results
+    rendered = []
+    for result, stacks, cpu_seconds in results:
+        request_profiler.record_pool(profiled_route, stacks, cpu_seconds)
+        rendered.append(result)
+    return rendered
+
+
+def page_title_from_filename(page_file):
+    """Human-readable chapter title for a page filename"""
+    return page_file.replace('.md', '').replace('_', ' ')
+
+
+def render_epub_chapter(page_file, content):
+    """Convert one page's markdown to chapter HTML"""
+    import markdown2
+
+    return markdown2.markdown(content, extras=MARKDOWN_EXTRAS)
+
+
+def escape_para_text(text):
+    """Escape text for ReportLab paragraph markup"""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+class MarkdownFlowableConverter:
+    """Single-pass markdown to ReportLab flowables converter.
+
+    Scans block structure line by line and turns inline markup straight into
+    ReportLab paragraph markup, so chapters are never rendered to HTML and
+    parsed back. Handles headings, paragraphs, bold/italic/strike/code spans,
+    links, nested lists, tables, block quotes, rules, code blocks and images.
+    """
+
+    FENCE_RE = re.compile(r'^\s*(`{3,}|~{3,})')
+    HEADING_RE = re.compile(r'^\s{0,3}(#{1,6})\s+(.*?)(?:\s+#+)?\s*$')
+    HR_RE = re.compile(r'^\s{0,3}([-*_])(?:\s*\1){2,}\s*$')
+    LIST_RE = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+    TABLE_SEP_RE = re.compile(r'^\s*\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?\s*$')
+    IMAGE_RE = re.compile(r'^\s*!\[([^\]]*)\]\(\s*([^)\s]+)(?:\s+"[^"]*")?\s*\)\s*$')
+    INLINE_RE = re.compile(
+        r'\\(?P<escaped>[\\`*_{}\[\]()#+\-.!~|>])'
+        r'|(?P<code>`+)(?P<code_text>.+?)(?P=code)'
+        r'|!\[(?P<img_alt>[^\]]*)\]\([^)]*\)'
+        r'|\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]+)(?:\s+"[^"]*")?\)'
+        r'|<(?P<autolink>https?://[^>\s]+)>'
+        r'|(?P<strong>\*\*|__)(?P<strong_text>.+?)(?P=strong)'
+        r'|\*(?P<em_text>[^*\s](?:.*?[^*\s])?)\*'
+        r'|(?<!\w)_(?P<em2_text>[^_\s](?:.*?[^_\s])?)_(?!\w)'
+        r'|~~(?P<strike_text>.+?)~~'
+    )
+    # Marks a hard line break (two trailing spaces) until inline conversion is done
+    LINE_BREAK = '\x00'
+
+    def __init__(self, styles, colors, frame_width, frame_height):
+        self.styles = styles
+        self.colors = colors
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+
+    def convert(self, content):
+        """Convert a page's markdown to a list of flowables"""
+        return self._blocks(content.expandtabs(4).splitlines())
+
+    # ----- Block level -----
+
+    def _blocks(self, lines):
+        from reportlab.platypus import Paragraph, Preformatted, Indenter
+        from reportlab.platypus.flowables import HRFlowable
+        from reportlab.lib.colors import HexColor
+
+        styles = self.styles
+        story = []
+        paragraph = []
+
+        def flush_paragraph():
+            if paragraph:
+                text = ' '.join(paragraph)
+                story.append(Paragraph(self._inline(text).replace(self.LINE_BREAK, '<br/>'), styles['body']))
+                paragraph.clear()
+
+        i, n = 0, len(lines)
+        while i < n:
+            line = lines[i]
+            stripped = line.strip()
+
+            if not stripped:
+                flush_paragraph()
+                i += 1
+                continue
+
+            fence = self.FENCE_RE.match(line)
+            if fence:
+                flush_paragraph()
+                marker = fence.group(1)
+                code = []
+                i += 1
+                while i < n and not lines[i].strip().startswith(marker):
+                    code.append(lines[i])
+                    i += 1
+                i += 1  # Closing fence
+                story.append(Preformatted('\n'.join(code), styles['code']))
+                continue
+
+            heading = self.HEADING_RE.match(line)
+            if heading:
+                flush_paragraph()
+                level = min(len(heading.group(1)), 3)
+                story.append(Paragraph(self._inline(heading.group(2)), styles[f'h{level}']))
+                i += 1
+                continue
+
+            if self.HR_RE.match(line):
+                flush_paragraph()
+                story.append(HRFlowable(width='100%', thickness=0.5, color=HexColor(self.colors['rule']),
+                                        spaceBefore=6, spaceAfter=6))
+                i += 1
+                continue
+
+            if stripped.startswith('>'):
+                flush_paragraph()
+                quoted = []
+                while i < n and lines[i].strip().startswith('>'):
+                    quoted.append(re.sub(r'^\s*> ?', '', lines[i]))
+                    i += 1
+                story.append(Indenter(left=18))
+                story.extend(self._blocks(quoted))
+                story.append(Indenter(left=-18))
+                continue
+
+            if '|' in line and i + 1 < n and '|' in lines[i + 1] and self.TABLE_SEP_RE.match(lines[i + 1]):
+                flush_paragraph()
+                rows = [self._table_cells(line)]
+                i += 2
+                while i < n and lines[i].strip() and '|' in lines[i]:
+                    rows.append(self._table_cells(lines[i]))
+                    i += 1
+                story.append(self._table(rows))
+                continue
+
+            if self.LIST_RE.match(line):
+                flush_paragraph()
+                items = []
+                while i < n:
+                    item = self.LIST_RE.match(lines[i])
+                    if item:
+                        items.append([len(item.group(1)), item.group(2)[0].isdigit(), [item.group(3).strip()]])
+                    elif lines[i].strip() and lines[i][:1].isspace():
+                        items[-1][2].append(lines[i].strip())  # Continuation line
+                    elif not lines[i].strip() and i + 1 < n and (
+                            self.LIST_RE.match(lines[i + 1]) or lines[i + 1][:1].isspace()):
+                        pass  # Blank line inside a loose list
+                    else:
+                        break
+                    i += 1
+                start = 0
+                while start < len(items):
+                    flowable, start = self._list(items, start)
+                    story.append(flowable)
+                continue
+
+            image = self.IMAGE_RE.match(line)
+            if image and not paragraph:
+                story.append(self._image(image.group(1), image.group(2)))
+                i += 1
+                continue
+
+            paragraph.append(stripped + (self.LINE_BREAK if line.endswith('  ') else ''))
+            i += 1
+
+        flush_paragraph()
+        return story
+
+    def _list(self, items, start):
+        """Build a (possibly nested) list from items[start:], returning (flowable, next index)"""
+        from reportlab.platypus import Paragraph, ListFlowable, ListItem
+
+        indent, ordered = items[start][0], items[start][1]
+        entries = []
+        i = start
+        while i < len(items) and items[i][0] >= indent:
+            if items[i][0] > indent:
+                sublist, i = self._list(items, i)
+                entries[-1].append(sublist)
+                continue
+            text = ' '.join(items[i][2])
+            entries.append([Paragraph(self._inline(text).replace(self.LINE_BREAK, '<br/>'), self.styles['list'])])
+            i += 1
+
+        if ordered:
+            flowable = ListFlowable([ListItem(entry) for entry in entries], bulletType='1', leftIndent=18)
+        else:
+            flowable = ListFlowable([ListItem(entry) for entry in entries], bulletType='bullet',
+                                    leftIndent=18, bulletFontSize=8)
+        return flowable, i
+
+    @staticmethod
+    def _table_cells(line):
+        line = line.strip()
+        if line.startswith('|'):
+            line = line[1:]
+        if line.endswith('|') and not line.endswith('\\|'):
+            line = line[:-1]
+        return [cell.strip().replace('\\|', '|') for cell in re.split(r'(?<!\\)\|', line)]
+
+    def _table(self, rows):
+        from reportlab.platypus import Paragraph, Table, TableStyle
+        from reportlab.lib.colors import HexColor
+
+        columns = max(len(row) for row in rows)
+        data = []
+        for r, row in enumerate(rows):
+            style = self.styles['table_header' if r == 0 else 'table_cell']
+            cells = row + [''] * (columns - len(row))
+            data.append([Paragraph(self._inline(cell), style) for cell in cells])
+
+        table = Table(data, colWidths=[self.frame_width / columns] * columns, repeatRows=1)
+        table.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, HexColor(self.colors['rule'])),
+            ('BACKGROUND', (0, 0), (-1, 0), HexColor(self.colors['table_header_bg'])),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]))
+        return table
+
+    def _image(self, alt, src):
+        """Image flowable scaled to fit the frame, or its alt text if it can't be loaded.
+
+        Only images embedded in the page (data: URIs, as the editor inserts
+        them) are drawn; the server never fetches a URL named in a page.
+        """
+        from reportlab.platypus import Image, Paragraph
+        from reportlab.lib.utils import ImageReader
+        import base64
+
+        try:
+            if not src.startswith('data:'):
+                raise ValueError(f"not an embedded image: {src[:40]}")
+            data = base64.b64decode(src.split(',', 1)[1])
+
+            width, height = ImageReader(BytesIO(data)).getSize()
+            scale = min(1.0, self.frame_width / width, self.frame_height * 0.8 / height)
+            return Image(BytesIO(data), width=width * scale, height=height * scale)
+        except Exception as e:
+            logger.warning(f"Failed to add image to PDF: {e}")
+            return Paragraph(f'<i>[{escape_para_text(alt or "image")}]</i>', self.styles['body'])
+
+    # ----- Inline level -----
+
+    def _inline(self, text):
+        """Convert inline markdown to ReportLab paragraph markup"""
+        out = []
+        pos = 0
+        for m in self.INLINE_RE.finditer(text):
+            out.append(escape_para_text(text[pos:m.start()]))
+            pos = m.end()
+            group = m.group
+
+            if group('escaped') is not None:
+                out.append(escape_para_text(group('escaped')))
+            elif group('code'):
+                out.append(f'<font face="Courier" backColor="{self.colors["inline_code_bg"]}">'
+                           f'{escape_para_text(group("code_text").strip())}</font>')
+            elif group('img_alt') is not None:
+                out.append(f'<i>[{escape_para_text(group("img_alt") or "image")}]</i>')
+            elif group('link_text') is not None:
+                url = group('link_url')
+                label = self._inline(group('link_text'))
+                if url.startswith(('http://', 'https://', 'mailto:')):
+                    href = escape_para_text(url).replace('"', '&quot;')
+                    out.append(f'<a href="{href}" color="{self.colors["link"]}">{label}</a>')
+                else:
+                    # Internal page links have no target inside the PDF
+                    out.append(f'<u>{label}</u>')
+            elif group('autolink') is not None:
+                href = escape_para_text(group('autolink')).replace('"', '&quot;')
+                out.append(f'<a href="{href}" color="{self.colors["link"]}">{href}</a>')
+            elif group('strong_text') is not None:
+                out.append(f'<b>{self._inline(group("strong_text"))}</b>')
+            elif group('em_text') is not None:
+                out.append(f'<i>{self._inline(group("em_text"))}</i>')
+            elif group('em2_text') is not None:
+                out.append(f'<i>{self._inline(group("em2_text"))}</i>')
+            elif group('strike_text') is not None:
+                out.append(f'<strike>{self._inline(group("strike_text"))}</strike>')
+
+        out.append(escape_para_text(text[pos:]))
+        return ''.join(out)
+
+
+# Page sizes (width, height in points) available to PDF exports
+PDF_PAGE_SIZES = {
+    'letter': (612.0, 792.0),
+    'a4': (595.28, 841.89),
+    'a5': (419.53, 595.28),
+    'trade': (432.0, 648.0),  # 6 x 9 in
+}
+
+# Colour themes for PDF exports
+PDF_THEMES = {
+    'default': {
+        'title': '#3fb950',
+        'h1': '#3fb950',
+        'h2': '#58a6ff',
+        'h3': '#8b949e',
+        'code_bg': '#21262d',
+        'code_text': '#e6edf3',
+        'inline_code_bg': '#eaeef2',
+        'link': '#58a6ff',
+        'rule': '#8b949e',
+        'table_header_bg': '#e6edf3',
+    },
+    'print': {
+        'title': '#000000',
+        'h1': '#000000',
+        'h2': '#24292f',
+        'h3': '#57606a',
+        'code_bg': '#f6f8fa',
+        'code_text': '#24292f',
+        'inline_code_bg': '#f6f8fa',
+        'link': '#0969da',
+        'rule': '#d0d7de',
+        'table_header_bg': '#f6f8fa',
+    },
+}
+
+PDF_DEFAULT_MARGIN = 0.75  # inches
+
+
+class PDFRenderer:
+    """Renders markdown chapters to PDF with a fixed page layout and theme.
+
+    Styles are built once per instance, and instances are shared per process
+    through get_pdf_renderer(). Pickling a renderer (e.g. to send
+    render_chapter to the export pool) resolves to the worker's own cached
+    instance instead of copying styles across.
+    """
+
+    def __init__(self, page_size='letter', margin=PDF_DEFAULT_MARGIN, theme='default'):
+        self.page_size = page_size
+        self.margin = margin
+        self.theme = theme
+        self.styles = self._build_styles(PDF_THEMES[theme])
+
+        width, height = PDF_PAGE_SIZES[page_size]
+        margin_points = margin * 72  # inches to points
+        self.converter = MarkdownFlowableConverter(
+            self.styles,
+            PDF_THEMES[theme],
+            width - 2 * margin_points,
+            height - 2 * margin_points
+        )
+
+    def __reduce__(self):
+        return (get_pdf_renderer, (self.page_size, self.margin, self.theme))
+
+    @staticmethod
+    def _build_styles(colors):
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+        from reportlab.lib.colors import HexColor
+
+        styles = getSampleStyleSheet()
+
+        return {
+            'title': ParagraphStyle(
+                'CustomTitle',
+                parent=styles['Heading1'],
+                fontSize=28,
+                textColor=HexColor(colors['title']),
+                spaceAfter=30,
+                alignment=TA_CENTER,
+                fontName='Helvetica-Bold'
+            ),
+            'h1': ParagraphStyle(
+                'CustomH1',
+                parent=styles['Heading1'],
+                fontSize=20,
+                textColor=HexColor(colors['h1']),
+                spaceAfter=12,
+                spaceBefore=16,
+                fontName='Helvetica-Bold'
+            ),
+            'h2': ParagraphStyle(
+                'CustomH2',
+                parent=styles['Heading2'],
+                fontSize=16,
+                textColor=HexColor(colors['h2']),
+                spaceAfter=10,
+                spaceBefore=12,
+                fontName='Helvetica-Bold'
+            ),
+            'h3': ParagraphStyle(
+                'CustomH3',
+                parent=styles['Heading3'],
+                fontSize=14,
+                textColor=HexColor(colors['h3']),
+                spaceAfter=8,
+                spaceBefore=10,
+                fontName='Helvetica-Bold'
+            ),
+            'body': ParagraphStyle(
+                'CustomBody',
+                parent=styles['BodyText'],
+                fontSize=11,
+                leading=16,
+                alignment=TA_JUSTIFY,
+                spaceAfter=8
+            ),
+            'list': ParagraphStyle(
+                'CustomList',
+                parent=styles['BodyText'],
+                fontSize=11,
+                leading=16,
+                spaceAfter=2
+            ),
+            'table_header': ParagraphStyle(
+                'CustomTableHeader',
+                parent=styles['BodyText'],
+                fontSize=10,
+                leading=13,
+                fontName='Helvetica-Bold'
+            ),
+            'table_cell': ParagraphStyle(
+                'CustomTableCell',
+                parent=styles['BodyText'],
+                fontSize=10,
+                leading=13
+            ),
+            'code': ParagraphStyle(
+                'CustomCode',
+                parent=styles['Code'],
+                fontSize=9,
+                leftIndent=20,
+                rightIndent=20,
+                spaceAfter=10,
+                spaceBefore=10,
+                backColor=HexColor(colors['code_bg']),
+                textColor=HexColor(colors['code_text']),
+                fontName='Courier'
+            ),
+        }
+
+    def render_chapter(self, page_file, content):
+        """Convert one page's markdown to a list of ReportLab flowables"""
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Paragraph, Spacer, PageBreak
+
+        story = [
+            Paragraph(escape_para_text(page_title_from_filename(page_file)), self.styles['h1']),
+            Spacer(1, 0.2*inch),
+        ]
+        story.extend(self.converter.convert(content))
+        story.append(PageBreak())
+        return story
+
+    def render(self, book_title, chapters, cover_base64=None):
+        """Render a title page plus (page_file, content) chapters to PDF bytes"""
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Image
+        import base64
+
+        output = BytesIO()
+        doc = SimpleDocTemplate(
+            output,
+            pagesize=PDF_PAGE_SIZES[self.page_size],
+            leftMargin=self.margin*inch,
+            rightMargin=self.margin*inch,
+            topMargin=self.margin*inch,
+            bottomMargin=self.margin*inch
+        )
+        story = []
+
+        # Add title page
+        story.append(Spacer(1, 2*inch))
+        story.append(Paragraph(escape_para_text(book_title), self.styles['title']))
+        story.append(Spacer(1, 0.5*inch))
+
+        # Add cover image if available
+        if cover_base64:
+            try:
+                if ',' in cover_base64:
+                    cover_base64 = cover_base64.split(',')[1]
+                cover_data = base64.b64decode(cover_base64)
+                cover_io = BytesIO(cover_data)
+                img = Image(cover_io, width=3*inch, height=4*inch)
+                story.append(img)
+            except Exception as e:
+                logger.warning(f"Failed to add cover to PDF: {e}")
+
+        story.append(PageBreak())
+
+        # Render chapters (in parallel for large books), then assemble in page order
+        for chapter_story in render_chapters(self.render_chapter, chapters):
+            story.extend(chapter_story)
+
+        # Build PDF
+        doc.build(story)
+        output.seek(0)
+        return output.read()
+
+
+@lru_cache(maxsize=32)
+def get_pdf_renderer(page_size='letter', margin=PDF_DEFAULT_MARGIN, theme='default'):
+    """Get the shared renderer for a page layout and theme"""
+    return PDFRenderer(page_size, margin, theme)
+
+
+def pdf_renderer_for_settings(settings):
+    """Get the renderer for a book's .book_settings.json, ignoring invalid values"""
+    page_size = str(settings.get('pdf_page_size') or 'letter').lower()
+    if page_size not in PDF_PAGE_SIZES:
+        page_size = 'letter'
+
+    theme = str(settings.get('pdf_theme') or 'default').lower()
+    if theme not in PDF_THEMES:
+        theme = 'default'
+
+    try:
+        margin = float(settings.get('pdf_margin', PDF_DEFAULT_MARGIN))
+    except (TypeError, ValueError):
+        margin = PDF_DEFAULT_MARGIN
+    # Clamp and round so near-identical margins share a cached renderer
+    margin = round(min(max(margin, 0.25), 2.0) * 20) / 20
+
+    return get_pdf_renderer(page_size, margin, theme)
+
+
+def read_chapters(dm, book_name, pages):
+    """Download pages in order, skipping empty ones, as (page_file, content) pairs"""
+    chapters = []
+    for page_file in pages:
+        content = dm.read_page(book_name, page_file)
+        if content:
+            chapters.append((page_file, content))
+    return chapters
+
+
+def decode_cover(cover_base64):
+    """Cover image bytes from a stored data URL (or bare base64), or None"""
     import base64
 
+    if not cover_base64:
+        return None
+    try:
+        # Extract base64 data (remove data:image/...;base64, prefix if present)
+        if ',' in cover_base64:
+            cover_base64 = cover_base64.split(',')[1]
+        return base64.b64decode(cover_base64)
+    except Exception as e:
+        logger.warning(f"Failed to decode cover image: {e}")
+        return None
+
+
+def assemble_epub(identifier, book_title, chapters, cover=None, images=()):
+    """Package rendered chapters into EPUB bytes.
+
+    `chapters` are (page_file, html) pairs in reading order, `cover` is
+    (file_name, data) and `images` are (file_name, media_type, data) items
+    referenced from the chapter HTML.
+    """
+    from ebooklib import epub
+
     book = epub.EpubBook()
 
     # Set metadata
-    book.set_identifier(f'jugaadpress-{book_name}')
+    book.set_identifier(identifier)
     book.set_title(book_title)
     book.set_language('en')
     book.add_author('JugaadPress User')
 
     # Add cover image if available
-    if cover_base64:
-        try:
-            # Extract base64 data (remove data:image/...;base64, prefix if present)
-            if ',' in cover_base64:
-                cover_base64 = cover_base64.split(',')[1]
+    if cover:
+        book.set_cover(*cover)
 
-            cover_data = base64.b64decode(cover_base64)
-            book.set_cover('cover.jpg', cover_data)
-        except Exception as e:
-            logger.warning(f"Failed to add cover image: {e}")
+    for file_name, media_type, data in images:
+        book.add_item(epub.EpubItem(file_name=file_name, media_type=media_type, content=data))
 
-    # Create chapters from pages
-    chapters = []
     toc = []
     spine = ['nav']
 
-    for i, page_file in enumerate(pages):
-        # Read page content
-        content = dm.read_page(book_name, page_file)
-        if not content:
-            continue
-
-        # Convert markdown to HTML
-        html_content = markdown2.markdown(content, extras=['fenced-code-blocks', 'tables', 'header-ids'])
-
+    for i, (page_file, html_content) in enumerate(chapters):
         # Create chapter
         chapter = epub.EpubHtml(
-            title=page_file.replace('.md', '').replace('_', ' '),
+            title=page_title_from_filename(page_file),
             file_name=f'chapter_{i}.xhtml',
             lang='en'
         )
@@ -1119,7 +4520,6 @@ def generate_epub(dm, book_name, book_title, pages, cover_base64=None):
 
         # Add to book
         book.add_item(chapter)
-        chapters.append(chapter)
         toc.append(chapter)
         spine.append(chapter)
 
@@ -1139,200 +4539,390 @@ def generate_epub(dm, book_name, book_title, pages, cover_base64=None):
     return output.read()
 
 
-def generate_pdf(dm, book_name, book_title, pages, cover_base64=None):
+def generate_epub(dm, book_name, book_title, pages, cover_base64=None):
+    """Generate EPUB file from markdown pages"""
+    cover_data = decode_cover(cover_base64)
+
+    # Render chapters (in parallel for large books), then assemble in page order
+    chapters = read_chapters(dm, book_name, pages)
+    rendered = render_chapters(render_epub_chapter, chapters)
+
+    return assemble_epub(
+        f'jugaadpress-{book_name}',
+        book_title,
+        [(page_file, html_content) for (page_file, _), html_content in zip(chapters, rendered)],
+        cover=('cover.jpg', cover_data) if cover_data else None
+    )
+
+
+def generate_pdf(dm, book_name, book_title, pages, cover_base64=None, settings=None):
     """Generate PDF file from markdown pages"""
     try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Image, Preformatted
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
-        from reportlab.lib.colors import HexColor
-        import base64
-        from html.parser import HTMLParser
+        renderer = pdf_renderer_for_settings(settings or {})
+    except ImportError:
+        # If reportlab is not installed, return error
+        logger.error("reportlab not installed - cannot generate PDF")
+        raise Exception("PDF generation requires reportlab library. Please install it: pip install reportlab")
 
-        output = BytesIO()
-        doc = SimpleDocTemplate(
-            output,
-            pagesize=letter,
-            leftMargin=0.75*inch,
-            rightMargin=0.75*inch,
-            topMargin=0.75*inch,
-            bottomMargin=0.75*inch
-        )
-        story = []
-        styles = getSampleStyleSheet()
+    chapters = read_chapters(dm, book_name, pages)
+    return renderer.render(book_title, chapters, cover_base64)
 
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=28,
-            textColor=HexColor('#3fb950'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
 
-        h1_style = ParagraphStyle(
-            'CustomH1',
-            parent=styles['Heading1'],
-            fontSize=20,
-            textColor=HexColor('#3fb950'),
-            spaceAfter=12,
-            spaceBefore=16,
-            fontName='Helvetica-Bold'
-        )
+# Finished EPUB/PDF downloads, keyed by export fingerprint and evicted least
+# recently used first once the directory outgrows EXPORT_CACHE_MAX_BYTES
+EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'jugaadpress-exports')
+EXPORT_CACHE_MAX_BYTES = int(float(os.environ.get('EXPORT_CACHE_MAX_MB', '256')) * 1024 * 1024)
 
-        h2_style = ParagraphStyle(
-            'CustomH2',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=HexColor('#58a6ff'),
-            spaceAfter=10,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        )
+# Bump when EPUB or PDF output changes so cached downloads stop matching
+EXPORT_FORMAT_VERSION = 1
 
-        h3_style = ParagraphStyle(
-            'CustomH3',
-            parent=styles['Heading3'],
-            fontSize=14,
-            textColor=HexColor('#8b949e'),
-            spaceAfter=8,
-            spaceBefore=10,
-            fontName='Helvetica-Bold'
-        )
+# Book settings that affect each download format
+EXPORT_SETTINGS_KEYS = {
+    'epub': ('title', 'cover'),
+    'pdf': ('title', 'cover', 'pdf_page_size', 'pdf_margin', 'pdf_theme'),
+}
 
-        body_style = ParagraphStyle(
-            'CustomBody',
-            parent=styles['BodyText'],
-            fontSize=11,
-            leading=16,
-            alignment=TA_JUSTIFY,
-            spaceAfter=8
-        )
 
-        code_style = ParagraphStyle(
-            'CustomCode',
-            parent=styles['Code'],
-            fontSize=9,
-            leftIndent=20,
-            rightIndent=20,
-            spaceAfter=10,
-            spaceBefore=10,
-            backColor=HexColor('#21262d'),
-            textColor=HexColor('#e6edf3'),
-            fontName='Courier'
+def export_fingerprint(format_type, book_id, book_name, manifest, settings):
+    """Fingerprint of everything that goes into a book download.
+
+    Built from manifest checksums and settings only, so checking for a
+    cached download never downloads a page. The cache is shared by every
+    user, so it's keyed on the book's Drive folder ID rather than its name.
+    """
+    digest = hashlib.sha256(f"{format_type}:{EXPORT_FORMAT_VERSION}:{book_id}:{book_name}\n".encode('utf-8'))
+    for name in manifest['order']:
+        digest.update(f"{name}:{manifest['pages'][name].get('md5')}\n".encode('utf-8'))
+    export_settings = {key: settings.get(key) for key in EXPORT_SETTINGS_KEYS[format_type]}
+    digest.update(json.dumps(export_settings, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cached_export_path(fingerprint, format_type):
+    """Path of a cached download (marked as just used), or None"""
+    path = os.path.join(EXPORT_CACHE_DIR, f"{fingerprint}.{format_type}")
+    try:
+        # Recency is kept in atime; mtime stays the build time for Last-Modified
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+        return path
+    except OSError:
+        return None
+
+
+def store_export(fingerprint, format_type, data):
+    """Cache a finished download and evict old ones; returns its path, or None on failure"""
+    path = os.path.join(EXPORT_CACHE_DIR, f"{fingerprint}.{format_type}")
+    try:
+        os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not cache {format_type.upper()} {fingerprint[:12]}: {e}")
+        return None
+
+    entries = []
+    for name in os.listdir(EXPORT_CACHE_DIR):
+        entry_path = os.path.join(EXPORT_CACHE_DIR, name)
+        try:
+            stat = os.stat(entry_path)
+        except OSError:
+            continue  # Evicted by another worker meanwhile
+        if entry_path != path and not name.endswith('.tmp'):
+            entries.append((stat.st_atime, stat.st_size, entry_path))
+
+    total = len(data) + sum(size for _, size, _ in entries)
+    for _, size, old_path in sorted(entries):
+        if total <= EXPORT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(old_path)
+        except OSError:
+            pass
+        total -= size
+    return path
+
+
+# ============================================================================
+# KINDLE DELIVERY
+# ============================================================================
+
+# Drive file recording each book's last Kindle delivery
+DELIVERY_FILE = '.book_delivery.json'
+
+# Bump when EPUB output changes so old fingerprints stop matching
+EPUB_FORMAT_VERSION = 2
+
+# Book settings that end up in the EPUB
+EPUB_SETTINGS_KEYS = ('title', 'cover')
+
+# Generated EPUBs, keyed by delivery fingerprint, so re-sends skip rendering
+EPUB_CACHE_DIR = os.environ.get('EPUB_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'jugaadpress-epub')
+EPUB_CACHE_MAX_FILES = 32
+
+# Largest encoded email Gmail will send (25 MB attachment limit, minus headroom);
+# bigger books go out as several volumes
+KINDLE_MAX_MESSAGE_BYTES = int(float(os.environ.get('KINDLE_MAX_MESSAGE_MB', '24')) * 1024 * 1024)
+
+# Images are scaled to fit these boxes and re-encoded as JPEG for Kindle
+KINDLE_COVER_SIZE = (1600, 2560)
+KINDLE_IMAGE_SIZE = (1200, 1600)
+KINDLE_JPEG_QUALITY = 80
+
+# Inline images that markdown2 leaves as data URIs in chapter HTML
+DATA_URI_IMG_RE = re.compile(r'(<img\b[^>]*?\bsrc=")data:(image/[\w.+-]+);base64,([^"]+)(")', re.IGNORECASE)
+
+IMAGE_EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/gif': 'gif', 'image/svg+xml': 'svg', 'image/webp': 'webp'}
+
+
+def delivery_fingerprint(book_id, manifest, settings):
+    """Fingerprint of everything that goes into a book's EPUB.
+
+    Uses the page checksums and chapter order from the book manifest, so no
+    page has to be downloaded to tell whether the book changed.
+    """
+    digest = hashlib.sha256(f"{EPUB_FORMAT_VERSION}:{KINDLE_MAX_MESSAGE_BYTES}:{book_id}\n".encode('utf-8'))
+    for name in manifest['order']:
+        digest.update(f"{name}:{manifest['pages'][name].get('md5')}\n".encode('utf-8'))
+    epub_settings = {key: settings.get(key) for key in EPUB_SETTINGS_KEYS}
+    digest.update(json.dumps(epub_settings, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_cached_volumes(fingerprint):
+    """EPUB volumes previously generated for a fingerprint, or None"""
+    prefix = f"{fingerprint}-"
+    try:
+        names = [name for name in os.listdir(EPUB_CACHE_DIR) if name.startswith(prefix) and name.endswith('.epub')]
+        if not names:
+            return None
+        count = int(names[0][len(prefix):].split('-of-')[1][:-len('.epub')])
+
+        volumes = []
+        for number in range(1, count + 1):
+            path = os.path.join(EPUB_CACHE_DIR, f"{prefix}{number}-of-{count}.epub")
+            with open(path, 'rb') as f:
+                volumes.append(f.read())
+            os.utime(path)  # Keep recently used files through pruning
+        return volumes
+    except (OSError, ValueError, IndexError):
+        # Nothing cached, or part of the set was pruned
+        return None
+
+
+def store_cached_volumes(fingerprint, volumes):
+    """Cache generated EPUB volumes, keeping only the most recent files"""
+    try:
+        os.makedirs(EPUB_CACHE_DIR, exist_ok=True)
+        for number, data in enumerate(volumes, 1):
+            path = os.path.join(EPUB_CACHE_DIR, f"{fingerprint}-{number}-of-{len(volumes)}.epub")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        cached = sorted(
+            (os.path.join(EPUB_CACHE_DIR, name) for name in os.listdir(EPUB_CACHE_DIR) if name.endswith('.epub')),
+            key=os.path.getmtime
         )
+        for old_path in cached[:-EPUB_CACHE_MAX_FILES]:
+            os.remove(old_path)
+    except OSError as e:
+        logger.warning(f"Could not cache EPUB {fingerprint[:12]}: {e}")
 
-        # Add title page
-        story.append(Spacer(1, 2*inch))
-        story.append(Paragraph(book_title, title_style))
-        story.append(Spacer(1, 0.5*inch))
 
-        # Add cover image if available
-        if cover_base64:
-            try:
-                if ',' in cover_base64:
-                    cover_base64 = cover_base64.split(',')[1]
-                cover_data = base64.b64decode(cover_base64)
-                cover_io = BytesIO(cover_data)
-                img = Image(cover_io, width=3*inch, height=4*inch)
-                story.append(img)
-            except Exception as e:
-                logger.warning(f"Failed to add cover to PDF: {e}")
+def optimize_image(data, max_size):
+    """Scale an image to fit `max_size` and re-encode it as JPEG.
 
-        story.append(PageBreak())
+    Returns the new bytes, or None when the image can't be read or the
+    original is already smaller.
+    """
+    from PIL import Image
 
-        # HTML parser for better markdown conversion
-        class MarkdownHTMLParser(HTMLParser):
-            def __init__(self):
-                super().__init__()
-                self.elements = []
-                self.current_text = []
-                self.current_tag = None
-                self.in_code_block = False
-
-            def handle_starttag(self, tag, attrs):
-                if self.current_text and self.current_tag:
-                    text = ''.join(self.current_text).strip()
-                    if text:
-                        self.elements.append((self.current_tag, text))
-                    self.current_text = []
-                self.current_tag = tag
-                if tag == 'pre':
-                    self.in_code_block = True
-
-            def handle_endtag(self, tag):
-                if self.current_text and self.current_tag:
-                    text = ''.join(self.current_text).strip()
-                    if text:
-                        self.elements.append((self.current_tag, text))
-                self.current_text = []
-                self.current_tag = None
-                if tag == 'pre':
-                    self.in_code_block = False
-
-            def handle_data(self, data):
-                self.current_text.append(data)
-
-        # Add content from each page
-        for page_file in pages:
-            content = dm.read_page(book_name, page_file)
-            if not content:
-                continue
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image.load()
+            if image.mode in ('RGBA', 'LA', 'P'):
+                # Flatten transparency onto white, as the page would show it
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, 'white')
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+
+            image.thumbnail(max_size)
+            output = BytesIO()
+            image.save(output, 'JPEG', quality=KINDLE_JPEG_QUALITY, optimize=True)
+    except Exception as e:
+        logger.warning(f"Could not optimize image: {e}")
+        return None
 
-            # Add page title
-            page_title = page_file.replace('.md', '').replace('_', ' ')
-            story.append(Paragraph(page_title, h1_style))
-            story.append(Spacer(1, 0.2*inch))
+    optimized = output.getvalue()
+    return optimized if len(optimized) < len(data) else None
 
-            # Convert markdown to HTML
-            html_content = markdown2.markdown(content, extras=['fenced-code-blocks', 'tables', 'header-ids'])
 
-            # Parse HTML and convert to PDF elements
-            parser = MarkdownHTMLParser()
-            parser.feed(html_content)
+def extract_chapter_images(index, html_content):
+    """Move a chapter's data-URI images into optimized EPUB items.
 
-            for tag, text in parser.elements:
-                # Clean up text
-                text = text.strip()
-                if not text:
-                    continue
+    Returns the rewritten HTML and its (file_name, media_type, data) items.
+    """
+    import base64
 
-                # Escape special characters for reportlab
-                text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-
-                if tag == 'h1':
-                    story.append(Paragraph(text, h1_style))
-                elif tag == 'h2':
-                    story.append(Paragraph(text, h2_style))
-                elif tag == 'h3':
-                    story.append(Paragraph(text, h3_style))
-                elif tag == 'pre' or tag == 'code':
-                    # Code blocks
-                    story.append(Preformatted(text, code_style))
-                elif tag == 'p':
-                    story.append(Paragraph(text, body_style))
-                elif tag == 'li':
-                    story.append(Paragraph('• ' + text, body_style))
-                else:
-                    # Default to body text
-                    if text:
-                        story.append(Paragraph(text, body_style))
+    images = []
 
-            story.append(PageBreak())
+    def _extract(match):
+        media_type = match.group(2).lower()
+        try:
+            data = base64.b64decode(match.group(3))
+        except ValueError:
+            return match.group(0)
+
+        if media_type != 'image/svg+xml':
+            optimized = optimize_image(data, KINDLE_IMAGE_SIZE)
+            if optimized:
+                data, media_type = optimized, 'image/jpeg'
+
+        file_name = f"images/chapter_{index}_{len(images)}.{IMAGE_EXTENSIONS.get(media_type, 'img')}"
+        images.append((file_name, media_type, data))
+        return f"{match.group(1)}{file_name}{match.group(4)}"
+
+    return DATA_URI_IMG_RE.sub(_extract, html_content), images
+
+
+def encoded_message_size(attachment_bytes):
+    """Size of an email carrying the attachment as 76-column base64, plus headers"""
+    encoded = 4 * -(-attachment_bytes // 3)
+    return encoded + 2 * -(-encoded // 76) + 4096
+
+
+def split_volumes(items, count):
+    """Split chapters into `count` contiguous runs of roughly equal size"""
+    total = sum(item['size'] for item in items)
+    volumes, current, filled = [], [], 0
+
+    for index, item in enumerate(items):
+        if current and len(volumes) + 1 < count:
+            # Start the next volume once this one holds its share, or when the
+            # remaining chapters are only just enough to give each volume one
+            full = filled + item['size'] / 2 > total * (len(volumes) + 1) / count
+            if full or len(items) - index <= count - len(volumes) - 1:
+                volumes.append(current)
+                current = []
+        current.append(item)
+        filled += item['size']
+
+    volumes.append(current)
+    return volumes
+
+
+def build_kindle_volumes(dm, book_name, book_title, pages, cover_base64=None):
+    """Render a book as Kindle-ready EPUBs that each fit in one email.
+
+    Images and the cover are downscaled and recompressed. If the book is
+    still too large it is split into volumes at chapter boundaries; a single
+    chapter over the limit raises ValueError.
+    """
+    cover = None
+    cover_data = decode_cover(cover_base64)
+    if cover_data:
+        optimized = optimize_image(cover_data, KINDLE_COVER_SIZE)
+        cover = ('cover.jpg', optimized or cover_data)
+
+    chapters = read_chapters(dm, book_name, pages)
+    rendered = render_chapters(render_epub_chapter, chapters)
+
+    items = []
+    for i, ((page_file, _), html_content) in enumerate(zip(chapters, rendered)):
+        html_content, images = extract_chapter_images(i, html_content)
+        items.append({
+            'page_file': page_file,
+            'html': html_content,
+            'images': images,
+            'size': len(html_content.encode('utf-8')) + sum(len(data) for _, _, data in images)
+        })
+
+    count = 1
+    while True:
+        volumes = []
+        for number, group in enumerate(split_volumes(items, count), 1):
+            identifier = f'jugaadpress-{book_name}' if count == 1 else f'jugaadpress-{book_name}-vol{number}'
+            title = book_title if count == 1 else f"{book_title} (Vol. {number} of {count})"
+            data = assemble_epub(
+                identifier,
+                title,
+                [(item['page_file'], item['html']) for item in group],
+                cover=cover,
+                images=[image for item in group for image in item['images']]
+            )
 
-        # Build PDF
-        doc.build(story)
-        output.seek(0)
-        return output.read()
+            size = encoded_message_size(len(data))
+            if size > KINDLE_MAX_MESSAGE_BYTES:
+                if len(group) == 1:
+                    raise ValueError(f"{group[0]['page_file']} is too large to send to Kindle on its own")
+                # Re-split with enough volumes for the overflow, then try again
+                count = min(len(items), max(count + 1, -(-count * size // KINDLE_MAX_MESSAGE_BYTES)))
+                break
+            volumes.append(data)
+        else:
+            if count > 1:
+                logger.info(f"Split {book_name} into {count} volumes for Kindle")
+            return volumes
 
-    except ImportError:
-        # If reportlab is not installed, return error
-        logger.error("reportlab not installed - cannot generate PDF")
-        raise Exception("PDF generation requires reportlab library. Please install it: pip install reportlab")
+
+def is_valid_email(address):
+    """Whether `address` is a single plain email address, safe to put in a header"""
+    from email.utils import parseaddr
+
+    if not isinstance(address, str) or '\r' in address or '\n' in address:
+        return False
+    name, parsed = parseaddr(address)
+    return not name and parsed == address.strip() and re.fullmatch(r'[^@\s,;<>"]+@[^@\s,;<>"]+\.[^@\s,;<>"]+', parsed) is not None
+
+
+def write_kindle_message(fp, to, subject, body, filename, attachment):
+    """Write an RFC 822 message with an EPUB attachment to `fp`.
+
+    The attachment is base64-encoded in chunks straight into the file, so the
+    only full copy in memory is the EPUB itself.
+    """
+    import base64
+    from email.header import Header
+    from email.utils import encode_rfc2231
+
+    if not is_valid_email(to):
+        raise ValueError(f"invalid recipient address: {to!r}")
+
+    boundary = f"=={secrets.token_hex(16)}=="
+    headers = [
+        'MIME-Version: 1.0',
+        f'To: {to}',
+        f'Subject: {Header(subject, "utf-8").encode()}',
+        f'Content-Type: multipart/mixed; boundary="{boundary}"',
+        '',
+        f'--{boundary}',
+        'Content-Type: text/plain; charset="utf-8"',
+        'Content-Transfer-Encoding: base64',
+        '',
+        base64.encodebytes(body.encode('utf-8')).decode('ascii'),
+        f'--{boundary}',
+        'Content-Type: application/epub+zip',
+        'Content-Transfer-Encoding: base64',
+        f"Content-Disposition: attachment; filename*={encode_rfc2231(filename, 'utf-8')}",
+        '',
+        ''
+    ]
+    fp.write('\r\n'.join(headers).encode('utf-8'))
+
+    # 57 input bytes make one 76-column base64 line
+    chunk_size = 57 * 1024
+    view = memoryview(attachment)
+    for offset in range(0, len(view), chunk_size):
+        fp.write(base64.encodebytes(view[offset:offset + chunk_size]).replace(b'\n', b'\r\n'))
+
+    fp.write(f'--{boundary}--\r\n'.encode('ascii'))
+    fp.seek(0)
 
 
 @app.route('/api/books/<book_name>/send-to-kindle', methods=['POST'])
@@ -1340,10 +4930,7 @@ def generate_pdf(dm, book_name, book_title, pages, cover_base64=None):
 def api_send_to_kindle(book_name):
     """Send book to Kindle using Gmail API (no app password needed!)"""
     try:
-        import base64
-        from email.mime.multipart import MIMEMultipart
-        from email.mime.text import MIMEText
-        from email.mime.application import MIMEApplication
+        from googleapiclient.http import MediaIoBaseUpload
 
         # Get Drive Manager
         dm = get_drive_manager()
@@ -1356,6 +4943,12 @@ def api_send_to_kindle(book_name):
 
         if not kindle_email:
             return jsonify({'error': 'Kindle email not configured. Please set it in Global Settings.'}), 400
+        if not is_valid_email(kindle_email):
+            return jsonify({'error': 'Kindle email is not a valid address. Please fix it in Global Settings.'}), 400
+        kindle_email = kindle_email.strip()
+
+        data = request.get_json(silent=True) or {}
+        force = bool(data.get('force'))
 
         # Get book settings
         book_settings = dm.get_book_settings(book_name)
@@ -1363,49 +4956,89 @@ def api_send_to_kindle(book_name):
         cover_base64 = book_settings.get('cover')
 
         # Get pages
-        pages = dm.list_pages(book_name)
-
-        # Generate EPUB
-        logger.info(f"Generating EPUB for {book_name}")
-        epub_content = generate_epub(dm, book_name, book_title, pages, cover_base64)
-
-        # Create email message using Gmail API
-        credentials = Credentials(
-            token=session['credentials']['token'],
-            refresh_token=session['credentials']['refresh_token'],
-            token_uri=session['credentials']['token_uri'],
-            client_id=session['credentials']['client_id'],
-            client_secret=session['credentials']['client_secret'],
-            scopes=session['credentials']['scopes']
-        )
-
-        gmail_service = build('gmail', 'v1', credentials=credentials)
+        manifest = dm.get_manifest(book_name)
+        if not manifest or not manifest['order']:
+            return jsonify({'error': 'No pages found in book'}), 404
+        pages = list(manifest['order'])
+
+        # Skip the send if this exact book already went to this Kindle
+        fingerprint = delivery_fingerprint(dm._get_book_id(book_name), manifest, book_settings)
+        record = dm.get_delivery_record(book_name)
+        if not force and record.get('fingerprint') == fingerprint and record.get('kindle_email') == kindle_email:
+            logger.info(f"{book_name} unchanged since last delivery, not re-sending")
+            return jsonify({
+                'success': True,
+                'unchanged': True,
+                'sent_at': record.get('sent_at'),
+                'volumes': record.get('volumes', 1),
+                'message': f'No changes since the last send to {kindle_email}'
+            }), 200
+
+        # Generate EPUB volumes (or reuse the ones built for this fingerprint)
+        volumes = load_cached_volumes(fingerprint)
+        if volumes is None:
+            ticket = export_scheduler.admit(
+                session_user_key(), estimate_export_memory('kindle', manifest, cover_base64)
+            )
+            if not ticket:
+                logger.warning(f"Kindle send of {book_name} refused: over the export memory budget")
+                return export_busy_response()
 
-        # Create email
-        message = MIMEMultipart()
-        message['To'] = kindle_email
-        message['Subject'] = book_title
+            logger.info(f"Generating EPUB for {book_name}")
+            try:
+                volumes = build_kindle_volumes(dm, book_name, book_title, pages, cover_base64)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 413
+            finally:
+                export_scheduler.release(ticket)
+            store_cached_volumes(fingerprint, volumes)
+        else:
+            logger.info(f"Reusing cached EPUB for {book_name}")
 
-        # Email body
-        body = f"Your book '{book_title}' from JugaadPress"
-        message.attach(MIMEText(body, 'plain'))
+        # Gmail client shares the user's authorized transport with Drive
+        gmail_service = get_user_credentials().service('gmail', 'v1')
 
-        # Attach EPUB
-        epub_attachment = MIMEApplication(epub_content, _subtype='epub+zip')
-        epub_attachment.add_header('Content-Disposition', 'attachment', filename=f'{book_name}.epub')
-        message.attach(epub_attachment)
+        for number, epub_content in enumerate(volumes, 1):
+            if len(volumes) == 1:
+                subject, filename = book_title, f'{book_name}.epub'
+            else:
+                subject = f"{book_title} (Vol. {number} of {len(volumes)})"
+                filename = f'{book_name} - Vol {number}.epub'
+
+            # Build the message in a spooled file and upload it as-is, instead of
+            # holding MIME and urlsafe-base64 copies of the book in memory
+            with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as message:
+                write_kindle_message(
+                    message, kindle_email, subject,
+                    f"Your book '{subject}' from JugaadPress",
+                    filename, epub_content
+                )
+                media = MediaIoBaseUpload(message, mimetype='message/rfc822', resumable=True)
+
+                # Send via Gmail API
+                gmail_service.users().messages().send(
+                    userId='me',
+                    body={},
+                    media_body=media
+                ).execute()
 
-        # Encode message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+        logger.info(f"Successfully sent {book_name} to {kindle_email} ({len(volumes)} volume(s))")
 
-        # Send via Gmail API
-        gmail_service.users().messages().send(
-            userId='me',
-            body={'raw': raw_message}
-        ).execute()
+        sent_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        if not dm.save_delivery_record(book_name, {
+            'fingerprint': fingerprint,
+            'kindle_email': kindle_email,
+            'sent_at': sent_at,
+            'volumes': len(volumes),
+            'size': sum(len(epub_content) for epub_content in volumes)
+        }):
+            logger.warning(f"Could not record delivery of {book_name}")
 
-        logger.info(f"Successfully sent {book_name} to {kindle_email}")
-        return jsonify({'success': True, 'message': f'Book sent to {kindle_email}'}), 200
+        message = f'Book sent to {kindle_email}'
+        if len(volumes) > 1:
+            message += f' in {len(volumes)} volumes'
+        return jsonify({'success': True, 'unchanged': False, 'sent_at': sent_at,
+                        'volumes': len(volumes), 'message': message}), 200
 
     except HttpError as e:
         logger.error(f"Gmail API error: {e}")
@@ -1417,6 +5050,183 @@ def api_send_to_kindle(book_name):
         return jsonify({'error': f'Failed to send to Kindle: {str(e)}'}), 500
 
 
+# ============================================================================
+# LIBRARY EXPORT
+# ============================================================================
+
+# Book files backed up alongside the pages (links and deliveries are rebuilt by the app)
+EXPORT_BOOK_FILES = ('.book_settings.json', MANIFEST_FILE)
+
+# Concurrent Drive downloads per export
+EXPORT_ZIP_WORKERS = int(os.environ.get('EXPORT_ZIP_WORKERS', '4'))
+
+# Downloads started ahead of the entry being written; bounds memory per export
+EXPORT_ZIP_READAHEAD = 2 * EXPORT_ZIP_WORKERS
+
+
+class ZipStream:
+    """Write-only file for zipfile whose output is drained as it's produced"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parse_since(value):
+    """Drive query timestamp (RFC 3339, UTC) from a `since` parameter; ValueError if malformed"""
+    since = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return since.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def zip_entry_info(path, modified_time):
+    """ZipInfo for an exported file, dated by its Drive modifiedTime"""
+    import zipfile
+
+    info = zipfile.ZipInfo(path)
+    if modified_time:
+        info.date_time = datetime.fromisoformat(modified_time.replace('Z', '+00:00')).timetuple()[:6]
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def stream_export_zip(user, root_folder_id, files, since):
+    """Yield a ZIP of `files` (from list_export_files), downloading concurrently.
+
+    Entries are written in listing order as their downloads finish, with at
+    most EXPORT_ZIP_READAHEAD files held in memory. Book covers are unpacked
+    from settings into cover.<ext>. A final export.json records when the
+    export ran, to pass as `since` for the next incremental backup.
+    """
+    import zipfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    started_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    dm = user.drive_manager(root_folder_id)
+
+    def _download(file_id):
+        return dm._retry_on_error(dm._download_file, file_id)
+
+    output = ZipStream()
+    failed = []
+    executor = ThreadPoolExecutor(max_workers=EXPORT_ZIP_WORKERS, thread_name_prefix='export')
+    try:
+        with zipfile.ZipFile(output, 'w') as archive:
+            pending = deque()
+            queued = iter(files)
+
+            def _fill():
+                for path, f in queued:
+                    pending.append((path, f, executor.submit(_download, f['id'])))
+                    if len(pending) >= EXPORT_ZIP_READAHEAD:
+                        return
+
+            _fill()
+            while pending:
+                path, f, future = pending.popleft()
+                _fill()
+                try:
+                    content = future.result()
+                except Exception as e:
+                    logger.warning(f"Export skipped {path}: {e}")
+                    failed.append(path)
+                    continue
+
+                archive.writestr(zip_entry_info(path, f.get('modifiedTime')), content)
+                if path.endswith('/.book_settings.json'):
+                    try:
+                        cover = json.loads(content).get('cover')
+                    except ValueError:
+                        cover = None
+                    if cover:
+                        mime = cover[5:cover.find(';')] if cover.startswith('data:') else 'image/jpeg'
+                        data = decode_cover(cover)
+                        if data:
+                            cover_path = f"{path.rsplit('/', 1)[0]}/cover.{IMAGE_EXTENSIONS.get(mime, 'jpg')}"
+                            archive.writestr(zip_entry_info(cover_path, f.get('modifiedTime')), data)
+                yield output.drain()
+
+            archive.writestr(zip_entry_info('export.json', started_at), json.dumps({
+                'exported_at': started_at,
+                'since': since,
+                'files': len(files) - len(failed),
+                'failed': failed
+            }, indent=2))
+        yield output.drain()
+        logger.info(f"Exported {len(files) - len(failed)} files ({len(failed)} failed)")
+    finally:
+        # Also runs when the client disconnects mid-download
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def export_response(book_name=None):
+    """Streaming ZIP download of the library, or of one book"""
+    since = request.args.get('since')
+    if since:
+        try:
+            since = parse_since(since)
+        except ValueError:
+            return jsonify({'error': 'Invalid since; use an ISO 8601 timestamp'}), 400
+
+    user = get_user_credentials()
+    dm = get_drive_manager()
+    if not dm:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    files = dm.list_export_files(book_name, since)
+    if files is None:
+        return jsonify({'error': 'Book not found'}), 404
+
+    name = book_name or 'JugaadPress'
+    suffix = '-changes' if since else ''
+    filename = f"{name}{suffix}-{time.strftime('%Y%m%d')}.zip"
+    logger.info(f"Exporting {len(files)} files from {name}{' since ' + since if since else ''}")
+
+    return app.response_class(
+        stream_export_zip(user, dm.root_folder_id, files, since),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f"attachment; filename*=UTF-8''{quote(filename)}",
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+@app.route('/api/export', methods=['GET'])
+@login_required
+def api_export_library():
+    """Download every book as markdown in a ZIP (?since= for changes only)"""
+    try:
+        return export_response()
+    except Exception as e:
+        logger.error(f"Error exporting library: {e}", exc_info=True)
+        return jsonify({'error': 'Failed to export library'}), 500
+
+
+@app.route('/api/books/<book_name>/export', methods=['GET'])
+@login_required
+def api_export_book(book_name):
+    """Download one book as markdown in a ZIP (?since= for changes only)"""
+    try:
+        return export_response(book_name)
+    except Exception as e:
+        logger.error(f"Error exporting {book_name}: {e}", exc_info=True)
+        return jsonify({'error': 'Failed to export book'}), 500
+
+
 if __name__ == '__main__':
     # For development
     os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'  # Allow HTTP for localhost
@@ -0,0 +1,33 @@
+"""
+Gunicorn settings for JugaadPress
+
+The app is imported once in the master and its cold-path modules are
+preloaded there, so workers fork with everything already in memory
+(shared copy-on-write) and serve their first request without importing.
+Bind address and worker count come from $PORT and $WEB_CONCURRENCY as usual.
+
+Workers are threaded: each open editor holds a change-feed stream
+(/api/books/<book>/events), which would tie up a whole sync worker. Only
+CHANGE_FEED_MAX_STREAMS of a worker's threads go to streams at a time.
+Each worker starts its own export pool (if EXPORT_POOL_SIZE > 1) once it
+has forked; the pool spawns fresh processes instead of forking a threaded one.
+"""
+
+import os
+
+preload_app = True
+
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '16'))
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, before workers fork"""
+    import app
+    app.preload_modules()
+
+
+def post_fork(server, worker):
+    """Runs in each worker after it forks, before it starts its threads"""
+    import app
+    app.start_export_pool()
@@ -0,0 +1,554 @@
+/* ===== JUGAADPRESS - DASHBOARD ===== */
+
+// State
+let selectedBook = null;
+let books = [];
+let globalSettings = {};
+
+// ===== LOAD INITIAL DATA =====
+async function loadDashboard() {
+    try {
+        showLoading('Loading dashboard...');
+        await Promise.all([
+            loadUserInfo(),
+            loadBooks(),
+            loadGlobalSettings()
+        ]);
+        hideLoading();
+    } catch (error) {
+        hideLoading();
+        showToast('Error loading dashboard. Please refresh the page.', 'error');
+        console.error('Dashboard load error:', error);
+    }
+}
+
+async function loadUserInfo() {
+    try {
+        const user = await apiCall('/api/user');
+        document.getElementById('userEmail').textContent = user.email;
+
+        // Personalize the subtitle
+        if (user.name) {
+            const firstName = user.name.split(' ')[0].toLowerCase();
+            const userSubtitle = document.getElementById('userSubtitle');
+            userSubtitle.innerHTML = `// <span style="color: #ff6b6b; text-shadow: 0 0 10px rgba(255, 107, 107, 0.4);">@${firstName}</span>`;
+        }
+    } catch (error) {
+        console.error('Failed to load user info:', error);
+        showToast('Could not load user information', 'error');
+    }
+}
+
+async function loadBooks() {
+    try {
+        books = await apiCall('/api/books');
+        renderBooks();
+    } catch (error) {
+        console.error('Failed to load books:', error);
+        showToast('Could not load books from Drive', 'error');
+        books = [];
+        renderBooks();
+    }
+}
+
+function renderBooks() {
+    const bookList = document.getElementById('bookList');
+
+    if (books.length === 0) {
+        bookList.innerHTML = `
+            <div class="empty-state">
+                <i class="fas fa-book"></i>
+                <p>No books yet. Create your first book!</p>
+            </div>
+        `;
+        return;
+    }
+
+    bookList.innerHTML = books.map(book => `
+        <li class="book-item ${selectedBook === book.name ? 'active' : ''}" onclick="selectBook('${book.name.replace(/'/g, "\\'")}')">
+            <h3><i class="fas fa-book"></i> ${book.name}</h3>
+            <div class="book-meta">
+                ${book.pageCount} pages
+                ${book.lastModified ? '• Updated ' + formatDate(book.lastModified) : ''}
+            </div>
+            <div class="book-actions">
+                <button class="btn btn-primary btn-sm" onclick="editBook('${book.name.replace(/'/g, "\\'")}'); event.stopPropagation();">
+                    <i class="fas fa-edit"></i> Edit
+                </button>
+                <button class="btn btn-danger btn-sm" onclick="deleteBook('${book.name.replace(/'/g, "\\'")}'); event.stopPropagation();">
+                    <i class="fas fa-trash"></i>
+                </button>
+            </div>
+        </li>
+    `).join('');
+}
+
+async function selectBook(bookName) {
+    selectedBook = bookName;
+    renderBooks();
+
+    // Switch to book settings tab
+    switchTab('book');
+
+    // Show loading state
+    document.getElementById('noBookSelected').style.display = 'none';
+    document.getElementById('bookSettingsForm').style.display = 'block';
+    document.getElementById('selectedBookName').textContent = bookName;
+
+    // Load settings
+    await loadBookSettings(bookName);
+}
+
+async function loadGlobalSettings() {
+    try {
+        globalSettings = await apiCall('/api/settings/global');
+        document.getElementById('kindleEmail').value = globalSettings.kindle_email || '';
+    } catch (error) {
+        console.error('Failed to load global settings:', error);
+        showToast('Could not load settings from Drive', 'error');
+    }
+}
+
+async function loadBookSettings(bookName) {
+    try {
+        // Update book name field (read-only)
+        document.getElementById('bookName').value = bookName;
+
+        // Show loading state
+        const titleInput = document.getElementById('bookTitle');
+        titleInput.value = 'Loading...';
+        titleInput.disabled = true;
+
+        // Show cover loading state
+        const coverLoading = document.getElementById('coverLoading');
+        const coverPreview = document.getElementById('coverPreview');
+        const coverImage = document.getElementById('coverImage');
+        const coverUploadText = document.getElementById('coverUploadText');
+
+        coverLoading.style.display = 'block';
+        coverPreview.style.display = 'none';
+        coverUploadText.textContent = 'Loading...';
+
+        const settings = await apiCall(`/api/books/${encodeURIComponent(bookName)}/settings`);
+
+        titleInput.value = settings.title || bookName;
+        titleInput.disabled = false;
+
+        document.getElementById('pdfPageSize').value = settings.pdf_page_size || 'letter';
+        document.getElementById('pdfMargin').value = String(settings.pdf_margin ?? 0.75);
+        document.getElementById('pdfTheme').value = settings.pdf_theme || 'default';
+
+        // Show cover if exists
+        coverLoading.style.display = 'none';
+        if (settings.cover) {
+            coverImage.src = settings.cover;
+            coverPreview.style.display = 'block';
+            coverUploadText.innerHTML = '<i class="fas fa-sync-alt"></i> Replace Cover Image';
+        } else {
+            coverPreview.style.display = 'none';
+            coverUploadText.innerHTML = '<i class="fas fa-upload"></i> Upload Cover Image';
+        }
+    } catch (error) {
+        console.error('Failed to load book settings:', error);
+        showToast('Could not load book settings', 'error');
+        document.getElementById('bookTitle').disabled = false;
+        document.getElementById('coverLoading').style.display = 'none';
+        document.getElementById('coverUploadText').innerHTML = '<i class="fas fa-upload"></i> Upload Cover Image';
+    }
+}
+
+function previewCoverImage(event) {
+    const file = event.target.files[0];
+    if (file) {
+        const reader = new FileReader();
+        reader.onload = function(e) {
+            const coverImage = document.getElementById('coverImage');
+            const coverPreview = document.getElementById('coverPreview');
+            const coverUploadText = document.getElementById('coverUploadText');
+
+            coverImage.src = e.target.result;
+            coverPreview.style.display = 'block';
+            coverUploadText.innerHTML = '<i class="fas fa-sync-alt"></i> Replace Cover Image';
+        };
+        reader.readAsDataURL(file);
+    }
+}
+
+async function deleteCoverImage() {
+    if (!confirm('Remove cover image? This will delete it from Drive.')) return;
+
+    try {
+        showLoading('Removing cover image...');
+
+        await fetch(`/api/books/${encodeURIComponent(selectedBook)}/settings`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                ...collectBookSettings(),
+                cover: null
+            })
+        });
+
+        // Update UI
+        document.getElementById('coverPreview').style.display = 'none';
+        document.getElementById('coverImage').src = '';
+        document.getElementById('bookCover').value = '';
+        document.getElementById('coverUploadText').innerHTML = '<i class="fas fa-upload"></i> Upload Cover Image';
+
+        hideLoading();
+        showToast('✓ Cover image removed!', 'success');
+    } catch (error) {
+        hideLoading();
+        console.error('Failed to delete cover:', error);
+        showToast('✗ Error removing cover image', 'error');
+    }
+}
+
+async function saveGlobalSettings(event) {
+    event.preventDefault();
+
+    const settings = {
+        kindle_email: document.getElementById('kindleEmail').value
+    };
+
+    try {
+        showLoading('Saving settings to Drive...');
+        const response = await fetch('/api/settings/global', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(settings)
+        });
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to save settings');
+        }
+
+        hideLoading();
+        showToast('✓ Kindle email saved! Ready to send books.', 'success');
+    } catch (error) {
+        hideLoading();
+        console.error('Failed to save settings:', error);
+        showToast(`✗ ${error.message}`, 'error');
+    }
+}
+
+function collectBookSettings() {
+    return {
+        title: document.getElementById('bookTitle').value,
+        pdf_page_size: document.getElementById('pdfPageSize').value,
+        pdf_margin: parseFloat(document.getElementById('pdfMargin').value),
+        pdf_theme: document.getElementById('pdfTheme').value
+    };
+}
+
+async function saveBookSettings(event) {
+    event.preventDefault();
+
+    const settings = collectBookSettings();
+
+    // Handle cover image if uploaded
+    const coverFile = document.getElementById('bookCover').files[0];
+    if (coverFile) {
+        const reader = new FileReader();
+        reader.onloadend = async function() {
+            settings.cover = reader.result;
+            await saveSettingsToDrive(settings);
+        };
+        reader.readAsDataURL(coverFile);
+    } else {
+        await saveSettingsToDrive(settings);
+    }
+}
+
+async function saveSettingsToDrive(settings) {
+    try {
+        showLoading('Saving book settings to Drive...');
+        await fetch(`/api/books/${encodeURIComponent(selectedBook)}/settings`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(settings)
+        });
+        await loadBooks();
+        hideLoading();
+        showToast('✓ Book settings saved to Drive!', 'success');
+    } catch (error) {
+        hideLoading();
+        console.error('Failed to save book settings:', error);
+        showToast('✗ Error saving book settings', 'error');
+    }
+}
+
+function showModal(title, message, onConfirm) {
+    const overlay = document.getElementById('modal-overlay');
+    const confirmBtn = document.getElementById('modal-confirm');
+    const cancelBtn = document.getElementById('modal-cancel');
+
+    document.getElementById('modal-title').textContent = title;
+    document.getElementById('modal-message').textContent = message;
+    overlay.classList.add('show');
+
+    const handleConfirm = () => {
+        overlay.classList.remove('show');
+        onConfirm();
+        cleanup();
+    };
+
+    const handleCancel = () => {
+        overlay.classList.remove('show');
+        cleanup();
+    };
+
+    const cleanup = () => {
+        confirmBtn.removeEventListener('click', handleConfirm);
+        cancelBtn.removeEventListener('click', handleCancel);
+    };
+
+    confirmBtn.addEventListener('click', handleConfirm);
+    cancelBtn.addEventListener('click', handleCancel);
+}
+
+function showInputModal(onConfirm) {
+    const overlay = document.getElementById('input-modal-overlay');
+    const input = document.getElementById('input-modal-input');
+    const confirmBtn = document.getElementById('input-modal-confirm');
+    const cancelBtn = document.getElementById('input-modal-cancel');
+
+    input.value = '';
+    overlay.classList.add('show');
+    setTimeout(() => input.focus(), 100);
+
+    const handleConfirm = () => {
+        const value = input.value.trim();
+        if (value) {
+            overlay.classList.remove('show');
+            onConfirm(value);
+            cleanup();
+        }
+    };
+
+    const handleCancel = () => {
+        overlay.classList.remove('show');
+        cleanup();
+    };
+
+    const handleEnter = (e) => {
+        if (e.key === 'Enter') handleConfirm();
+        if (e.key === 'Escape') handleCancel();
+    };
+
+    const cleanup = () => {
+        confirmBtn.removeEventListener('click', handleConfirm);
+        cancelBtn.removeEventListener('click', handleCancel);
+        input.removeEventListener('keydown', handleEnter);
+    };
+
+    confirmBtn.addEventListener('click', handleConfirm);
+    cancelBtn.addEventListener('click', handleCancel);
+    input.addEventListener('keydown', handleEnter);
+}
+
+async function createNewBook() {
+    showInputModal(async (bookName) => {
+        try {
+            showLoading('Creating book in Drive...');
+            await fetch('/api/books', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ name: bookName })
+            });
+            await loadBooks();
+            hideLoading();
+            showToast(`✓ Book "${bookName}" created!`, 'success');
+        } catch (error) {
+            hideLoading();
+            console.error('Failed to create book:', error);
+            showToast('✗ Error creating book', 'error');
+        }
+    });
+}
+
+async function renameBook() {
+    if (!selectedBook) return;
+
+    showInputModal(async (newName) => {
+        if (newName === selectedBook) {
+            showToast('Name unchanged', 'error');
+            return;
+        }
+
+        try {
+            showLoading('Renaming book...');
+            const response = await fetch(`/api/books/${encodeURIComponent(selectedBook)}/rename`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ new_name: newName })
+            });
+
+            if (!response.ok) {
+                const error = await response.json();
+                throw new Error(error.error || 'Failed to rename');
+            }
+
+            const oldName = selectedBook;
+            selectedBook = newName;
+
+            await loadBooks();
+            await loadBookSettings(newName);
+
+            document.getElementById('selectedBookName').textContent = newName;
+            document.getElementById('bookName').value = newName;
+            hideLoading();
+            showToast(`✓ Renamed "${oldName}" to "${newName}"`, 'success');
+        } catch (error) {
+            hideLoading();
+            console.error('Failed to rename book:', error);
+            showToast(`✗ ${error.message}`, 'error');
+        }
+    });
+
+    // Pre-fill with current name
+    setTimeout(() => {
+        const input = document.getElementById('input-modal-input');
+        input.value = selectedBook;
+        input.select();
+    }, 100);
+}
+
+async function deleteBook(bookName) {
+    showModal(
+        '⚠️ Delete Book',
+        `Delete "${bookName}"?\n\nThis will move it to your Drive trash.`,
+        async () => {
+            try {
+                showLoading('Deleting book...');
+                await fetch(`/api/books/${encodeURIComponent(bookName)}`, {
+                    method: 'DELETE'
+                });
+
+                if (selectedBook === bookName) {
+                    selectedBook = null;
+                    document.getElementById('noBookSelected').style.display = 'block';
+                    document.getElementById('bookSettingsForm').style.display = 'none';
+                }
+
+                await loadBooks();
+                hideLoading();
+                showToast(`✓ Book "${bookName}" deleted`, 'success');
+            } catch (error) {
+                hideLoading();
+                console.error('Failed to delete book:', error);
+                showToast('✗ Error deleting book', 'error');
+            }
+        }
+    );
+}
+
+function editBook(bookName) {
+    window.location.href = `/editor/${encodeURIComponent(bookName)}`;
+}
+
+async function sendToKindle(force = false) {
+    if (!selectedBook) return;
+
+    if (!force && !confirm(`Send "${selectedBook}" to your Kindle?\n\nMake sure you've configured your email settings in Global Settings.`)) return;
+
+    try {
+        showLoading('Generating EPUB and sending to Kindle...');
+        const response = await fetch(`/api/books/${encodeURIComponent(selectedBook)}/send-to-kindle`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ force })
+        });
+
+        if (response.status === 503) {
+            const error = await response.json();
+            hideLoading();
+            showToast(`✗ ${error.error}`, 'error');
+            return;
+        }
+        if (!response.ok) throw new Error('Failed to send');
+
+        const data = await response.json();
+        hideLoading();
+
+        if (data.unchanged) {
+            const sentAt = data.sent_at ? new Date(data.sent_at).toLocaleString() : 'earlier';
+            if (confirm(`"${selectedBook}" hasn't changed since it was sent (${sentAt}).\n\nSend it again anyway?`)) {
+                sendToKindle(true);
+            }
+            return;
+        }
+
+        const sentAs = data.volumes > 1 ? ` in ${data.volumes} volumes` : '';
+        showToast(`✓ Book sent to Kindle${sentAs}! Check your email in 2-5 minutes.`, 'success');
+    } catch (error) {
+        hideLoading();
+        console.error('Failed to send to Kindle:', error);
+        showToast('✗ Error sending book. Check your settings.', 'error');
+    }
+}
+
+async function downloadBook(format) {
+    if (!selectedBook) return;
+
+    const formatName = format.toUpperCase();
+    const loadingMsg = format === 'epub' ? 'Generating EPUB...' : 'Generating PDF...';
+
+    try {
+        showLoading(loadingMsg);
+
+        const response = await fetch(`/api/books/${encodeURIComponent(selectedBook)}/download?format=${format}`);
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to generate book');
+        }
+
+        const blob = await response.blob();
+        const url = window.URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = `${selectedBook}.${format}`;
+        document.body.appendChild(a);
+        a.click();
+        window.URL.revokeObjectURL(url);
+        document.body.removeChild(a);
+
+        hideLoading();
+        showToast(`✓ ${formatName} downloaded successfully!`, 'success');
+    } catch (error) {
+        hideLoading();
+        console.error(`Failed to download ${format}:`, error);
+        showToast(`✗ Error generating ${formatName}: ${error.message}`, 'error');
+    }
+}
+
+// The ZIP streams straight to disk as pages download, so navigate to it
+// rather than buffering it in a blob like downloadBook does
+function exportMarkdown(bookName) {
+    window.location.href = bookName
+        ? `/api/books/${encodeURIComponent(bookName)}/export`
+        : '/api/export';
+    showToast('✓ Backup download started', 'success');
+}
+
+function switchTab(tab) {
+    document.querySelectorAll('.tab').forEach(t => t.classList.remove('active'));
+
+    if (tab === 'global') {
+        document.querySelector('.tab:nth-child(1)').classList.add('active');
+    } else {
+        document.querySelector('.tab:nth-child(2)').classList.add('active');
+    }
+
+    document.querySelectorAll('.tab-content').forEach(tc => tc.classList.remove('active'));
+    document.getElementById(tab === 'global' ? 'globalSettings' : 'bookSettings').classList.add('active');
+}
+
+function logout() {
+    window.location.href = '/logout';
+}
+
+// Initialize
+loadDashboard();
@@ -0,0 +1,1721 @@
+/* ===== JUGAADPRESS - EDITOR ===== */
+
+// ===== GLOBAL STATE =====
+const state = {
+    currentPage: null,
+    saveTimeout: null,
+    previewVisible: false,
+    previewPage: null, // Track what's shown in preview independently
+    unsavedChanges: false,
+    sending: false,
+    allPages: [],
+    revisions: {}, // page -> current server revision (content md5)
+    saving: false,
+    autocompleteVisible: false,
+    selectedAutocompleteIndex: 0,
+    operationInProgress: false
+};
+
+// ===== DOM ELEMENTS =====
+const editor = document.getElementById('editor');
+const pageList = document.getElementById('page-list');
+const status = document.getElementById('status');
+const previewPane = document.getElementById('preview-pane');
+const previewContent = document.getElementById('preview-content');
+const previewRenderer = new PreviewRenderer(previewContent, {
+    workerUrl: document.body.dataset.previewWorker,
+    markedUrl: document.querySelector('script[src*="marked"]').src
+});
+const sendButton = document.getElementById('send-button');
+const modalOverlay = document.getElementById('modal-overlay');
+const toast = document.getElementById('toast');
+
+// ===== UTILITY FUNCTIONS =====
+function showLoading(message = 'Loading...') {
+    const overlay = document.getElementById('loadingOverlay');
+    const text = document.getElementById('loadingText');
+    text.textContent = message;
+    overlay.classList.add('show');
+}
+
+function hideLoading() {
+    const overlay = document.getElementById('loadingOverlay');
+    overlay.classList.remove('show');
+}
+
+function showToast(message, isError = false) {
+    const toastEl = document.getElementById('toast');
+    const toastMessage = document.getElementById('toastMessage');
+    toastMessage.textContent = message;
+    toastEl.classList.toggle('error', isError);
+    toastEl.classList.add('show');
+    setTimeout(() => toastEl.classList.remove('show'), 3000);
+}
+
+async function downloadBookFromEditor(format) {
+    const formatName = format.toUpperCase();
+    try {
+        showToast(`Generating ${formatName}...`);
+
+        const response = await fetch(`/api/books/${encodeURIComponent(BOOK_NAME)}/download?format=${format}`);
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to generate book');
+        }
+
+        // Get the blob
+        const blob = await response.blob();
+
+        // Create download link
+        const url = window.URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = `${BOOK_NAME}.${format}`;
+        document.body.appendChild(a);
+        a.click();
+        window.URL.revokeObjectURL(url);
+        document.body.removeChild(a);
+
+        showToast(`${formatName} downloaded!`);
+    } catch (error) {
+        console.error(`Failed to download ${format}:`, error);
+        showToast(`Error generating ${formatName}: ${error.message}`, true);
+    }
+}
+
+function showModal(title, message, onConfirm) {
+    document.getElementById('modal-title').textContent = title;
+    document.getElementById('modal-message').textContent = message;
+    modalOverlay.classList.add('show');
+
+    const confirmBtn = document.getElementById('modal-confirm');
+    const cancelBtn = document.getElementById('modal-cancel');
+
+    const handleConfirm = () => {
+        onConfirm();
+        modalOverlay.classList.remove('show');
+        cleanup();
+    };
+
+    const handleCancel = () => {
+        modalOverlay.classList.remove('show');
+        cleanup();
+    };
+
+    const cleanup = () => {
+        confirmBtn.removeEventListener('click', handleConfirm);
+        cancelBtn.removeEventListener('click', handleCancel);
+        modalOverlay.removeEventListener('click', handleOverlayClick);
+    };
+
+    const handleOverlayClick = (e) => {
+        if (e.target === modalOverlay) handleCancel();
+    };
+
+    confirmBtn.addEventListener('click', handleConfirm);
+    cancelBtn.addEventListener('click', handleCancel);
+    modalOverlay.addEventListener('click', handleOverlayClick);
+}
+
+function updateStatus(text, type = 'normal') {
+    status.textContent = text;
+    status.className = type;
+}
+
+// ===== MARKDOWN FORMATTING =====
+function getSelectedText() {
+    return {
+        start: editor.selectionStart,
+        end: editor.selectionEnd,
+        text: editor.value.substring(editor.selectionStart, editor.selectionEnd)
+    };
+}
+
+function wrapSelection(before, after = before) {
+    const selection = getSelectedText();
+    const text = editor.value;
+    const wrapped = `${before}${selection.text}${after}`;
+
+    // Check if already wrapped (toggle feature)
+    const beforeText = text.substring(selection.start - before.length, selection.start);
+    const afterText = text.substring(selection.end, selection.end + after.length);
+
+    editor.focus();
+
+    if (beforeText === before && afterText === after) {
+        // Unwrap (toggle off) - preserve undo with document.execCommand
+        const unwrapped = selection.text;
+        editor.setSelectionRange(selection.start - before.length, selection.end + after.length);
+        document.execCommand('insertText', false, unwrapped);
+        editor.setSelectionRange(selection.start - before.length, selection.end - before.length);
+        showToast('Formatting removed');
+    } else {
+        // Wrap (toggle on) - preserve undo with document.execCommand
+        document.execCommand('insertText', false, wrapped);
+        editor.setSelectionRange(selection.start + before.length, selection.end + before.length);
+        showToast('Formatting applied');
+    }
+
+    triggerChange();
+}
+
+function insertAtLineStart(prefix) {
+    const selection = getSelectedText();
+    const text = editor.value;
+    const lineStart = text.lastIndexOf('\n', selection.start - 1) + 1;
+    const lineEnd = text.indexOf('\n', selection.start);
+    const line = text.substring(lineStart, lineEnd === -1 ? text.length : lineEnd);
+
+    editor.focus();
+
+    // Toggle: check if line already has the prefix
+    if (line.startsWith(prefix)) {
+        // Remove prefix - preserve undo
+        const newLine = line.substring(prefix.length);
+        editor.setSelectionRange(lineStart, lineEnd === -1 ? text.length : lineEnd);
+        document.execCommand('insertText', false, newLine);
+        editor.setSelectionRange(selection.start - prefix.length, selection.end - prefix.length);
+    } else {
+        // Add prefix - preserve undo
+        const newLine = prefix + line;
+        editor.setSelectionRange(lineStart, lineEnd === -1 ? text.length : lineEnd);
+        document.execCommand('insertText', false, newLine);
+        editor.setSelectionRange(selection.start + prefix.length, selection.end + prefix.length);
+    }
+
+    triggerChange();
+}
+
+function triggerChange() {
+    // Don't trigger if no page is loaded yet
+    if (!state.currentPage) return;
+
+    state.unsavedChanges = true;
+    updatePreview();
+    clearTimeout(state.saveTimeout);
+    updateStatus('Typing...', 'normal');
+    state.saveTimeout = setTimeout(savePageContent, 1500);
+}
+
+// ===== ADVANCED EDITING FUNCTIONS =====
+function duplicateLine() {
+    const selection = getSelectedText();
+    const text = editor.value;
+    const lineStart = text.lastIndexOf('\n', selection.start - 1) + 1;
+    const lineEnd = text.indexOf('\n', selection.start);
+    const line = text.substring(lineStart, lineEnd === -1 ? text.length : lineEnd);
+
+    editor.focus();
+    editor.setSelectionRange(lineEnd === -1 ? text.length : lineEnd, lineEnd === -1 ? text.length : lineEnd);
+    document.execCommand('insertText', false, '\n' + line);
+    showToast('Line duplicated');
+    triggerChange();
+}
+
+function deleteLine() {
+    const selection = getSelectedText();
+    const text = editor.value;
+    const lineStart = text.lastIndexOf('\n', selection.start - 1) + 1;
+    const lineEnd = text.indexOf('\n', selection.start);
+
+    editor.focus();
+    if (lineStart === 0 && lineEnd === -1) {
+        // Only line in editor
+        editor.setSelectionRange(0, text.length);
+    } else if (lineEnd === -1) {
+        // Last line
+        editor.setSelectionRange(lineStart - 1, text.length);
+    } else {
+        // Middle line
+        editor.setSelectionRange(lineStart, lineEnd + 1);
+    }
+    document.execCommand('delete');
+    showToast('Line deleted');
+    triggerChange();
+}
+
+function insertLineBelow() {
+    const selection = getSelectedText();
+    const text = editor.value;
+    const lineEnd = text.indexOf('\n', selection.start);
+
+    editor.focus();
+    const pos = lineEnd === -1 ? text.length : lineEnd;
+    editor.setSelectionRange(pos, pos);
+    document.execCommand('insertText', false, '\n');
+    triggerChange();
+}
+
+function toggleComment() {
+    const selection = getSelectedText();
+    const text = editor.value;
+
+    editor.focus();
+
+    if (selection.text.startsWith('<!-- ') && selection.text.endsWith(' -->')) {
+        // Uncomment
+        const uncommented = selection.text.slice(5, -4);
+        document.execCommand('insertText', false, uncommented);
+        showToast('Comment removed');
+    } else {
+        // Comment
+        const commented = `<!-- ${selection.text} -->`;
+        document.execCommand('insertText', false, commented);
+        showToast('Commented');
+    }
+    triggerChange();
+}
+
+function toggleCodeBlock() {
+    const selection = getSelectedText();
+
+    editor.focus();
+
+    if (selection.text.startsWith('```\n') && selection.text.endsWith('\n```')) {
+        // Remove code block
+        const unblocked = selection.text.slice(4, -4);
+        document.execCommand('insertText', false, unblocked);
+        showToast('Code block removed');
+    } else {
+        // Add code block
+        const blocked = `\`\`\`\n${selection.text}\n\`\`\``;
+        document.execCommand('insertText', false, blocked);
+        showToast('Code block added');
+    }
+    triggerChange();
+}
+
+function moveLineUp() {
+    const selection = getSelectedText();
+    const text = editor.value;
+    const lineStart = text.lastIndexOf('\n', selection.start - 1) + 1;
+    const lineEnd = text.indexOf('\n', selection.start);
+    const currentLine = text.substring(lineStart, lineEnd === -1 ? text.length : lineEnd);
+
+    if (lineStart === 0) {
+        showToast('Already at top');
+        return; // Already at top
+    }
+
+    const prevLineStart = text.lastIndexOf('\n', lineStart - 2) + 1;
+    const prevLine = text.substring(prevLineStart, lineStart - 1);
+
+    editor.focus();
+    editor.setSelectionRange(prevLineStart, lineEnd === -1 ? text.length : lineEnd);
+    document.execCommand('insertText', false, currentLine + '\n' + prevLine);
+
+    // Restore cursor position
+    const newCursorPos = prevLineStart + (selection.start - lineStart);
+    editor.setSelectionRange(newCursorPos, newCursorPos);
+    triggerChange();
+}
+
+function moveLineDown() {
+    const selection = getSelectedText();
+    const text = editor.value;
+    const lineStart = text.lastIndexOf('\n', selection.start - 1) + 1;
+    const lineEnd = text.indexOf('\n', selection.start);
+    const currentLine = text.substring(lineStart, lineEnd === -1 ? text.length : lineEnd);
+
+    if (lineEnd === -1) {
+        showToast('Already at bottom');
+        return; // Already at bottom
+    }
+
+    const nextLineEnd = text.indexOf('\n', lineEnd + 1);
+    const nextLine = text.substring(lineEnd + 1, nextLineEnd === -1 ? text.length : nextLineEnd);
+
+    editor.focus();
+    editor.setSelectionRange(lineStart, nextLineEnd === -1 ? text.length : nextLineEnd);
+    document.execCommand('insertText', false, nextLine + '\n' + currentLine);
+
+    // Restore cursor position
+    const newCursorPos = lineStart + nextLine.length + 1 + (selection.start - lineStart);
+    editor.setSelectionRange(newCursorPos, newCursorPos);
+    triggerChange();
+}
+
+function increaseHeading() {
+    const selection = getSelectedText();
+    const text = editor.value;
+    const lineStart = text.lastIndexOf('\n', selection.start - 1) + 1;
+    const lineEnd = text.indexOf('\n', selection.start);
+    const line = text.substring(lineStart, lineEnd === -1 ? text.length : lineEnd);
+
+    editor.focus();
+
+    if (line.startsWith('# ')) {
+        const newLine = '#' + line;
+        editor.setSelectionRange(lineStart, lineEnd === -1 ? text.length : lineEnd);
+        document.execCommand('insertText', false, newLine);
+        showToast('Heading level increased');
+    } else {
+        showToast('Not a heading');
+    }
+    triggerChange();
+}
+
+function decreaseHeading() {
+    const selection = getSelectedText();
+    const text = editor.value;
+    const lineStart = text.lastIndexOf('\n', selection.start - 1) + 1;
+    const lineEnd = text.indexOf('\n', selection.start);
+    const line = text.substring(lineStart, lineEnd === -1 ? text.length : lineEnd);
+
+    editor.focus();
+
+    if (line.startsWith('## ')) {
+        const newLine = line.substring(1);
+        editor.setSelectionRange(lineStart, lineEnd === -1 ? text.length : lineEnd);
+        document.execCommand('insertText', false, newLine);
+        showToast('Heading level decreased');
+    } else {
+        showToast('Not a heading or already minimum');
+    }
+    triggerChange();
+}
+
+function showShortcutsModal() {
+    const modal = document.getElementById('shortcuts-modal-overlay');
+    modal.style.display = 'flex';
+
+    // Close on Esc or click outside
+    const closeHandler = (e) => {
+        if (e.key === 'Escape' || e.target === modal) {
+            hideShortcutsModal();
+        }
+    };
+    modal.addEventListener('click', closeHandler);
+    document.addEventListener('keydown', closeHandler);
+}
+
+function hideShortcutsModal() {
+    const modal = document.getElementById('shortcuts-modal-overlay');
+    modal.style.display = 'none';
+}
+
+// ===== TOOLBAR ACTIONS =====
+document.getElementById('btn-bold').addEventListener('click', () => wrapSelection('**'));
+document.getElementById('btn-italic').addEventListener('click', () => wrapSelection('*'));
+document.getElementById('btn-strikethrough').addEventListener('click', () => wrapSelection('~~'));
+document.getElementById('btn-heading').addEventListener('click', () => insertAtLineStart('## '));
+document.getElementById('btn-quote').addEventListener('click', () => insertAtLineStart('> '));
+document.getElementById('btn-code').addEventListener('click', () => wrapSelection('`'));
+document.getElementById('btn-ul').addEventListener('click', () => insertAtLineStart('- '));
+document.getElementById('btn-ol').addEventListener('click', () => insertAtLineStart('1. '));
+document.getElementById('btn-link').addEventListener('click', () => {
+    const selection = getSelectedText();
+    const selectedText = selection.text || 'link text';
+
+    // Store the selected text and show autocomplete
+    autocompleteContext.customText = selectedText;
+    showAutocomplete(state.allPages, selection.start, selectedText);
+});
+
+document.getElementById('btn-preview').addEventListener('click', togglePreview);
+
+function togglePreview() {
+    state.previewVisible = !state.previewVisible;
+    previewPane.classList.toggle('hidden', !state.previewVisible);
+    document.getElementById('btn-preview').classList.toggle('active', state.previewVisible);
+    if (state.previewVisible) {
+        updatePreview();
+    }
+}
+
+async function updatePreview(pageToShow = null) {
+    if (!state.previewVisible) return;
+
+    let content;
+    let pageName;
+
+    if (pageToShow) {
+        // Load specific page in preview (independent navigation)
+        try {
+            content = (await getPageContent(pageToShow)).content;
+            state.previewPage = pageToShow;
+            pageName = pageToShow;
+        } catch (error) {
+            showToast(`Error loading ${pageToShow}`, 'error');
+            return;
+        }
+    } else {
+        // Show current editor content
+        content = editor.value || '';
+        state.previewPage = state.currentPage;
+        pageName = state.currentPage;
+    }
+
+    // Only blocks that changed since the last render are re-rendered
+    await previewRenderer.render(content);
+}
+
+// Intercept internal link clicks (delegated, so re-rendered blocks need no wiring)
+previewContent.addEventListener('click', async (e) => {
+    const link = e.target.closest('a[href^="./"]');
+    if (!link) return;
+    e.preventDefault();
+    const href = link.getAttribute('href');
+
+    // Extract filename from ./filename.md and decode URL encoding
+    const match = href.match(/\.\/(.+)/);
+    if (match) {
+        const filename = decodeURIComponent(match[1]);
+        // Check if file exists in our pages
+        if (state.allPages.includes(filename)) {
+            // Navigate preview independently
+            await updatePreview(filename);
+            showToast(`Preview: ${filename}`);
+        } else {
+            showToast(`Page not found: ${filename}`, 'error');
+        }
+    }
+});
+
+// ===== KEYBOARD SHORTCUTS =====
+editor.addEventListener('keydown', (e) => {
+    // Handle autocomplete navigation
+    if (state.autocompleteVisible) {
+        if (e.key === 'ArrowDown') {
+            e.preventDefault();
+            updateAutocompleteSelection(1);
+            return;
+        } else if (e.key === 'ArrowUp') {
+            e.preventDefault();
+            updateAutocompleteSelection(-1);
+            return;
+        } else if (e.key === 'Enter') {
+            e.preventDefault();
+            selectCurrentAutocomplete();
+            return;
+        } else if (e.key === 'Escape') {
+            e.preventDefault();
+            hideAutocomplete();
+            return;
+        }
+    }
+
+    if (e.ctrlKey || e.metaKey) {
+        if (e.shiftKey) {
+            // Cmd+Shift shortcuts
+            switch(e.key.toLowerCase()) {
+                case 'k':
+                    e.preventDefault();
+                    deleteLine();
+                    break;
+                case 'l':
+                    e.preventDefault();
+                    document.getElementById('btn-ol').click();
+                    break;
+                case '[':
+                    e.preventDefault();
+                    decreaseHeading();
+                    break;
+                case ']':
+                    e.preventDefault();
+                    increaseHeading();
+                    break;
+            }
+        } else {
+            // Regular Cmd shortcuts
+            switch(e.key.toLowerCase()) {
+                case 'b':
+                    e.preventDefault();
+                    wrapSelection('**');
+                    break;
+                case 'i':
+                    e.preventDefault();
+                    wrapSelection('*');
+                    break;
+                case 'h':
+                    e.preventDefault();
+                    insertAtLineStart('## ');
+                    break;
+                case 'k':
+                    e.preventDefault();
+                    document.getElementById('btn-link').click();
+                    break;
+                case 'p':
+                    e.preventDefault();
+                    togglePreview();
+                    break;
+                case 's':
+                    e.preventDefault();
+                    savePageContent();
+                    break;
+                case '`':
+                    e.preventDefault();
+                    wrapSelection('`');
+                    break;
+                case 'd':
+                    e.preventDefault();
+                    duplicateLine();
+                    break;
+                case '/':
+                    e.preventDefault();
+                    toggleComment();
+                    break;
+                case 'e':
+                    e.preventDefault();
+                    toggleCodeBlock();
+                    break;
+                case 'q':
+                    e.preventDefault();
+                    document.getElementById('btn-quote').click();
+                    break;
+                case 'l':
+                    e.preventDefault();
+                    document.getElementById('btn-ul').click();
+                    break;
+                case 'enter':
+                    e.preventDefault();
+                    insertLineBelow();
+                    break;
+                case '[':
+                    e.preventDefault();
+                    decreaseHeading();
+                    break;
+                case ']':
+                    e.preventDefault();
+                    increaseHeading();
+                    break;
+            }
+        }
+    }
+
+    // Alt+Up/Down to move lines
+    if (e.altKey && !e.ctrlKey && !e.metaKey) {
+        if (e.key === 'ArrowUp') {
+            e.preventDefault();
+            moveLineUp();
+        } else if (e.key === 'ArrowDown') {
+            e.preventDefault();
+            moveLineDown();
+        }
+    }
+});
+
+// ===== AUTOCOMPLETE TRIGGER =====
+editor.addEventListener('input', (e) => {
+    const text = editor.value;
+    const cursorPos = editor.selectionStart;
+    const beforeCursor = text.substring(0, cursorPos);
+
+    // Check if user typed [[
+    if (beforeCursor.endsWith('[[')) {
+        showAutocomplete(state.allPages, cursorPos);
+    } else if (state.autocompleteVisible) {
+        // Check if still in autocomplete context
+        const linkStart = beforeCursor.lastIndexOf('[[');
+        const linkEnd = beforeCursor.lastIndexOf(']]');
+
+        if (linkStart === -1 || linkEnd > linkStart) {
+            hideAutocomplete();
+        }
+    }
+});
+
+// ===== AUTO-SAVE =====
+editor.addEventListener('input', triggerChange);
+
+// ===== INPUT MODAL FUNCTIONS =====
+function showInputModal(title, message, placeholder, onConfirm) {
+    const inputModalOverlay = document.getElementById('input-modal-overlay');
+    const inputModalInput = document.getElementById('input-modal-input');
+
+    document.getElementById('input-modal-title').textContent = title;
+    document.getElementById('input-modal-message').textContent = message;
+    inputModalInput.placeholder = placeholder;
+    inputModalInput.value = '';
+    inputModalOverlay.classList.add('show');
+    inputModalInput.focus();
+
+    const confirmBtn = document.getElementById('input-modal-confirm');
+    const cancelBtn = document.getElementById('input-modal-cancel');
+
+    const handleConfirm = () => {
+        const value = inputModalInput.value.trim();
+        if (value) {
+            onConfirm(value);
+            inputModalOverlay.classList.remove('show');
+            cleanup();
+        }
+    };
+
+    const handleCancel = () => {
+        inputModalOverlay.classList.remove('show');
+        cleanup();
+    };
+
+    const handleEnterKey = (e) => {
+        if (e.key === 'Enter') {
+            handleConfirm();
+        }
+    };
+
+    const cleanup = () => {
+        confirmBtn.removeEventListener('click', handleConfirm);
+        cancelBtn.removeEventListener('click', handleCancel);
+        inputModalInput.removeEventListener('keydown', handleEnterKey);
+        inputModalOverlay.removeEventListener('click', handleOverlayClick);
+    };
+
+    const handleOverlayClick = (e) => {
+        if (e.target === inputModalOverlay) handleCancel();
+    };
+
+    confirmBtn.addEventListener('click', handleConfirm);
+    cancelBtn.addEventListener('click', handleCancel);
+    inputModalInput.addEventListener('keydown', handleEnterKey);
+    inputModalOverlay.addEventListener('click', handleOverlayClick);
+}
+
+// ===== PAGE RENAME FUNCTION =====
+async function enableRename(pageNameSpan, filename) {
+    // Prevent multiple renames at once
+    if (document.querySelector('.rename-input') || state.operationInProgress) return;
+
+    const originalText = filename;
+    const filenameWithoutExt = filename.replace('.md', '');
+
+    // Create input element
+    const input = document.createElement('input');
+    input.type = 'text';
+    input.className = 'rename-input';
+    input.value = filenameWithoutExt;
+
+    // Replace text with input
+    pageNameSpan.textContent = '';
+    pageNameSpan.appendChild(input);
+    pageNameSpan.classList.add('editing');
+    input.focus();
+    input.select();
+
+    const finishRename = async (save) => {
+        const newFilename = input.value.trim();
+
+        if (save && newFilename && newFilename !== filenameWithoutExt) {
+            // Attempt rename
+            try {
+                lockPageList();
+
+                // Flush pending edits so link rewriting sees the latest content
+                if (state.unsavedChanges) {
+                    clearTimeout(state.saveTimeout);
+                    await savePageContent();
+                }
+
+                updateStatus('Renaming page...', 'saving');
+
+                const response = await fetch(apiUrl(`/api/pages/${filename}/rename?book=${BOOK_NAME}`), {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ new_filename: newFilename, update_links: true })
+                });
+
+                if (response.ok) {
+                    const data = await response.json();
+                    const linkCount = data.updated_pages.length;
+                    pageCache.remove(filename);
+                    showToast(linkCount
+                        ? `✓ Page renamed, updating links in ${linkCount} page${linkCount === 1 ? '' : 's'}`
+                        : '✓ Page renamed successfully!');
+
+                    // Update current page reference if this was the active page
+                    if (state.currentPage === filename) {
+                        state.currentPage = data.new_filename;
+                    }
+
+                    // Pages with rewritten links arrive through the change feed
+                    await loadPageList();
+                    updateStatus('Ready', 'saved');
+                } else {
+                    const error = await response.text();
+                    showToast(`Failed to rename: ${error}`, true);
+                    pageNameSpan.textContent = originalText;
+                    pageNameSpan.classList.remove('editing');
+                }
+            } catch (error) {
+                showToast('Network error while renaming page', true);
+                pageNameSpan.textContent = originalText;
+                pageNameSpan.classList.remove('editing');
+            } finally {
+                unlockPageList();
+            }
+        } else {
+            // Cancel rename
+            pageNameSpan.textContent = originalText;
+            pageNameSpan.classList.remove('editing');
+        }
+    };
+
+    input.addEventListener('blur', () => {
+        // Small delay to ensure blur doesn't interfere with input
+        setTimeout(() => finishRename(true), 100);
+    });
+
+    input.addEventListener('keydown', (e) => {
+        if (e.key === 'Enter') {
+            e.preventDefault();
+            input.blur(); // Trigger blur which will save
+        } else if (e.key === 'Escape') {
+            e.preventDefault();
+            finishRename(false);
+        }
+    });
+
+    // Prevent blur when clicking inside the input
+    input.addEventListener('mousedown', (e) => {
+        e.stopPropagation();
+    });
+
+    input.addEventListener('click', (e) => {
+        e.stopPropagation();
+    });
+}
+
+// ===== AUTOCOMPLETE FUNCTIONS =====
+function showAutocomplete(pages, cursorPos, customText = null) {
+    const dropdown = document.getElementById('autocomplete-dropdown');
+    const rect = editor.getBoundingClientRect();
+
+    // Calculate position (simplified - appears below cursor area)
+    dropdown.style.left = `${rect.left + 100}px`;
+    dropdown.style.top = `${rect.top + 100}px`;
+
+    // Store custom text in context
+    if (customText !== null) {
+        autocompleteContext.customText = customText;
+    }
+
+    dropdown.innerHTML = '';
+    pages.forEach((page, index) => {
+        const item = document.createElement('div');
+        item.className = 'autocomplete-item';
+        if (index === state.selectedAutocompleteIndex) {
+            item.classList.add('selected');
+        }
+        item.textContent = page;
+        item.onclick = () => {
+            insertPageLink(page, autocompleteContext.customText);
+            autocompleteContext.customText = null; // Reset after use
+        };
+        dropdown.appendChild(item);
+    });
+
+    dropdown.classList.add('show');
+    state.autocompleteVisible = true;
+}
+
+function hideAutocomplete() {
+    const dropdown = document.getElementById('autocomplete-dropdown');
+    dropdown.classList.remove('show');
+    state.autocompleteVisible = false;
+    state.selectedAutocompleteIndex = 0;
+    autocompleteContext.customText = null; // Reset context
+}
+
+function insertPageLink(page, customText = null) {
+    const selection = getSelectedText();
+    const text = editor.value;
+    const beforeCursor = text.substring(0, selection.start);
+    const afterCursor = text.substring(selection.end);
+
+    let linkText, linkStart, newPos;
+
+    editor.focus();
+
+    if (customText !== null) {
+        // Toolbar button mode - use custom text (selected text or provided text)
+        const encodedPage = encodeURIComponent(page).replace(/%2F/g, '/');
+        linkText = `[${customText}](./${encodedPage})`;
+
+        // Replace selection with link - preserve undo
+        document.execCommand('insertText', false, linkText);
+        newPos = selection.start + linkText.length;
+    } else {
+        // [[ autocomplete mode - find [[ position
+        linkStart = beforeCursor.lastIndexOf('[[');
+        if (linkStart === -1) return;
+
+        const pageName = page.replace('.md', '').replace(/_/g, ' ');
+        const encodedPage = encodeURIComponent(page).replace(/%2F/g, '/');
+        linkText = `[${pageName}](./${encodedPage})`;
+
+        // Replace [[ with link - preserve undo
+        editor.setSelectionRange(linkStart, selection.start);
+        document.execCommand('insertText', false, linkText);
+        newPos = linkStart + linkText.length;
+    }
+
+    // Position cursor after the link
+    editor.setSelectionRange(newPos, newPos);
+
+    hideAutocomplete();
+    triggerChange();
+}
+
+function updateAutocompleteSelection(direction) {
+    if (!state.autocompleteVisible) return;
+
+    const items = document.querySelectorAll('.autocomplete-item');
+    if (items.length === 0) return;
+
+    state.selectedAutocompleteIndex += direction;
+
+    if (state.selectedAutocompleteIndex < 0) {
+        state.selectedAutocompleteIndex = items.length - 1;
+    } else if (state.selectedAutocompleteIndex >= items.length) {
+        state.selectedAutocompleteIndex = 0;
+    }
+
+    items.forEach((item, index) => {
+        item.classList.toggle('selected', index === state.selectedAutocompleteIndex);
+    });
+}
+
+function selectCurrentAutocomplete() {
+    const selected = document.querySelector('.autocomplete-item.selected');
+    if (selected) {
+        selected.click();
+    }
+}
+
+// Store context for autocomplete (used by toolbar button)
+let autocompleteContext = {
+    customText: null
+};
+
+// Book name comes from the page shell (templates/index.html)
+const BOOK_NAME = document.body.dataset.bookName;
+
+// ===== HELPER FUNCTIONS =====
+function apiUrl(endpoint, includeBook = true) {
+    if (includeBook && !endpoint.includes('?')) {
+        return `${endpoint}?book=${encodeURIComponent(BOOK_NAME)}`;
+    } else if (includeBook && endpoint.includes('?')) {
+        return `${endpoint}&book=${encodeURIComponent(BOOK_NAME)}`;
+    }
+    return endpoint;
+}
+
+// ===== PAGE CACHE =====
+// Page contents cached in IndexedDB per book, each with the revision it
+// was fetched at. A cached page is shown straight away when its revision
+// matches the server's, and revalidated with a conditional request.
+const pageCache = (() => {
+    const memory = new Map();
+    const prefix = `${BOOK_NAME}/`;
+    const key = (filename) => prefix + filename;
+    let dbPromise = null;
+
+    function openDb() {
+        if (!dbPromise) {
+            dbPromise = new Promise((resolve) => {
+                if (!window.indexedDB) return resolve(null);
+                const request = indexedDB.open('jugaadpress', 1);
+                request.onupgradeneeded = () => request.result.createObjectStore('pages');
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => resolve(null); // e.g. private browsing: memory only
+            });
+        }
+        return dbPromise;
+    }
+
+    async function run(mode, action) {
+        const db = await openDb();
+        if (!db) return undefined;
+        return new Promise((resolve) => {
+            const tx = db.transaction('pages', mode);
+            const request = action(tx.objectStore('pages'));
+            tx.oncomplete = () => resolve(request ? request.result : undefined);
+            tx.onerror = () => resolve(undefined);
+        });
+    }
+
+    return {
+        async get(filename) {
+            if (memory.has(key(filename))) return memory.get(key(filename));
+            const entry = await run('readonly', store => store.get(key(filename)));
+            if (entry) memory.set(key(filename), entry);
+            return entry;
+        },
+        async put(filename, content, revision) {
+            const entry = { content, revision };
+            memory.set(key(filename), entry);
+            await run('readwrite', store => store.put(entry, key(filename)));
+        },
+        async remove(filename) {
+            memory.delete(key(filename));
+            await run('readwrite', store => store.delete(key(filename)));
+        },
+        async prune(filenames) {
+            // Forget pages that no longer exist in this book
+            const keep = new Set(filenames.map(key));
+            for (const k of [...memory.keys()]) {
+                if (k.startsWith(prefix) && !keep.has(k)) memory.delete(k);
+            }
+            await run('readwrite', store => {
+                const request = store.openCursor(IDBKeyRange.bound(prefix, prefix + '\uffff'));
+                request.onsuccess = () => {
+                    const cursor = request.result;
+                    if (!cursor) return;
+                    if (!keep.has(cursor.key)) cursor.delete();
+                    cursor.continue();
+                };
+                return null;
+            });
+        }
+    };
+})();
+
+// Fetch a page, sending the cached revision so unchanged pages come back as 304
+async function fetchPage(filename) {
+    const cached = await pageCache.get(filename);
+    const headers = cached ? { 'If-None-Match': `"${cached.revision}"` } : {};
+    const response = await fetch(apiUrl(`/api/pages/${filename}`), { headers });
+
+    if (response.status === 304 && cached) {
+        state.revisions[filename] = cached.revision;
+        return cached.content;
+    }
+    if (!response.ok) {
+        throw new Error(await response.text());
+    }
+
+    const content = await response.text();
+    const revision = (response.headers.get('ETag') || '').replace(/"/g, '');
+    if (revision) {
+        state.revisions[filename] = revision;
+        await pageCache.put(filename, content, revision);
+    }
+    return content;
+}
+
+// Page content, from cache when it's at the server's current revision
+async function getPageContent(filename) {
+    const cached = await pageCache.get(filename);
+    if (cached && cached.revision === state.revisions[filename]) {
+        return { content: cached.content, fromCache: true };
+    }
+    return { content: await fetchPage(filename), fromCache: false };
+}
+
+// Warm the cache with the pages either side of the open one
+function prefetchNeighbours(filename) {
+    const index = state.allPages.indexOf(filename);
+    [state.allPages[index - 1], state.allPages[index + 1]].forEach(async (page) => {
+        if (index === -1 || !page) return;
+        const cached = await pageCache.get(page);
+        if (!cached || cached.revision !== state.revisions[page]) {
+            fetchPage(page).catch(() => {});
+        }
+    });
+}
+
+// ===== SIDEBAR =====
+function createPageItem(page) {
+    const li = document.createElement('li');
+
+    const pageName = document.createElement('span');
+    pageName.className = 'page-name';
+    pageName.textContent = page;
+
+    // Store click timeout for detecting single vs rename intent
+    let clickTimeout = null;
+    let clickCount = 0;
+
+    pageName.onclick = (e) => {
+        e.stopPropagation();
+        clickCount++;
+
+        if (clickCount === 1) {
+            // First click - wait to see if it's a rename (second click)
+            clickTimeout = setTimeout(() => {
+                // Single click - load page
+                loadPageContent(page);
+                clickCount = 0;
+            }, 200); // Snappy but still detects double-click
+        } else if (clickCount === 2) {
+            // Second click within timeout - enter rename mode
+            clearTimeout(clickTimeout);
+            clickCount = 0;
+            enableRename(pageName, page);
+        }
+    };
+
+    const deleteBtn = document.createElement('button');
+    deleteBtn.className = 'delete-page-btn';
+    deleteBtn.innerHTML = '<i class="fa-solid fa-trash"></i>';
+    deleteBtn.title = 'Delete page';
+    deleteBtn.onclick = (e) => {
+        e.stopPropagation();
+        deletePage(page);
+    };
+
+    li.appendChild(pageName);
+    li.appendChild(deleteBtn);
+    enablePageDrag(li, page);
+    return li;
+}
+
+// Bring the sidebar in line with `pages`, reusing existing items
+function renderPageList(pages) {
+    const items = {};
+    pageList.querySelectorAll('li[data-page]').forEach(li => {
+        items[li.dataset.page] = li;
+    });
+    pageList.innerHTML = '';
+
+    if (pages.length === 0) {
+        pageList.innerHTML = '<li style="padding: 10px; color: var(--text-secondary); text-align: center;">No pages yet. Create your first page!</li>';
+        return;
+    }
+
+    pages.forEach(page => {
+        const li = items[page] || createPageItem(page);
+        li.classList.toggle('active', page === state.currentPage);
+        pageList.appendChild(li);
+    });
+}
+
+// ===== CHANGE FEED =====
+// Page changes from other tabs, devices and Drive arrive as server-sent
+// events and are patched into the sidebar and page cache in place.
+function connectChangeFeed() {
+    if (!window.EventSource) return;
+    const feed = new EventSource(`/api/books/${encodeURIComponent(BOOK_NAME)}/events`);
+    const on = (type, handler) => feed.addEventListener(type, (e) => handler(JSON.parse(e.data)));
+
+    on('resync', (data) => {
+        const changed = Object.keys(data.revisions).filter(page => data.revisions[page] !== state.revisions[page]);
+        state.revisions = data.revisions;
+        applyPageOrder(data.order);
+        pageCache.prune(data.order);
+        changed.forEach(page => pageRevised(page, data.revisions[page]));
+    });
+    on('created', (data) => {
+        state.revisions[data.page] = data.revision;
+    });
+    on('updated', (data) => {
+        if (state.revisions[data.page] !== data.revision) {
+            state.revisions[data.page] = data.revision;
+            pageRevised(data.page, data.revision);
+        }
+    });
+    on('renamed', (data) => {
+        state.revisions[data.to] = data.revision;
+        delete state.revisions[data.page];
+        pageCache.remove(data.page);
+        if (state.currentPage === data.page) state.currentPage = data.to;
+        if (state.previewPage === data.page) state.previewPage = data.to;
+    });
+    on('deleted', (data) => {
+        delete state.revisions[data.page];
+        pageCache.remove(data.page);
+        if (state.currentPage === data.page) {
+            showToast(`${data.page} was deleted elsewhere`, true);
+            if (!state.unsavedChanges) {
+                state.currentPage = null;
+                const next = state.allPages.find(page => page !== data.page);
+                if (next) loadPage(next);
+            }
+        }
+    });
+    on('order', (data) => applyPageOrder(data.order));
+}
+
+function applyPageOrder(order) {
+    state.allPages = order;
+    renderPageList(order);
+}
+
+// Another device saved a new revision of a page
+function pageRevised(page, revision) {
+    if (page !== state.currentPage) return; // the cache entry is now stale and refetched on open
+    if (state.saving) return; // our own save; its response records the revision
+    if (state.unsavedChanges) {
+        showToast(`${page} was changed elsewhere; saving will overwrite it`, true);
+        return;
+    }
+    revalidatePage(page, editor.value);
+}
+
+// ===== API FUNCTIONS =====
+async function loadPageList() {
+    showLoading('Loading pages from Drive...');
+
+    try {
+        const response = await fetch(`/api/books/${encodeURIComponent(BOOK_NAME)}/revisions`);
+
+        if (!response.ok) {
+            const errorText = await response.text();
+            try {
+                const error = JSON.parse(errorText);
+                throw new Error(error.error || 'Failed to load pages');
+            } catch (e) {
+                throw new Error(`Failed to load pages: ${errorText}`);
+            }
+        }
+
+        const data = await response.json();
+        const pages = data.order;
+        state.allPages = pages; // Store for autocomplete
+        state.revisions = data.revisions;
+        pageCache.prune(pages);
+        renderPageList(pages);
+
+        if (pages.length > 0 && !state.currentPage) {
+            loadPageContent(pages[0]);
+        }
+
+        hideLoading();
+    } catch (error) {
+        console.error('Error loading pages:', error);
+        hideLoading();
+        showToast('Failed to load pages: ' + error.message, true);
+        updateStatus('Error loading pages', 'error');
+        pageList.innerHTML = `<li style="padding: 10px; color: red;">Error: ${error.message}</li>`;
+    }
+}
+
+async function loadPageContent(filename) {
+    try {
+        if (state.unsavedChanges && state.currentPage) {
+            showModal(
+                'Unsaved Changes',
+                `You have unsaved changes in ${state.currentPage}. Continue anyway?`,
+                () => loadPage(filename)
+            );
+        } else {
+            loadPage(filename);
+        }
+    } catch (error) {
+        showToast('Failed to load page', true);
+        updateStatus('Error loading page', 'error');
+    }
+}
+
+async function loadPage(filename) {
+    // INSTANT FEEDBACK: Update sidebar selection immediately
+    document.querySelectorAll('#page-list li').forEach(li => {
+        const pageName = li.querySelector('.page-name');
+        li.classList.toggle('active', pageName && pageName.textContent === filename);
+    });
+
+    // CRITICAL: Cancel any pending auto-save
+    clearTimeout(state.saveTimeout);
+
+    // Dim the editor while a page has to come from the server
+    // (the .loading class fades it; cached pages swap in directly)
+    const loadingTimer = setTimeout(() => {
+        editor.classList.add('loading');
+        updateStatus('Loading...', 'saving');
+    }, 50);
+
+    try {
+        const { content, fromCache } = await getPageContent(filename);
+        clearTimeout(loadingTimer);
+
+        // Update editor with actual content
+        // This WILL trigger 'input' event, so we need to handle it
+        const oldUnsavedState = state.unsavedChanges;
+        editor.value = content;
+
+        // Immediately reset unsaved state (before auto-save can trigger)
+        state.currentPage = filename;
+        state.unsavedChanges = false;
+        clearTimeout(state.saveTimeout); // Cancel any auto-save from setValue
+
+        // Remove loading class to fade in
+        editor.classList.remove('loading');
+        updateStatus('Ready', 'saved');
+
+        // Update preview if it's visible
+        if (state.previewVisible) {
+            updatePreview();
+        }
+
+        // Only focus editor if preview is not visible
+        if (!state.previewVisible) {
+            editor.focus();
+        }
+
+        if (fromCache) {
+            revalidatePage(filename, content);
+        }
+        prefetchNeighbours(filename);
+    } catch (error) {
+        // DON'T set placeholder on error either
+        clearTimeout(loadingTimer);
+        editor.classList.remove('loading');
+        updateStatus('Error loading page', 'error');
+        showToast('Failed to load page', true);
+    }
+}
+
+// Check a page shown from cache against Drive, and swap in newer content
+// if the user hasn't started editing it yet
+async function revalidatePage(filename, shownContent) {
+    try {
+        const content = await fetchPage(filename);
+        if (content !== shownContent && state.currentPage === filename && !state.unsavedChanges) {
+            editor.value = content;
+            clearTimeout(state.saveTimeout);
+            if (state.previewVisible) updatePreview();
+            updateStatus('Updated from Drive', 'saved');
+        }
+    } catch (error) {
+        // Keep showing the cached copy; the next load retries
+    }
+}
+
+// Headers and body for a JSON POST; long bodies are gzipped when the browser can
+async function jsonRequestBody(data) {
+    const json = JSON.stringify(data);
+    if (json.length < 1024 || !window.CompressionStream) {
+        return { headers: { 'Content-Type': 'application/json' }, body: json };
+    }
+    const stream = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+    return {
+        headers: { 'Content-Type': 'application/json', 'Content-Encoding': 'gzip' },
+        body: await new Response(stream).blob()
+    };
+}
+
+async function savePageContent() {
+    if (!state.currentPage) return;
+
+    try {
+        updateStatus('Saving...', 'saving');
+        state.saving = true;
+        const page = state.currentPage;
+        const content = editor.value;
+        const response = await fetch(apiUrl(`/api/pages/${page}`), {
+            method: 'POST',
+            ...await jsonRequestBody({
+                book: BOOK_NAME,
+                content
+            })
+        });
+        if (response.ok) {
+            const data = await response.json();
+            state.revisions[page] = data.revision;
+            await pageCache.put(page, content, data.revision);
+        }
+        state.unsavedChanges = false;
+        updateStatus('Saved!', 'saved');
+        showToast('Page saved successfully');
+    } catch (error) {
+        updateStatus('Save failed', 'error');
+        showToast('Failed to save page', true);
+    } finally {
+        state.saving = false;
+    }
+}
+
+async function sendToKindle() {
+    if (state.sending) return;
+
+    showModal(
+        'Send to Kindle',
+        'Compile all pages and send the book to your Kindle?',
+        () => deliverToKindle(false)
+    );
+}
+
+async function deliverToKindle(force) {
+    try {
+        state.sending = true;
+        sendButton.disabled = true;
+        updateStatus('Compiling and sending to Kindle...', 'saving');
+
+        const response = await fetch(`/api/books/${encodeURIComponent(BOOK_NAME)}/send-to-kindle`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ force })
+        });
+
+        if (response.ok) {
+            const data = await response.json();
+            if (data.unchanged) {
+                updateStatus('Ready', 'saved');
+                const sentAt = data.sent_at ? new Date(data.sent_at).toLocaleString() : 'earlier';
+                showModal(
+                    'Already on your Kindle',
+                    `Nothing changed since this book was sent (${sentAt}). Send it again anyway?`,
+                    () => deliverToKindle(true)
+                );
+                return;
+            }
+            updateStatus('Book successfully sent!', 'saved');
+            showToast(data.volumes > 1 ? `Book sent to Kindle in ${data.volumes} volumes!` : 'Book sent to Kindle successfully!');
+        } else {
+            const error = await response.json().catch(() => ({}));
+            updateStatus('Send failed', 'error');
+            showToast(`Failed to send: ${error.error || response.statusText}`, true);
+        }
+    } catch (error) {
+        updateStatus('Send failed', 'error');
+        showToast('Network error while sending to Kindle', true);
+    } finally {
+        state.sending = false;
+        sendButton.disabled = false;
+    }
+}
+
+sendButton.addEventListener('click', sendToKindle);
+
+// Kindle Library link hover effect
+const kindleLink = document.getElementById('kindle-library-link');
+kindleLink.addEventListener('mouseover', () => {
+    kindleLink.style.color = '#3fb950';
+});
+kindleLink.addEventListener('mouseout', () => {
+    kindleLink.style.color = '#58a6ff';
+});
+
+// ===== PAGE MANAGEMENT FUNCTIONS =====
+// ===== CHAPTER ORDER (drag to reorder) =====
+function enablePageDrag(li, page) {
+    li.draggable = true;
+    li.dataset.page = page;
+
+    li.addEventListener('dragstart', (e) => {
+        if (state.operationInProgress) {
+            e.preventDefault();
+            return;
+        }
+        e.dataTransfer.effectAllowed = 'move';
+        e.dataTransfer.setData('text/plain', page);
+        li.classList.add('dragging');
+    });
+
+    li.addEventListener('dragend', () => {
+        li.classList.remove('dragging');
+    });
+
+    li.addEventListener('dragover', (e) => {
+        e.preventDefault();
+        const rect = li.getBoundingClientRect();
+        const before = e.clientY < rect.top + rect.height / 2;
+        li.classList.toggle('drop-before', before);
+        li.classList.toggle('drop-after', !before);
+    });
+
+    li.addEventListener('dragleave', () => {
+        li.classList.remove('drop-before', 'drop-after');
+    });
+
+    li.addEventListener('drop', (e) => {
+        e.preventDefault();
+        const before = li.classList.contains('drop-before');
+        li.classList.remove('drop-before', 'drop-after');
+
+        const moved = e.dataTransfer.getData('text/plain');
+        if (!moved || moved === page) return;
+
+        // Drop target -> the page the moved one should follow
+        const order = state.allPages.filter(p => p !== moved);
+        const index = order.indexOf(page);
+        const after = before ? (order[index - 1] || '') : page;
+        movePage(moved, after);
+    });
+}
+
+async function movePage(page, after) {
+    try {
+        lockPageList();
+        updateStatus('Reordering...', 'saving');
+
+        const response = await fetch(`/api/books/${encodeURIComponent(BOOK_NAME)}/order/move`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ page, after })
+        });
+
+        if (response.ok) {
+            const data = await response.json();
+
+            // Reorder the existing sidebar items instead of reloading from Drive
+            applyPageOrder(data.order);
+            updateStatus('Saved', 'saved');
+        } else {
+            const error = await response.json();
+            showToast(`Failed to move page: ${error.error}`, true);
+            updateStatus('Error', 'error');
+        }
+    } catch (error) {
+        showToast('Network error while moving page', true);
+        updateStatus('Error', 'error');
+    } finally {
+        unlockPageList();
+    }
+}
+
+async function createNewPage(filename) {
+    try {
+        updateStatus('Creating page...', 'saving');
+        const newPageBtn = document.getElementById('btn-new-page');
+        newPageBtn.disabled = true;
+
+        const response = await fetch(apiUrl(`/api/pages/${filename}`), {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ book: BOOK_NAME, content: '' })
+        });
+
+        if (response.ok) {
+            const data = await response.json();
+            showToast('✓ Page created successfully!');
+            await loadPageList();
+
+            // Small delay for smoother transition
+            setTimeout(() => {
+                loadPageContent(data.filename);
+            }, 150);
+        } else {
+            const error = await response.text();
+            showToast(`Failed to create page: ${error}`, true);
+            updateStatus('Error', 'error');
+        }
+    } catch (error) {
+        showToast('Network error while creating page', true);
+        updateStatus('Error', 'error');
+    } finally {
+        setTimeout(() => {
+            const newPageBtn = document.getElementById('btn-new-page');
+            newPageBtn.disabled = false;
+        }, 300);
+    }
+}
+
+function lockPageList() {
+    state.operationInProgress = true;
+    document.querySelectorAll('#page-list button, #page-list .page-name').forEach(el => {
+        el.style.pointerEvents = 'none';
+        el.style.opacity = '0.5';
+    });
+}
+
+function unlockPageList() {
+    state.operationInProgress = false;
+    document.querySelectorAll('#page-list button, #page-list .page-name').forEach(el => {
+        el.style.pointerEvents = '';
+        el.style.opacity = '';
+    });
+}
+
+async function deletePage(filename) {
+    if (state.operationInProgress) return;
+
+    showModal(
+        '⚠️ Delete Page',
+        `Are you sure you want to delete "${filename}"? This action cannot be undone.`,
+        async () => {
+            try {
+                lockPageList();
+                updateStatus('Deleting page...', 'saving');
+
+                const response = await fetch(apiUrl(`/api/pages/${filename}`), {
+                    method: 'DELETE'
+                });
+
+                if (response.ok) {
+                    showToast('✓ Page deleted successfully!');
+                    pageCache.remove(filename);
+
+                    // If deleted page was the current one, smoothly clear editor
+                    if (state.currentPage === filename) {
+                        // Cancel any pending save first
+                        clearTimeout(state.saveTimeout);
+                        state.currentPage = null; // Set to null BEFORE clearing editor
+                        state.unsavedChanges = false;
+
+                        editor.classList.add('loading');
+                        setTimeout(() => {
+                            editor.value = '';
+                            editor.classList.remove('loading');
+                        }, 100);
+                    }
+
+                    await loadPageList();
+                    updateStatus('Ready', 'saved');
+                } else {
+                    const error = await response.text();
+                    showToast(`Failed to delete page: ${error}`, true);
+                    updateStatus('Error', 'error');
+                }
+            } catch (error) {
+                showToast('Network error while deleting page', true);
+                updateStatus('Error', 'error');
+            } finally {
+                unlockPageList();
+            }
+        }
+    );
+}
+
+// ===== SMART PAGE NUMBERING =====
+function detectNumberingPattern(pages) {
+    if (pages.length === 0) {
+        return { format: 'int', separator: '_', padding: 2, nextNumber: 1 };
+    }
+
+    // Patterns to detect:
+    // Integer: 0, 1, 2 or 00, 01, 02
+    // Float with dot: 1.1, 1.2, 2.1
+    // Float with dash: 1-1, 1-2, 2-1
+    // Separator: "_" or " "
+
+    const patterns = pages.map(page => {
+        // Try to extract number pattern from start of filename
+        // Match: optional leading zeros + number + (. or -) + optional decimals + (_ or space)
+        const match = page.match(/^(0*)(\d+)([.\-](\d+))?([_ ])/);
+
+        if (!match) return null;
+
+        return {
+            leadingZeros: match[1].length,
+            integer: parseInt(match[2]),
+            hasDecimal: !!match[3],
+            decimalSeparator: match[3] ? match[3][0] : null,
+            decimal: match[4] ? parseInt(match[4]) : null,
+            separator: match[5],
+            raw: match[0]
+        };
+    }).filter(p => p !== null);
+
+    if (patterns.length === 0) {
+        return { format: 'int', separator: '_', padding: 2, nextNumber: 1 };
+    }
+
+    // Detect mode (most common pattern)
+    const separatorCounts = patterns.reduce((acc, p) => {
+        acc[p.separator] = (acc[p.separator] || 0) + 1;
+        return acc;
+    }, {});
+    const modeSeparator = Object.keys(separatorCounts).reduce((a, b) =>
+        separatorCounts[a] > separatorCounts[b] ? a : b
+    );
+
+    const hasDecimals = patterns.filter(p => p.hasDecimal).length;
+    const isDecimalFormat = hasDecimals > patterns.length / 2;
+
+    // Detect decimal separator mode if using decimals
+    let decimalSeparator = '.';
+    if (isDecimalFormat) {
+        const decimalSepCounts = patterns
+            .filter(p => p.decimalSeparator)
+            .reduce((acc, p) => {
+                acc[p.decimalSeparator] = (acc[p.decimalSeparator] || 0) + 1;
+                return acc;
+            }, {});
+        if (Object.keys(decimalSepCounts).length > 0) {
+            decimalSeparator = Object.keys(decimalSepCounts).reduce((a, b) =>
+                decimalSepCounts[a] > decimalSepCounts[b] ? a : b
+            );
+        }
+    }
+
+    // Detect padding (most common leading zeros + digit count)
+    const paddingCounts = patterns.reduce((acc, p) => {
+        const padding = p.leadingZeros + p.integer.toString().length;
+        acc[padding] = (acc[padding] || 0) + 1;
+        return acc;
+    }, {});
+    const modePadding = parseInt(Object.keys(paddingCounts).reduce((a, b) =>
+        paddingCounts[a] > paddingCounts[b] ? a : b
+    ));
+
+    // Calculate next number
+    let nextNumber;
+    if (isDecimalFormat) {
+        // Group by integer part
+        const groups = patterns.reduce((acc, p) => {
+            if (!acc[p.integer]) acc[p.integer] = [];
+            if (p.decimal !== null) acc[p.integer].push(p.decimal);
+            return acc;
+        }, {});
+
+        const integers = Object.keys(groups).map(k => parseInt(k)).sort((a, b) => a - b);
+        const lastInteger = integers[integers.length - 1];
+        const lastGroup = groups[lastInteger];
+
+        if (lastGroup.length > 0) {
+            const maxDecimal = Math.max(...lastGroup);
+            nextNumber = `${lastInteger}${decimalSeparator}${maxDecimal + 1}`;
+        } else {
+            nextNumber = `${lastInteger + 1}${decimalSeparator}1`;
+        }
+    } else {
+        // Simple integer increment
+        const numbers = patterns.map(p => p.integer);
+        const maxNum = Math.max(...numbers);
+        nextNumber = String(maxNum + 1).padStart(modePadding, '0');
+    }
+
+    return {
+        format: isDecimalFormat ? 'decimal' : 'int',
+        separator: modeSeparator,
+        padding: modePadding,
+        decimalSeparator: decimalSeparator,
+        nextNumber: nextNumber
+    };
+}
+
+// ===== NEW PAGE BUTTON =====
+document.getElementById('btn-new-page').addEventListener('click', () => {
+    // Detect pattern from existing pages
+    const pattern = detectNumberingPattern(state.allPages);
+
+    // Build suggested name based on detected pattern
+    const suggestedName = `${pattern.nextNumber}${pattern.separator}`;
+
+    showInputModal(
+        'Create New Page',
+        'Enter a filename for your new page:',
+        'e.g., my_page',
+        createNewPage
+    );
+
+    // Pre-fill with smart suggestion
+    const input = document.getElementById('input-modal-input');
+    input.value = suggestedName;
+    // Position cursor after the number prefix
+    setTimeout(() => {
+        input.setSelectionRange(suggestedName.length, suggestedName.length);
+    }, 0);
+});
+
+// ===== WARN ON PAGE LEAVE =====
+window.addEventListener('beforeunload', (e) => {
+    if (state.unsavedChanges) {
+        e.preventDefault();
+        e.returnValue = '';
+    }
+});
+
+// ===== INITIALIZE =====
+async function loadEditorUserInfo() {
+    try {
+        const response = await fetch('/api/user');
+        if (response.ok) {
+            const user = await response.json();
+            if (user.name) {
+                const firstName = user.name.split(' ')[0].toLowerCase();
+                const subtitleEl = document.getElementById('editorSubtitle');
+                subtitleEl.innerHTML = `// <span style="color: #ff6b6b; text-shadow: 0 0 10px rgba(255, 107, 107, 0.4);">@${firstName}</span>`;
+            }
+        }
+    } catch (error) {
+        // Silent fail - user info is optional
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    loadEditorUserInfo();
+    loadPageList().then(connectChangeFeed);
+    editor.focus();
+});
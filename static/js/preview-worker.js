@@ -0,0 +1,18 @@
+/* ===== JUGAADPRESS - PREVIEW WORKER ===== */
+
+/**
+ * Renders markdown blocks off the main thread for PreviewRenderer.
+ * Messages: {type: 'init', markedUrl} once, then {type: 'render', id, sources};
+ * replies with {id, html} where html[i] renders sources[i].
+ */
+self.onmessage = (e) => {
+    const message = e.data;
+    if (message.type === 'init') {
+        importScripts(message.markedUrl);
+    } else if (message.type === 'render') {
+        self.postMessage({
+            id: message.id,
+            html: message.sources.map(source => marked.parse(source))
+        });
+    }
+};
@@ -0,0 +1,198 @@
+/* ===== JUGAADPRESS - INCREMENTAL PREVIEW ===== */
+
+const LIST_ITEM_RE = /^\s{0,3}([-*+]|\d+[.)])\s/;
+const FENCE_RE = /^\s{0,3}(`{3,}|~{3,})/;
+const REFERENCE_DEFINITION_RE = /^\s{0,3}\[[^\]]+\]:\s*\S/;
+
+/**
+ * Split markdown into top-level blocks that render the same on their own.
+ * Blocks end at blank lines, except inside fenced code, before indented
+ * continuation lines, and between items of one list.
+ */
+function splitMarkdownBlocks(text) {
+    const blocks = [];
+    let current = [];
+    let fence = null;
+    let afterBlank = false;
+
+    for (const line of text.split('\n')) {
+        if (fence) {
+            current.push(line);
+            const close = line.match(FENCE_RE);
+            if (close && close[1][0] === fence[0] && close[1].length >= fence.length && !line.slice(close[0].length).trim()) {
+                fence = null;
+            }
+            continue;
+        }
+
+        if (!line.trim()) {
+            afterBlank = current.length > 0;
+            continue;
+        }
+
+        if (afterBlank) {
+            const continues = /^( {2,}|\t)/.test(line) || (LIST_ITEM_RE.test(line) && LIST_ITEM_RE.test(current[0]));
+            if (continues) {
+                current.push('');
+            } else {
+                blocks.push(current.join('\n'));
+                current = [];
+            }
+            afterBlank = false;
+        }
+
+        current.push(line);
+        const open = line.match(FENCE_RE);
+        if (open) fence = open[1];
+    }
+
+    if (current.length) blocks.push(current.join('\n'));
+    return blocks;
+}
+
+/**
+ * Reference-style link definitions ([id]: url) in a document; every block
+ * needs them to resolve its links
+ */
+function referenceDefinitions(text) {
+    return text.split('\n').filter(line => REFERENCE_DEFINITION_RE.test(line)).join('\n');
+}
+
+/**
+ * Renders markdown into a container block by block. Only blocks whose
+ * source changed are rendered (in a Web Worker when available) and swapped
+ * into the DOM; everything else, including the scroll position, stays put.
+ */
+class PreviewRenderer {
+    constructor(container, { workerUrl = null, markedUrl = null } = {}) {
+        this.container = container;
+        this.blocks = [];        // [{source, el}] in document order
+        this.cache = new Map();  // block source -> html
+        this.jobs = new Map();   // worker job id -> {sources, resolve}
+        this.nextJob = 1;
+        this.latest = null;      // newest text waiting to be shown
+        this.waiters = [];
+        this.running = false;
+        this.worker = null;
+
+        if (window.Worker && workerUrl && markedUrl) {
+            try {
+                this.worker = new Worker(workerUrl);
+                this.worker.postMessage({ type: 'init', markedUrl });
+                this.worker.onmessage = (e) => this._finishJob(e.data.id, e.data.html);
+                this.worker.onerror = () => this._dropWorker();
+            } catch (error) {
+                this.worker = null;
+            }
+        }
+    }
+
+    /**
+     * Show `text`; resolves once it (or newer text) is in the DOM. Calls made
+     * while a render is running are coalesced into one follow-up render.
+     */
+    render(text) {
+        this.latest = text;
+        const shown = new Promise(resolve => this.waiters.push(resolve));
+        if (!this.running) this._drain();
+        return shown;
+    }
+
+    async _drain() {
+        this.running = true;
+        try {
+            while (this.latest !== null) {
+                const text = this.latest;
+                const waiters = this.waiters;
+                this.latest = null;
+                this.waiters = [];
+                try {
+                    await this._renderNow(text);
+                } finally {
+                    waiters.forEach(resolve => resolve());
+                }
+            }
+        } finally {
+            this.running = false;
+        }
+    }
+
+    async _renderNow(text) {
+        const definitions = referenceDefinitions(text);
+        const sources = splitMarkdownBlocks(text).map(block => definitions ? `${block}\n\n${definitions}` : block);
+
+        const missing = [...new Set(sources.filter(source => !this.cache.has(source)))];
+        if (missing.length) {
+            const html = await this._renderBlocks(missing);
+            missing.forEach((source, i) => this.cache.set(source, html[i]));
+        }
+
+        this._patch(sources);
+
+        // Keep what's on screen; drop blocks that are long gone
+        if (this.cache.size > sources.length * 2 + 200) {
+            const keep = new Set(sources);
+            for (const source of this.cache.keys()) {
+                if (!keep.has(source)) this.cache.delete(source);
+            }
+        }
+    }
+
+    _renderBlocks(sources) {
+        if (!this.worker) {
+            return Promise.resolve(sources.map(source => marked.parse(source)));
+        }
+        return new Promise((resolve) => {
+            const id = this.nextJob++;
+            this.jobs.set(id, { sources, resolve });
+            this.worker.postMessage({ type: 'render', id, sources });
+        });
+    }
+
+    _finishJob(id, html) {
+        const job = this.jobs.get(id);
+        if (!job) return;
+        this.jobs.delete(id);
+        job.resolve(html || job.sources.map(source => marked.parse(source)));
+    }
+
+    _dropWorker() {
+        // Worker failed (e.g. couldn't load marked); render on the main thread from now on
+        this.worker = null;
+        for (const id of [...this.jobs.keys()]) this._finishJob(id, null);
+    }
+
+    // Replace only the run of blocks between the unchanged head and tail
+    _patch(sources) {
+        const old = this.blocks;
+        let start = 0;
+        while (start < old.length && start < sources.length && old[start].source === sources[start]) start++;
+
+        let oldEnd = old.length;
+        let newEnd = sources.length;
+        while (oldEnd > start && newEnd > start && old[oldEnd - 1].source === sources[newEnd - 1]) {
+            oldEnd--;
+            newEnd--;
+        }
+        if (start === oldEnd && start === newEnd) return;
+
+        const scrollTop = this.container.scrollTop;
+        const next = oldEnd < old.length ? old[oldEnd].el : null;
+        for (let i = start; i < oldEnd; i++) old[i].el.remove();
+
+        if (old.length === 0) this.container.innerHTML = '';
+        const added = [];
+        const fragment = document.createDocumentFragment();
+        for (let i = start; i < newEnd; i++) {
+            const el = document.createElement('div');
+            el.className = 'preview-block';
+            el.innerHTML = this.cache.get(sources[i]);
+            fragment.appendChild(el);
+            added.push({ source: sources[i], el });
+        }
+        this.container.insertBefore(fragment, next);
+
+        this.blocks = old.slice(0, start).concat(added, old.slice(oldEnd));
+        this.container.scrollTop = scrollTop;
+    }
+}
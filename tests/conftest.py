@@ -0,0 +1,210 @@
+"""
+Shared fixtures: an in-memory stand-in for the Drive v3 API and an app
+wired to it, so tests exercise DriveManager and the routes without Google.
+"""
+
+import os
+import re
+import sys
+import hashlib
+import itertools
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+
+_store_numbers = itertools.count(1)
+
+
+class FakeRequest:
+    """What files().<method>() returns: the call runs on execute()"""
+
+    def __init__(self, func):
+        self.func = func
+
+    def execute(self, *args, **kwargs):
+        return self.func()
+
+
+class FakeFiles:
+    """The subset of files() that DriveManager uses, with its query syntax"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def _matches(self, f, q):
+        if f.get('trashed') and 'trashed=false' in q:
+            return False
+        for m in re.finditer(r"name='((?:[^'\\]|\\.)*)'", q):
+            if f['name'] != m.group(1).replace("\\'", "'").replace('\\\\', '\\'):
+                return False
+        for m in re.finditer(r"name contains '([^']*)'", q):
+            if m.group(1) not in f['name']:
+                return False
+        for m in re.finditer(r"'([^']*)' in parents", q):
+            if m.group(1) not in f.get('parents', []):
+                return False
+        if f"mimeType='{FOLDER_MIME}'" in q and f['mimeType'] != FOLDER_MIME:
+            return False
+        m = re.search(r"modifiedTime > '([^']*)'", q)
+        if m and parse_time(f['modifiedTime']) <= parse_time(m.group(1)):
+            return False
+        return True
+
+    def list(self, q='', orderBy=None, pageSize=100, pageToken=None, **kwargs):
+        def run():
+            files = [dict(f) for f in self.store.files.values() if self._matches(f, q)]
+            if orderBy and orderBy.startswith('name'):
+                files.sort(key=lambda f: f['name'])
+            start = int(pageToken or 0)
+            result = {'files': files[start:start + pageSize]}
+            if start + pageSize < len(files):
+                result['nextPageToken'] = str(start + pageSize)
+            return result
+        return FakeRequest(run)
+
+    def get(self, fileId, **kwargs):
+        return FakeRequest(lambda: dict(self.store.files[fileId]))
+
+    def get_media(self, fileId, **kwargs):
+        return fileId
+
+    def create(self, body=None, media_body=None, **kwargs):
+        def run():
+            data = media_body.getbytes(0, media_body.size()) if media_body else b''
+            parent = (body.get('parents') or [None])[0]
+            return dict(self.store.add(body['name'], parent, data, body.get('mimeType', 'text/markdown')))
+        return FakeRequest(run)
+
+    def update(self, fileId, body=None, media_body=None, **kwargs):
+        def run():
+            f = self.store.files[fileId]
+            if body:
+                f.update(body)
+            if media_body:
+                self.store.set_content(f, media_body.getbytes(0, media_body.size()))
+            else:
+                self.store.touch(f)
+            return dict(f)
+        return FakeRequest(run)
+
+    def delete(self, fileId, **kwargs):
+        return FakeRequest(lambda: self.store.files.pop(fileId))
+
+
+class FakeService:
+    def __init__(self, store):
+        self.store = store
+        self._files = FakeFiles(store)
+
+    def files(self):
+        return self._files
+
+
+class FakeDriveStore:
+    """Files of one fake Drive. IDs are unique across stores, as the app's
+    module-level caches are keyed by them."""
+
+    def __init__(self):
+        self.prefix = f"s{next(_store_numbers)}-"
+        self.files = {}
+        self.content = {}
+        self.ids = itertools.count(1)
+        self.clock = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def touch(self, f):
+        """Record a change: Drive bumps the version and modifiedTime"""
+        self.clock += timedelta(seconds=1)
+        f['modifiedTime'] = self.clock.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        f['version'] = str(int(f.get('version', '0')) + 1)
+
+    def set_content(self, f, data):
+        self.content[f['id']] = data
+        f['md5Checksum'] = hashlib.md5(data).hexdigest()
+        f['size'] = str(len(data))
+        self.touch(f)
+
+    def add(self, name, parent, data=b'', mime='text/markdown'):
+        f = {'id': f"{self.prefix}{next(self.ids)}", 'name': name, 'mimeType': mime,
+             'parents': [parent] if parent else []}
+        if mime == FOLDER_MIME:
+            self.touch(f)
+        else:
+            self.set_content(f, data)
+        self.files[f['id']] = f
+        return f
+
+    def find(self, name, parent=None):
+        for f in self.files.values():
+            if f['name'] == name and (parent is None or parent in f.get('parents', [])):
+                return f
+        return None
+
+    def text(self, name, parent=None):
+        return self.content[self.find(name, parent)['id']].decode('utf-8')
+
+
+def parse_time(value):
+    value = value.replace('Z', '+00:00')
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class FakeUser:
+    """Stands in for UserCredentials: hands out DriveManagers on the fake Drive"""
+
+    def __init__(self, store):
+        self.store = store
+        self.credentials = None
+
+    def drive_manager(self, root_folder_id=None):
+        dm = app_module.DriveManager(None, service=FakeService(self.store))
+        dm.root_folder_id = root_folder_id
+        return dm
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(monkeypatch, tmp_path):
+    """Fresh module-level caches and private directories for every test"""
+    monkeypatch.setattr(app_module, 'MANIFEST_LOCK_DIR', str(tmp_path / 'locks'))
+    monkeypatch.setattr(app_module, 'EXPORT_CACHE_DIR', str(tmp_path / 'exports'))
+    monkeypatch.setattr(app_module, 'drive_reads', app_module.SingleFlight())
+    monkeypatch.setattr(app_module, 'export_scheduler', app_module.ExportScheduler(app_module.EXPORT_MEMORY_BUDGET))
+    monkeypatch.setattr(app_module.DriveManager, '_download_file',
+                        lambda self, file_id: self.service.store.content[file_id].decode('utf-8'))
+    app_module._manifest_cache.clear()
+    yield
+    app_module._manifest_cache.clear()
+
+
+@pytest.fixture
+def store():
+    return FakeDriveStore()
+
+
+@pytest.fixture
+def dm(store):
+    """A signed-in user's DriveManager with a book 'Notes'"""
+    manager = FakeUser(store).drive_manager()
+    manager.initialize_user_folder()
+    manager.create_book('Notes')
+    return manager
+
+
+@pytest.fixture
+def client(monkeypatch, store, dm):
+    """Test client signed in as the owner of `dm`"""
+    user = FakeUser(store)
+    monkeypatch.setattr(app_module, 'get_drive_manager', lambda: dm)
+    monkeypatch.setattr(app_module, 'get_user_credentials', lambda: user)
+    app_module.app.config['TESTING'] = True
+    test_client = app_module.app.test_client()
+    with test_client.session_transaction() as session:
+        session['credentials'] = {'token': 'test'}
+        session['user_email'] = 'writer@example.com'
+    return test_client
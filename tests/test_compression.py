@@ -0,0 +1,58 @@
+"""Response compression and compressed request bodies"""
+
+import gzip
+import json
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def long_page(dm):
+    dm.write_page('Notes', '01.md', 'Some text. ' * 500)
+    return '/api/pages/01.md?book=Notes'
+
+
+def test_head_reports_what_get_sends(client, long_page):
+    headers = {'Accept-Encoding': 'gzip'}
+    get = client.get(long_page, headers=headers)
+    head = client.head(long_page, headers=headers)
+
+    assert get.headers['Content-Encoding'] == 'gzip'
+    assert head.status_code == 200
+    assert head.data == b''
+    for header in ('Content-Encoding', 'Content-Length', 'Vary'):
+        assert head.headers[header] == get.headers[header]
+    assert int(head.headers['Content-Length']) == len(get.data)
+
+
+def test_compressed_request_body_is_inflated(client, dm):
+    body = gzip.compress(json.dumps({'book': 'Notes', 'content': 'Sent gzipped'}).encode('utf-8'))
+    response = client.post('/api/pages/01.md', data=body, content_type='application/json',
+                           headers={'Content-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert dm.read_page('Notes', '01.md') == 'Sent gzipped'
+
+
+def test_oversized_compressed_body_is_refused_unread(monkeypatch, client):
+    monkeypatch.setitem(app.app.config, 'MAX_CONTENT_LENGTH', 1024)
+    body = gzip.compress(b'x' * 4096, compresslevel=0)
+    assert len(body) > 1024
+
+    response = client.post('/api/pages/01.md', data=body, content_type='application/json',
+                           headers={'Content-Encoding': 'gzip'})
+    assert response.status_code == 413
+
+
+def test_body_inflating_past_the_limit_is_refused(monkeypatch, client, dm):
+    monkeypatch.setitem(app.app.config, 'MAX_CONTENT_LENGTH', 64 * 1024)
+    content = ' ' * (1024 * 1024)
+    body = gzip.compress(json.dumps({'book': 'Notes', 'content': content}).encode('utf-8'))
+    assert len(body) < 64 * 1024
+
+    response = client.post('/api/pages/01.md', data=body, content_type='application/json',
+                           headers={'Content-Encoding': 'gzip'})
+    assert response.status_code == 413
+    assert dm.read_page('Notes', '01.md') is None
@@ -0,0 +1,63 @@
+"""Chapter rendering on the spawned export pool"""
+
+import pytest
+
+import app
+
+CHAPTERS = [(f'{i:02d}.md', f'# Chapter {i}\n\nSome *text* with a [link](https://example.com).\n\n- one\n- two')
+            for i in range(4)]
+
+
+@pytest.fixture
+def export_pool(monkeypatch):
+    monkeypatch.setattr(app, 'EXPORT_POOL_SIZE', 2)
+    monkeypatch.setattr(app, 'EXPORT_POOL_MIN_CHAPTERS', 2)
+    monkeypatch.setattr(app, '_export_pool', None)
+    monkeypatch.setattr(app, '_export_pool_reserved', False)
+    pool = app.start_export_pool()
+    yield pool
+    pool.shutdown()
+
+
+def test_small_books_and_single_worker_render_in_process(monkeypatch):
+    assert not app.uses_export_pool(100)
+    monkeypatch.setattr(app, 'EXPORT_POOL_SIZE', 2)
+    assert not app.uses_export_pool(app.EXPORT_POOL_MIN_CHAPTERS - 1)
+    assert app.uses_export_pool(app.EXPORT_POOL_MIN_CHAPTERS)
+
+
+def test_pool_is_spawned_once_and_reserved_from_the_budget(export_pool):
+    budget = app.export_scheduler.budget
+    assert export_pool._mp_context.get_start_method() == 'spawn'
+    assert app.start_export_pool() is export_pool
+    assert app.get_export_pool() is export_pool
+    # Reserved once, when the pool started
+    assert budget == app.EXPORT_MEMORY_BUDGET - 2 * app.EXPORT_POOL_PROCESS_MEMORY
+
+
+def test_epub_chapters_round_trip_through_the_pool(export_pool, caplog):
+    expected = [app.render_epub_chapter(page_file, content) for page_file, content in CHAPTERS]
+    assert app.render_chapters(app.render_epub_chapter, CHAPTERS) == expected
+    # Rendered by the pool, not by the in-process fallback
+    assert 'Export pool broken' not in caplog.text
+
+
+def test_pdf_chapters_round_trip_through_the_pool(export_pool, caplog):
+    renderer = app.get_pdf_renderer()
+    expected = [renderer.render_chapter(page_file, content) for page_file, content in CHAPTERS]
+    rendered = app.render_chapters(renderer.render_chapter, CHAPTERS)
+
+    assert [[type(flowable).__name__ for flowable in story] for story in rendered] == \
+        [[type(flowable).__name__ for flowable in story] for story in expected]
+    assert rendered[1][0].getPlainText() == '01'
+    assert 'Export pool broken' not in caplog.text
+    assert renderer.render('Notes', CHAPTERS)[:4] == b'%PDF'
+
+
+def test_estimate_counts_the_export_pool(monkeypatch):
+    manifest = {'pages': {f'{i:02d}.md': {'size': 1000} for i in range(10)}, 'order': []}
+    in_process = app.estimate_export_memory('pdf', manifest)
+
+    monkeypatch.setattr(app, 'EXPORT_POOL_SIZE', 2)
+    monkeypatch.setattr(app, 'EXPORT_POOL_MIN_CHAPTERS', 8)
+    assert app.estimate_export_memory('pdf', manifest) == in_process + 10000 * app.EXPORT_POOL_COPY_FACTOR
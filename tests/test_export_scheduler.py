@@ -0,0 +1,93 @@
+"""Export admission: memory accounting, queueing and weighted fairness"""
+
+import threading
+import time
+
+import pytest
+
+import app
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+class Queued:
+    """An export waiting for admission on a thread; records when it starts"""
+
+    def __init__(self, scheduler, user, estimate, started, timeout=5):
+        self.ticket = None
+        waiting = scheduler.snapshot()['waiting']
+        self.thread = threading.Thread(target=self._run, args=(scheduler, user, estimate, started, timeout))
+        self.thread.start()
+        wait_until(lambda: scheduler.snapshot()['waiting'] > waiting)
+
+    def _run(self, scheduler, user, estimate, started, timeout):
+        self.ticket = scheduler.admit(user, estimate, timeout=timeout)
+        if self.ticket:
+            started.append(self.ticket['user'])
+            scheduler.release(self.ticket)
+
+
+def test_admits_within_budget_and_queues_the_rest():
+    scheduler = app.ExportScheduler(100)
+    first = scheduler.admit('a', 60)
+    second = scheduler.admit('b', 40)
+    assert first and second
+    assert scheduler.snapshot()['running'] == 2
+
+    started = []
+    queued = Queued(scheduler, 'c', 30, started)
+    assert started == []
+
+    scheduler.release(first)
+    queued.thread.join()
+    assert started == ['c']
+    scheduler.release(second)
+    assert scheduler.snapshot()['running'] == 0
+    assert scheduler.snapshot()['in_use_mb'] == 0
+
+
+def test_job_bigger_than_budget_runs_alone():
+    scheduler = app.ExportScheduler(100)
+    job = scheduler.admit('a', 500)
+    assert job is not None
+    assert scheduler.admit('b', 1, timeout=0.05) is None
+    assert scheduler.snapshot()['timed_out'] == 1
+    scheduler.release(job)
+
+
+@pytest.mark.parametrize('weights, expected', [
+    ({}, ['a', 'b', 'c', 'a', 'b', 'c']),
+    ({'a': 2}, ['a', 'a', 'b', 'c', 'b', 'c']),
+])
+def test_waiting_users_take_turns_by_weight(weights, expected):
+    scheduler = app.ExportScheduler(100, weights)
+    blocker = scheduler.admit('blocker', 100)
+    started = []
+    jobs = [Queued(scheduler, user, 100, started) for user in ('a', 'a', 'b', 'b', 'c', 'c')]
+
+    scheduler.release(blocker)
+    for job in jobs:
+        job.thread.join()
+    assert started == expected
+
+
+def test_refuses_when_user_queue_is_full():
+    scheduler = app.ExportScheduler(100)
+    blocker = scheduler.admit('blocker', 100)
+    started = []
+    jobs = [Queued(scheduler, 'a', 10, started) for _ in range(app.EXPORT_QUEUE_PER_USER)]
+
+    assert scheduler.admit('a', 10) is None
+    assert scheduler.snapshot()['refused'] == 1
+    assert scheduler.retry_after() >= 1
+
+    scheduler.release(blocker)
+    for job in jobs:
+        job.thread.join()
+    assert started == ['a'] * app.EXPORT_QUEUE_PER_USER
+
@@ -0,0 +1,90 @@
+"""Book downloads: export cache keys, conditional, Range and HEAD requests"""
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def book(dm):
+    dm.save_book_settings('Notes', {'title': 'Notes', 'pdf_theme': 'classic'})
+    for i in range(3):
+        dm.write_page('Notes', f'0{i}.md', f'# Chapter {i}\n\n' + 'Some text. ' * 40)
+    return dm
+
+
+@pytest.fixture
+def generated(monkeypatch):
+    """Counts EPUB renders"""
+    calls = []
+    generate_epub = app.generate_epub
+
+    def counting(*args, **kwargs):
+        calls.append(args[1])
+        return generate_epub(*args, **kwargs)
+
+    monkeypatch.setattr(app, 'generate_epub', counting)
+    return calls
+
+
+def test_fingerprint_follows_content_order_and_format_settings(book):
+    book_id = book._get_book_id('Notes')
+    manifest = book.get_manifest('Notes')
+    settings = book.get_book_settings('Notes')
+
+    def fingerprint(format_type, manifest=manifest, settings=settings, book_id=book_id):
+        return app.export_fingerprint(format_type, book_id, 'Notes', manifest, settings)
+
+    epub = fingerprint('epub')
+
+    assert fingerprint('pdf') != epub
+    # PDF layout settings don't change the EPUB
+    assert fingerprint('epub', settings=dict(settings, pdf_theme='modern')) == epub
+    assert fingerprint('epub', settings=dict(settings, title='Other')) != epub
+    assert fingerprint('epub', manifest=dict(manifest, order=list(reversed(manifest['order'])))) != epub
+    # Another user's book of the same name and content
+    assert fingerprint('epub', book_id='someone-elses-folder') != epub
+
+    book.write_page('Notes', '01.md', 'changed')
+    assert fingerprint('epub', manifest=book.get_manifest('Notes')) != epub
+
+
+def test_repeat_download_is_served_from_cache(client, book, generated):
+    first = client.get('/api/books/Notes/download?format=epub')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    again = client.get('/api/books/Notes/download?format=epub')
+    assert again.data == first.data
+    assert client.get('/api/books/Notes/download?format=epub',
+                      headers={'If-None-Match': etag}).status_code == 304
+    assert len(generated) == 1
+
+    book.write_page('Notes', '02.md', 'edited')
+    changed = client.get('/api/books/Notes/download?format=epub', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert len(generated) == 2
+
+
+def test_range_request_resumes_a_download(client, book):
+    full = client.get('/api/books/Notes/download?format=epub').data
+
+    partial = client.get('/api/books/Notes/download?format=epub', headers={'Range': 'bytes=100-199'})
+    assert partial.status_code == 206
+    assert partial.headers['Content-Range'] == f'bytes 100-199/{len(full)}'
+    assert partial.data == full[100:200]
+
+
+def test_head_answers_from_cache_only(client, book, generated):
+    uncached = client.head('/api/books/Notes/download?format=epub')
+    assert uncached.status_code == 404
+    assert uncached.data == b''
+    assert generated == []
+    assert app.export_scheduler.snapshot()['admitted'] == 0
+
+    size = len(client.get('/api/books/Notes/download?format=epub').data)
+    cached = client.head('/api/books/Notes/download?format=epub')
+    assert cached.status_code == 200
+    assert int(cached.headers['Content-Length']) == size
+    assert len(generated) == 1
@@ -0,0 +1,161 @@
+"""Book manifest (.book_index.json): reconciling with Drive and concurrent updates"""
+
+import copy
+import json
+import threading
+import time
+
+import pytest
+
+import app
+
+
+def saved_manifest(store, dm):
+    return json.loads(store.text(app.MANIFEST_FILE, dm._get_book_id('Notes')))
+
+
+def test_write_reapplies_change_on_newer_drive_copy(store, dm):
+    dm.write_page('Notes', '01.md', 'one')
+    book_id = dm._get_book_id('Notes')
+    outdated = copy.deepcopy(app._manifest_cache[book_id])
+
+    # Another worker adds a page, then this worker writes from its outdated copy
+    app._manifest_cache.clear()
+    dm.write_page('Notes', '02.md', 'two')
+    outdated['checked_at'] = time.time()
+    app._manifest_cache[book_id] = outdated
+
+    dm.write_page('Notes', '03.md', 'three')
+    events = [event['type'] for _, event in app.change_feed.since(book_id, 0) or []]
+
+    assert saved_manifest(store, dm)['order'] == ['01.md', '02.md', '03.md']
+    assert 'deleted' not in events
+
+
+def test_reconcile_picks_up_pages_changed_in_drive(monkeypatch, store, dm):
+    dm.write_page('Notes', '01.md', 'one')
+    dm.write_page('Notes', '02.md', 'two')
+    dm.set_page_order('Notes', ['02.md', '01.md'])
+    book_id = dm._get_book_id('Notes')
+
+    store.set_content(store.find('01.md', book_id), b'edited in Drive')
+    store.add('00.md', book_id, b'added in Drive')
+    monkeypatch.setattr(app, 'MANIFEST_VERIFY_INTERVAL', 0)
+
+    manifest = dm.get_manifest('Notes')
+    assert sorted(manifest['pages']) == ['00.md', '01.md', '02.md']
+    assert manifest['pages']['01.md']['md5'] == store.find('01.md', book_id)['md5Checksum']
+    # The stored order is kept, with the new page slotted in
+    assert manifest['order'][manifest['order'].index('02.md') + 1] == '01.md'
+    assert saved_manifest(store, dm)['order'] == manifest['order']
+
+
+def test_stale_manifest_is_rebuilt_keeping_order(store, dm):
+    for name in ('01.md', '02.md', '03.md'):
+        dm.write_page('Notes', name, name)
+    dm.set_page_order('Notes', ['03.md', '01.md', '02.md'])
+    book_id = dm._get_book_id('Notes')
+
+    # What migrate_local_to_drive does after uploading behind the app's back
+    store.add('04.md', book_id, b'migrated')
+    manifest_file = store.find(app.MANIFEST_FILE, book_id)
+    stale = json.loads(store.content[manifest_file['id']])
+    stale['stale'] = True
+    store.set_content(manifest_file, json.dumps(stale).encode('utf-8'))
+    app._manifest_cache.clear()
+
+    manifest = dm.get_manifest('Notes')
+    assert manifest['order'][:3] == ['03.md', '01.md', '02.md']
+    assert '04.md' in manifest['pages']
+    assert 'stale' not in saved_manifest(store, dm)
+
+
+def test_readers_get_their_own_copy(dm):
+    dm.write_page('Notes', '01.md', 'one')
+    manifest = dm.get_manifest('Notes')
+    manifest['order'].append('bogus.md')
+    manifest['pages'].clear()
+
+    assert dm.get_manifest('Notes')['order'] == ['01.md']
+
+
+def test_concurrent_writers_and_readers(store, dm):
+    errors = []
+
+    def writer(number):
+        try:
+            for i in range(10):
+                dm.write_page('Notes', f'{number}-{i:02d}.md', f'page {number} {i}')
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(100):
+                manifest = dm.get_manifest('Notes')
+                assert set(manifest['order']) == set(manifest['pages'])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    threads += [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(dm.list_pages('Notes')) == 40
+    assert len(saved_manifest(store, dm)['pages']) == 40
+
+
+def test_move_page_returns_the_order_it_saved(store, dm):
+    for name in ('01.md', '02.md', '03.md'):
+        dm.write_page('Notes', name, name)
+
+    assert dm.move_page('Notes', '03.md', '') == ['03.md', '01.md', '02.md']
+    assert saved_manifest(store, dm)['order'] == ['03.md', '01.md', '02.md']
+
+
+def test_failed_manifest_save_is_reported(monkeypatch, store, dm):
+    for name in ('01.md', '02.md'):
+        dm.write_page('Notes', name, name)
+    manifest_id = store.find(app.MANIFEST_FILE)['id']
+    files = dm.service.files()
+    real_update = files.update
+
+    def failing_update(fileId, **kwargs):
+        if fileId == manifest_id:
+            raise OSError('Drive unavailable')
+        return real_update(fileId, **kwargs)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(files, 'update', failing_update)
+        with pytest.raises(OSError):
+            dm.move_page('Notes', '02.md', '')
+
+    # Nothing was saved; the manifest is rebuilt from Drive with the old order
+    assert dm.get_manifest('Notes')['order'] == ['01.md', '02.md']
+
+
+def test_reads_and_renames_leave_the_shared_manifest_alone(monkeypatch, store, dm):
+    dm.write_page('Notes', '01.md', 'one')
+    book_id = dm._get_book_id('Notes')
+    store.add('02.md', book_id, b'two words [[01]]')
+    monkeypatch.setattr(app, 'MANIFEST_VERIFY_INTERVAL', 0)
+    dm.get_manifest('Notes')
+    monkeypatch.setattr(app, 'MANIFEST_VERIFY_INTERVAL', 300)
+
+    shared = app._manifest_cache[book_id]['data']
+    before = copy.deepcopy(shared)
+    assert shared['pages']['02.md']['words'] is None
+
+    assert dm.read_page('Notes', '02.md') == 'two words [[01]]'
+    assert dm.rename_page('Notes', '01.md', 'first.md')
+
+    # Readers holding the earlier manifest never see it change under them
+    assert shared == before
+    saved = saved_manifest(store, dm)
+    assert saved['pages']['02.md']['words'] == 3
+    assert saved['pages']['02.md']['links'] is not None
+    assert saved['order'] == ['first.md', '02.md']
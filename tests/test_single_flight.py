@@ -0,0 +1,99 @@
+"""SingleFlight: concurrent identical Drive reads share one call"""
+
+import threading
+
+import pytest
+
+import app
+
+
+def run_concurrently(flight, key, func, callers):
+    """Start `callers` threads on flight.do(key, func); returns (results, errors, threads)"""
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, func))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return results, errors, threads
+
+
+def blocking_call(result=None, error=None):
+    """A Drive call that waits for `release` to be set; counts its calls"""
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        release.wait(5)
+        if error:
+            raise error
+        return result
+
+    return func, release, calls
+
+
+def wait_for_followers(flight, kind, count):
+    while flight.snapshot()['by_kind'].get(kind, {}).get('collapsed', 0) < count:
+        threading.Event().wait(0.005)
+
+
+def test_concurrent_callers_share_one_call():
+    flight = app.SingleFlight()
+    func, release, calls = blocking_call(result={'files': []})
+    results, errors, threads = run_concurrently(flight, ('folder', 'list'), func, 5)
+    wait_for_followers(flight, 'list', 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert errors == []
+    assert len(results) == 5 and all(result is results[0] for result in results)
+    assert flight.snapshot()['calls'] == 1
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    flight = app.SingleFlight()
+    func, release, calls = blocking_call(error=RuntimeError('drive down'))
+    results, errors, threads = run_concurrently(flight, ('folder', 'list'), func, 4)
+    wait_for_followers(flight, 'list', 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == []
+    assert len(errors) == 4 and all(str(e) == 'drive down' for e in errors)
+
+    # The failed flight is gone: the next caller makes a fresh call
+    assert flight.do(('folder', 'list'), lambda: 'recovered') == 'recovered'
+    assert len(calls) == 1
+
+
+def test_forget_starts_a_fresh_call_after_a_write():
+    flight = app.SingleFlight()
+    func, release, calls = blocking_call(result='before write')
+    _, _, threads = run_concurrently(flight, ('book', 'manifest'), func, 1)
+    while not calls:
+        threading.Event().wait(0.005)
+
+    flight.forget('book')
+    assert flight.do(('book', 'manifest'), lambda: 'after write') == 'after write'
+    assert flight.snapshot()['invalidated'] == 1
+
+    release.set()
+    for thread in threads:
+        thread.join()
+
+
+def test_keys_in_other_scopes_are_not_shared():
+    flight = app.SingleFlight()
+    assert flight.do(('a', 'list'), lambda: 1) == 1
+    assert flight.do(('b', 'list'), lambda: 2) == 2
+    with pytest.raises(KeyError):
+        flight.do(('a', 'get'), lambda: {}['missing'])
@@ -0,0 +1,37 @@
+"""Markdown ZIP export of a book, in full or changes since a time"""
+
+import io
+import json
+import zipfile
+
+import app
+
+
+def write_book(dm):
+    dm.save_book_settings('Notes', {'title': 'Notes'})
+    for i in range(3):
+        dm.write_page('Notes', f'0{i}.md', f'# Chapter {i}')
+
+
+def zip_names(response):
+    return sorted(zipfile.ZipFile(io.BytesIO(response.data)).namelist())
+
+
+def test_zip_export_since_lists_only_changed_files(client, dm, store):
+    write_book(dm)
+    full = client.get('/api/books/Notes/export')
+    assert zip_names(full) == ['Notes/.book_index.json', 'Notes/.book_settings.json',
+                               'Notes/00.md', 'Notes/01.md', 'Notes/02.md', 'export.json']
+
+    since = store.find('02.md')['modifiedTime']
+    dm.write_page('Notes', '01.md', 'changed')
+
+    changes = client.get(f'/api/books/Notes/export?since={since}')
+    assert zip_names(changes) == ['Notes/.book_index.json', 'Notes/01.md', 'export.json']
+    summary = json.loads(zipfile.ZipFile(io.BytesIO(changes.data)).read('export.json'))
+    assert summary['since'] == app.parse_since(since)
+    assert summary['failed'] == []
+
+
+def test_zip_export_rejects_malformed_since(client, dm):
+    assert client.get('/api/books/Notes/export?since=yesterday').status_code == 400
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent Drive throughput: sync workers vs threaded workers
+
+Simulated users make page requests (a few Drive API calls each) against a
+local stand-in for the Drive API that answers after a fixed latency, so
+the numbers reflect waiting on Google rather than this machine. Two
+setups are compared with the same number of worker processes, i.e. about
+the same memory:
+
+- Sync: one thread per worker, each user's client on a single
+  AuthorizedHttp (all a non-thread-safe client allows)
+- Threaded: --threads per worker, each user's client shared by all of
+  them through an AuthorizedHttpPool (UserCredentials in app.py)
+
+Usage:
+    python tools/bench_drive_threads.py [--workers 2] [--threads 16] [--users 40]
+                                        [--requests 10] [--calls 2] [--latency 0.05]
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import logging
+import resource
+import statistics
+import threading
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    """Answers every files.list with one file after the configured latency"""
+
+    protocol_version = 'HTTP/1.1'  # keep connections open, like Google's front ends
+    latency = 0.05
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = json.dumps({'files': [{'id': 'bench', 'name': 'page.md'}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_drive(latency):
+    """Serve the stand-in Drive API on a free local port; returns its base URL"""
+    FakeDriveHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeDriveHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/drive/v3/"
+
+
+def make_service(endpoint, threaded):
+    """One user's Drive client, as the app builds it (threaded) or as a single transport"""
+    from google.oauth2.credentials import Credentials
+
+    credentials = Credentials(token='bench')
+    if threaded:
+        http = app.AuthorizedHttpPool(credentials)
+    else:
+        import httplib2
+        import google_auth_httplib2
+
+        http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=app.HTTP_TIMEOUT))
+    return app.build_service('drive', 'v3', http=http, client_options={'api_endpoint': endpoint})
+
+
+def run_worker(endpoint, jobs, threads, calls, results):
+    """One worker process: serve `jobs` (user numbers) with `threads` threads"""
+    logging.disable(logging.INFO)
+    services = {}
+    services_lock = threading.Lock()
+    pending = queue.Queue()
+    for user in jobs:
+        pending.put(user)
+    latencies = []
+
+    def serve():
+        while True:
+            try:
+                user = pending.get_nowait()
+            except queue.Empty:
+                return
+            with services_lock:
+                if user not in services:
+                    services[user] = make_service(endpoint, threaded=threads > 1)
+                service = services[user]
+
+            started = time.perf_counter()
+            for _ in range(calls):
+                service.files().list(q="trashed=false", fields='files(id, name)').execute()
+            latencies.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=serve) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # Linux reports ru_maxrss in KB
+    results.put({'latencies': latencies, 'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+
+
+def run(label, endpoint, args, threads):
+    """Spread every user's requests over the workers and time them all"""
+    jobs = [user for _ in range(args.requests) for user in range(args.users)]
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [
+        context.Process(target=run_worker, args=(endpoint, jobs[number::args.workers], threads, args.calls, results))
+        for number in range(args.workers)
+    ]
+
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for report in reports for latency in report['latencies'])
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    memory = sum(report['max_rss_mb'] for report in reports)
+    print(f"   {label:<10}{args.workers:>8}{threads:>9}{len(latencies) / elapsed:>12.1f}"
+          f"{statistics.median(latencies) * 1000:>10.0f}{p95 * 1000:>10.0f}{memory:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2, help='worker processes in both setups')
+    parser.add_argument('--threads', type=int, default=16, help='threads per worker in the threaded setup')
+    parser.add_argument('--users', type=int, default=40, help='simulated signed-in users')
+    parser.add_argument('--requests', type=int, default=10, help='page requests per user')
+    parser.add_argument('--calls', type=int, default=2, help='Drive API calls per page request')
+    parser.add_argument('--latency', type=float, default=0.05, help='Drive API response time in seconds')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    endpoint = start_fake_drive(args.latency)
+
+    print("=" * 72)
+    print(f"  {args.users} users x {args.requests} requests, {args.calls} Drive calls of "
+          f"{args.latency * 1000:.0f} ms each")
+    print("=" * 72)
+    print(f"   {'':<10}{'workers':>8}{'threads':>9}{'req/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'RSS MB':>12}")
+    run("Sync", endpoint, args, 1)
+    run("Threaded", endpoint, args, args.threads)
+    print()
+    print("   RSS is the sum of each worker's peak; the app's own memory dominates both.")
+    print()
+
+
+if __name__ == '__main__':
+    main()
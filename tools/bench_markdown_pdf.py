@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark markdown-to-PDF chapter conversion on large chapters
+
+Compares:
+- Two-pass: markdown2 renders HTML, a flat HTMLParser reads it back and
+  (tag, text) pairs become flowables (the original generate_pdf pipeline)
+- Single-pass: MarkdownFlowableConverter turns markdown straight into flowables
+
+Reports throughput and peak Python memory (tracemalloc) for each.
+
+Usage:
+    python tools/bench_markdown_pdf.py [--words 20000] [--runs 5] [--layout]
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+import tracemalloc
+from io import BytesIO
+from html.parser import HTMLParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown2
+import app
+
+SECTION = """## Section {n}
+
+This paragraph has **bold text**, some *emphasis*, `inline code` and a
+[link to another page](./other_page.md). It runs on for a while so that
+wrapping and inline parsing both get exercised on every section.
+
+- A bullet point with **formatting**
+- Another point
+  - A nested point
+  - And another one
+1. First step
+2. Second step
+
+| Term | Meaning | Notes |
+|------|---------|-------|
+| は | topic | *contrast* |
+| が | subject | `focus` |
+
+> A quoted remark with a little **weight**.
+
+```
+def section_{n}():
+    return {n}
+```
+
+"""
+
+
+class LegacyHTMLParser(HTMLParser):
+    """The original flat parser from generate_pdf, kept here as the baseline"""
+
+    def __init__(self):
+        super().__init__()
+        self.elements = []
+        self.current_text = []
+        self.current_tag = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.current_text and self.current_tag:
+            text = ''.join(self.current_text).strip()
+            if text:
+                self.elements.append((self.current_tag, text))
+            self.current_text = []
+        self.current_tag = tag
+
+    def handle_endtag(self, tag):
+        if self.current_text and self.current_tag:
+            text = ''.join(self.current_text).strip()
+            if text:
+                self.elements.append((self.current_tag, text))
+        self.current_text = []
+        self.current_tag = None
+
+    def handle_data(self, data):
+        self.current_text.append(data)
+
+
+def two_pass(renderer, content):
+    """Original pipeline: markdown -> HTML -> (tag, text) -> flowables"""
+    from reportlab.platypus import Paragraph, Preformatted
+
+    styles = renderer.styles
+    html_content = markdown2.markdown(content, extras=app.MARKDOWN_EXTRAS)
+    parser = LegacyHTMLParser()
+    parser.feed(html_content)
+
+    story = []
+    for tag, text in parser.elements:
+        text = app.escape_para_text(text.strip())
+        if not text:
+            continue
+        if tag in ('h1', 'h2', 'h3'):
+            story.append(Paragraph(text, styles[tag]))
+        elif tag in ('pre', 'code'):
+            story.append(Preformatted(text, styles['code']))
+        elif tag == 'li':
+            story.append(Paragraph('• ' + text, styles['body']))
+        else:
+            story.append(Paragraph(text, styles['body']))
+    return story
+
+
+def single_pass(renderer, content):
+    """New pipeline: markdown -> flowables"""
+    return renderer.converter.convert(content)
+
+
+def make_chapter(words):
+    """Build a chapter of roughly `words` words"""
+    section_words = len(SECTION.split())
+    return ''.join(SECTION.format(n=n) for n in range(max(1, words // section_words)))
+
+
+def measure(label, convert, renderer, content, runs, layout):
+    """Time `runs` conversions and record peak memory of one more"""
+    from reportlab.platypus import SimpleDocTemplate
+
+    def once():
+        story = convert(renderer, content)
+        if layout:
+            SimpleDocTemplate(BytesIO()).build(story)
+        return story
+
+    once()  # Warm-up
+    start = time.perf_counter()
+    for _ in range(runs):
+        story = once()
+    elapsed = (time.perf_counter() - start) / runs
+
+    tracemalloc.start()
+    once()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    words = len(content.split())
+    print(f"   {label:<12} {elapsed * 1000:8.1f} ms/chapter   {words / elapsed:10.0f} words/s   "
+          f"peak {peak / 1024 / 1024:6.1f} MB   {len(story)} flowables")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--words', type=int, default=20000, help='approximate chapter length in words')
+    parser.add_argument('--runs', type=int, default=5, help='timed runs per pipeline')
+    parser.add_argument('--layout', action='store_true', help='include ReportLab page layout in the timing')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    renderer = app.get_pdf_renderer()
+    content = make_chapter(args.words)
+
+    print("=" * 60)
+    print(f"  Markdown -> PDF flowables: {len(content.split())} words"
+          f"{' (with layout)' if args.layout else ''}")
+    print("=" * 60)
+    measure("Two-pass", two_pass, renderer, content, args.runs, args.layout)
+    measure("Single-pass", single_pass, renderer, content, args.runs, args.layout)
+    print()
+
+
+if __name__ == '__main__':
+    main()
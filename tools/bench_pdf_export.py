@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark PDF export throughput for many small books
+
+Compares:
+- Per-export setup: a fresh PDFRenderer (styles rebuilt) for every book
+- Shared renderer: the cached per-process renderer from get_pdf_renderer()
+
+Usage:
+    python tools/bench_pdf_export.py [--books 200] [--pages 3]
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+SAMPLE_PAGE = """# Chapter heading
+
+Some **bold** text, some *italic* text and a [link](./other.md).
+
+## Section
+
+- First point
+- Second point with `inline code`
+
+```
+def example():
+    return 42
+```
+
+A closing paragraph with a little more text to wrap across a line or two
+in the generated PDF so that layout does some real work.
+"""
+
+
+def make_book(pages):
+    """Build (page_file, content) chapters for a small synthetic book"""
+    return [(f"{i:02d}_chapter.md", SAMPLE_PAGE) for i in range(pages)]
+
+
+def run(label, get_renderer, books, pages):
+    """Render `books` small books and report throughput"""
+    chapters = make_book(pages)
+    start = time.perf_counter()
+    total_bytes = 0
+    for i in range(books):
+        renderer = get_renderer()
+        total_bytes += len(renderer.render(f"Book {i}", chapters))
+    elapsed = time.perf_counter() - start
+
+    print(f"   {label:<22} {books / elapsed:8.1f} books/s   "
+          f"{elapsed * 1000 / books:7.2f} ms/book   {total_bytes / books / 1024:6.1f} KB/book")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=200, help='number of books to render')
+    parser.add_argument('--pages', type=int, default=3, help='pages per book')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    # Small books render in-process; keep the pool out of the measurement
+    app.EXPORT_POOL_SIZE = 1
+
+    print("=" * 60)
+    print(f"  PDF export throughput: {args.books} books x {args.pages} pages")
+    print("=" * 60)
+
+    # Warm imports so neither run pays for loading ReportLab
+    app.get_pdf_renderer().render("Warm-up", make_book(1))
+
+    run("Per-export setup", lambda: app.PDFRenderer(), args.books, args.pages)
+    run("Shared renderer", lambda: app.get_pdf_renderer(), args.books, args.pages)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark worker boot and first-request latency
+
+Each run starts a fresh interpreter and measures:
+- Import: `import app` (what every gunicorn worker pays without preloading)
+- First request: the landing page through the Flask test client
+- Cold paths: first Drive client build, first PDF render, first EPUB render
+
+Runs are repeated with preload_modules() called before timing, which is what
+a worker forked from a preloading gunicorn master (gunicorn.conf.py) sees.
+
+Usage:
+    python tools/bench_startup.py [--runs 5] [--importtime]
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, sys, time, logging
+sys.path.insert(0, sys.argv[1])
+preload = sys.argv[2] == '1'
+timings = {}
+
+started = time.perf_counter()
+import app
+timings['import'] = time.perf_counter() - started
+logging.disable(logging.INFO)
+
+if preload:
+    started = time.perf_counter()
+    app.preload_modules()
+    timings['preload'] = time.perf_counter() - started
+
+started = time.perf_counter()
+app.app.test_client().get('/')
+timings['first_request'] = time.perf_counter() - started
+
+import httplib2
+started = time.perf_counter()
+app.build_service('drive', 'v3', http=httplib2.Http())
+timings['drive_client'] = time.perf_counter() - started
+
+chapters = [('01_intro.md', '# Intro\n\nSome **bold** text and a list:\n\n- one\n- two\n')]
+started = time.perf_counter()
+app.get_pdf_renderer().render('Bench', chapters)
+timings['first_pdf'] = time.perf_counter() - started
+
+started = time.perf_counter()
+app.assemble_epub('bench', 'Bench', [(name, app.render_epub_chapter(name, content)) for name, content in chapters])
+timings['first_epub'] = time.perf_counter() - started
+
+print(json.dumps(timings))
+"""
+
+COLUMNS = ['import', 'preload', 'first_request', 'drive_client', 'first_pdf', 'first_epub']
+HEADINGS = ['import', 'preload', '1st req', 'drive', '1st pdf', '1st epub']
+
+
+def probe(preload):
+    """Time one fresh interpreter"""
+    env = dict(os.environ, EXPORT_POOL_SIZE='1')
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, ROOT, '1' if preload else '0'],
+        capture_output=True, text=True, env=env, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def report(label, runs):
+    """Print median milliseconds per phase"""
+    cells = []
+    for column in COLUMNS:
+        values = [run[column] for run in runs if column in run]
+        cells.append(f"{statistics.median(values) * 1000:10.1f}" if values else f"{'-':>10}")
+    print(f"   {label:<12}" + ''.join(cells))
+
+
+def import_profile(top):
+    """Show the slowest modules imported directly by app.py"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        capture_output=True, text=True, cwd=ROOT
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nesting is shown by indentation; keep what app.py imports directly
+        if len(name) - len(name.lstrip()) == 3:
+            rows.append((int(cumulative), name.strip()))
+    print("   Modules imported by app.py, by cumulative time:")
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"   {cumulative / 1000:8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per mode')
+    parser.add_argument('--importtime', action='store_true', help='also list the slowest imports of app.py')
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print(f"  Worker startup (median of {args.runs} runs, ms)")
+    print("=" * 72)
+    print(f"   {'':<12}" + ''.join(f"{heading:>10}" for heading in HEADINGS))
+    report("Lazy", [probe(False) for _ in range(args.runs)])
+    report("Preloaded", [probe(True) for _ in range(args.runs)])
+    print()
+    print("   With gunicorn.conf.py the preload column is paid once in the master;")
+    print("   workers fork after it and see the 'Preloaded' first-request numbers.")
+    print()
+
+    if args.importtime:
+        import_profile(15)
+        print()
+
+
+if __name__ == '__main__':
+    main()
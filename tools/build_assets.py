@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Build fingerprinted, precompressed static bundles
+
+Concatenates each bundle in app.ASSET_BUNDLES into static/dist/ under a
+name carrying a hash of its content (e.g. editor.3f2a9c1b04de.js), writes
+gzip and (if the brotli package is installed) brotli copies next to it,
+and records the names in static/dist/manifest.json for the templates.
+Files from earlier builds are removed.
+
+Run it after changing anything under static/css or static/js; Render runs
+it as part of the build.
+
+Usage:
+    python tools/build_assets.py
+"""
+
+import os
+import sys
+import gzip
+import json
+import hashlib
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def build_bundle(name, sources):
+    """Write one bundle and its compressed copies; returns (filename, sizes)"""
+    parts = []
+    for source in sources:
+        with open(os.path.join(app.app.static_folder, source), 'rb') as f:
+            parts.append(f.read().rstrip() + b'\n')
+    data = b'\n'.join(parts)
+
+    stem, extension = os.path.splitext(name)
+    filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+    outputs = {filename: data, filename + '.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli:
+        outputs[filename + '.br'] = brotli.compress(data, quality=11)
+
+    for output, content in outputs.items():
+        with open(os.path.join(app.ASSET_DIST_DIR, output), 'wb') as f:
+            f.write(content)
+    return filename, {output.rsplit('.', 1)[-1] if output != filename else 'raw': len(content)
+                      for output, content in outputs.items()}
+
+
+def main():
+    logging.disable(logging.INFO)
+    os.makedirs(app.ASSET_DIST_DIR, exist_ok=True)
+
+    print("=" * 60)
+    print("  Building static bundles")
+    print("=" * 60)
+    if not brotli:
+        print("   brotli not installed; writing gzip copies only")
+
+    manifest = {}
+    for name, sources in app.ASSET_BUNDLES.items():
+        filename, sizes = build_bundle(name, sources)
+        manifest[name] = filename
+        compressed = '   '.join(f"{encoding} {size / 1024:6.1f} KB" for encoding, size in sizes.items())
+        print(f"   {filename:<32} {compressed}")
+
+    # Drop bundles from earlier builds
+    keep = {'manifest.json'} | {f"{filename}{suffix}" for filename in manifest.values() for suffix in ('', '.gz', '.br')}
+    for existing in os.listdir(app.ASSET_DIST_DIR):
+        if existing not in keep:
+            os.remove(os.path.join(app.ASSET_DIST_DIR, existing))
+
+    with open(app.ASSET_MANIFEST_FILE, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"\n   Wrote {os.path.relpath(app.ASSET_MANIFEST_FILE)}")
+
+
+if __name__ == '__main__':
+    main()
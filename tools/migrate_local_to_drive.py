@@ -8,11 +8,30 @@ This tool will:
 3. Migrate all .md files from pages/ to a book folder
 4. Create settings files
 5. Verify migration
+
+Uploads run on a bounded worker pool with rate limiting and retries. A local
+checkpoint manifest records every uploaded file and its MD5, and pages whose
+content already exists in the target book are skipped, so an interrupted
+migration can simply be re-run. A page whose content is already in the
+book under another name is skipped too.
+
+A Drive page with the same name but different content is reported and left
+alone, unless it is this tool's own earlier upload or --overwrite is given.
+
+Usage:
+    python tools/migrate_local_to_drive.py [--book NAME] [--pages-dir pages]
+                                           [--workers 8] [--rate 8] [--overwrite]
 """
 
 import os
 import sys
 import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -21,13 +40,21 @@ from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseUpload
 from io import BytesIO
 
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
-def authenticate():
-    """Authenticate with Google Drive"""
+CHECKPOINT_FILE = '.migration_checkpoint.json'
+CHECKPOINT_FLUSH_EVERY = 50
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Drive answers 403 for rate limits as well as for missing permissions
+RETRY_403_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+MAX_RETRIES = 5
+
+def get_credentials():
+    """Load or obtain OAuth credentials for Google Drive"""
     creds = None
     token_path = 'token.json'
     client_secret = 'client_secret.json'
@@ -51,7 +78,11 @@ def authenticate():
         with open(token_path, 'w') as token:
             token.write(creds.to_json())
 
-    return build('drive', 'v3', credentials=creds)
+    return creds
+
+def authenticate():
+    """Authenticate with Google Drive"""
+    return build('drive', 'v3', credentials=get_credentials())
 
 def get_or_create_folder(service, name, parent_id=None):
     """Get existing folder or create new one"""
@@ -102,40 +133,322 @@ def upload_json(service, filename, data, parent_id):
     content = json.dumps(data, indent=2)
     return upload_file(service, filename, content, parent_id, 'application/json')
 
+def update_file(service, file_id, content, mimetype='text/markdown'):
+    """Replace the content of an existing Drive file"""
+    media = MediaIoBaseUpload(
+        BytesIO(content.encode('utf-8')),
+        mimetype=mimetype,
+        resumable=True
+    )
+    service.files().update(fileId=file_id, media_body=media).execute()
+    return file_id
+
+def find_file(service, filename, parent_id):
+    """Find a file by name in a folder"""
+    query = f"name='{filename}' and '{parent_id}' in parents and trashed=false"
+    results = service.files().list(q=query, spaces='drive', fields='files(id)').execute()
+    files = results.get('files', [])
+    return files[0]['id'] if files else None
+
+def mark_manifest_stale(service, book_folder_id):
+    """Flag the app's page manifest (.book_index.json) for a rebuild from a
+    folder listing. The file stays, since it holds the book's chapter order."""
+    manifest_id = find_file(service, '.book_index.json', book_folder_id)
+    if not manifest_id:
+        return
+    try:
+        manifest = json.loads(service.files().get_media(fileId=manifest_id).execute())
+    except ValueError:
+        # Unreadable already; the app rebuilds it either way
+        return
+    manifest['stale'] = True
+    update_file(service, manifest_id, json.dumps(manifest), 'application/json')
+
+def list_book_pages(service, book_folder_id):
+    """List .md files already in a book folder as {name: file}, following pagination"""
+    query = f"'{book_folder_id}' in parents and name contains '.md' and trashed=false"
+    pages = {}
+    page_token = None
+    while True:
+        results = service.files().list(
+            q=query,
+            spaces='drive',
+            fields='nextPageToken, files(id, name, md5Checksum)',
+            pageSize=1000,
+            pageToken=page_token
+        ).execute()
+        for f in results.get('files', []):
+            pages.setdefault(f['name'], f)
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return pages
+
+def content_md5(content):
+    """MD5 of content as it will be stored in Drive"""
+    return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+# ============================================================================
+# MIGRATION ENGINE
+# ============================================================================
+
+class RateLimiter:
+    """Token bucket limiting Drive requests per second across threads"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class Checkpoint:
+    """Local manifest of files uploaded to each book, safe to update from threads.
+
+    Records are written out every CHECKPOINT_FLUSH_EVERY files and on flush(),
+    so a crash loses at most that many, which the next run skips anyway.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.data = {'books': {}}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+
+    def files(self, book_folder_id):
+        return self.data['books'].get(book_folder_id, {}).get('files', {})
+
+    def record(self, book_folder_id, book_name, filename, md5, file_id):
+        with self.lock:
+            book = self.data['books'].setdefault(book_folder_id, {'name': book_name, 'files': {}})
+            if book['files'].get(filename) == {'md5': md5, 'file_id': file_id}:
+                return
+            book['files'][filename] = {'md5': md5, 'file_id': file_id}
+            self.pending += 1
+            if self.pending >= CHECKPOINT_FLUSH_EVERY:
+                self._write()
+
+    def flush(self):
+        with self.lock:
+            if self.pending:
+                self._write()
+
+    def _write(self):
+        # Write atomically so a crash never leaves a truncated manifest
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self.pending = 0
+
+class Progress:
+    """Thread-safe progress and ETA reporting"""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    def report(self, symbol, message):
+        with self.lock:
+            self.done += 1
+            elapsed = time.monotonic() - self.started
+            rate = self.done / elapsed if elapsed else 0
+            eta = (self.total - self.done) / rate if rate else 0
+            print(f"   {symbol} [{self.done}/{self.total}] {message}  "
+                  f"({rate:.1f} files/s, ETA {format_duration(eta)})")
+
+def format_duration(seconds):
+    """Format seconds as e.g. 1h02m, 3m05s or 12s"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+def is_retryable(error):
+    """Whether a Drive error is a rate limit or server error worth retrying"""
+    if error.resp.status in RETRY_STATUSES:
+        return True
+    if error.resp.status == 403:
+        details = error.error_details if isinstance(error.error_details, list) else []
+        return any(isinstance(detail, dict) and detail.get('reason') in RETRY_403_REASONS
+                   for detail in details)
+    return False
+
+def with_retries(limiter, func, *args):
+    """Run a Drive call under the rate limiter, retrying rate-limit and server errors"""
+    for attempt in range(MAX_RETRIES):
+        limiter.acquire()
+        try:
+            return func(*args)
+        except HttpError as e:
+            if not is_retryable(e) or attempt == MAX_RETRIES - 1:
+                raise
+            # Exponential backoff with jitter
+            time.sleep(min(32, 2 ** attempt) + random.random())
+
+def plan_uploads(local_files, remote_pages, checkpoint_files, overwrite=False):
+    """Decide what to do with each local file.
+
+    Returns (to_skip, to_upload, conflicts). to_upload holds (filename,
+    content, md5, existing_file_id), where existing_file_id is set when the
+    page is to be updated in place. conflicts holds (filename, file_id) for
+    Drive pages of the same name and different content that are left alone.
+    """
+    remote_ids = {f['id'] for f in remote_pages.values()}
+    remote_by_md5 = {}
+    for f in remote_pages.values():
+        if f.get('md5Checksum'):
+            remote_by_md5.setdefault(f['md5Checksum'], f)
+
+    to_skip = []
+    to_upload = []
+    conflicts = []
+    for filename, content in local_files:
+        md5 = content_md5(content)
+        remote = remote_pages.get(filename)
+        uploaded = checkpoint_files.get(filename, {})
+        if remote and remote.get('md5Checksum') == md5:
+            to_skip.append((filename, md5, remote['id']))
+        elif uploaded.get('md5') == md5 and uploaded.get('file_id') in remote_ids:
+            # Uploaded by an earlier run and since renamed in the book
+            to_skip.append((filename, md5, uploaded['file_id']))
+        elif md5 in remote_by_md5:
+            # Same content already in the book under another name
+            to_skip.append((filename, md5, remote_by_md5[md5]['id']))
+        elif remote:
+            # Our own earlier upload, untouched in Drive since, is safe to update
+            ours = uploaded.get('file_id') == remote['id'] and uploaded.get('md5') == remote.get('md5Checksum')
+            if overwrite or ours:
+                to_upload.append((filename, content, md5, remote['id']))
+            else:
+                conflicts.append((filename, remote['id']))
+        else:
+            to_upload.append((filename, content, md5, None))
+    return to_skip, to_upload, conflicts
+
+def migrate_pages(creds, book_name, book_folder_id, local_files, checkpoint, workers=8, rate=8, overwrite=False):
+    """Upload local pages to a book folder concurrently, skipping unchanged ones.
+
+    Returns (uploaded, skipped, failed, conflicts) counts.
+    """
+    service = build('drive', 'v3', credentials=creds)
+    remote_pages = list_book_pages(service, book_folder_id)
+    to_skip, to_upload, conflicts = plan_uploads(
+        local_files, remote_pages, checkpoint.files(book_folder_id), overwrite
+    )
+
+    for filename, md5, file_id in to_skip:
+        checkpoint.record(book_folder_id, book_name, filename, md5, file_id)
+    checkpoint.flush()
+    if to_skip:
+        print(f"   ↷ Skipping {len(to_skip)} files already in Drive")
+    if conflicts:
+        print(f"   ⚠️  Leaving {len(conflicts)} Drive pages with different content alone:")
+        for filename, file_id in conflicts:
+            print(f"      • {filename} ({file_id})")
+
+    if not to_upload:
+        return 0, len(to_skip), 0, len(conflicts)
+
+    # googleapiclient services aren't thread-safe: one per worker thread
+    local = threading.local()
+    limiter = RateLimiter(rate)
+    progress = Progress(len(to_upload))
+
+    def _upload(filename, content, md5, existing_id):
+        if not hasattr(local, 'service'):
+            local.service = build('drive', 'v3', credentials=creds)
+        if existing_id:
+            file_id = with_retries(limiter, update_file, local.service, existing_id, content)
+        else:
+            file_id = with_retries(limiter, upload_file, local.service, filename, content, book_folder_id)
+        checkpoint.record(book_folder_id, book_name, filename, md5, file_id)
+        return 'updated' if existing_id else 'uploaded'
+
+    uploaded = failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_upload, *task): task[0] for task in to_upload}
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    action = future.result()
+                    uploaded += 1
+                    progress.report('✓', f"{filename} ({action})")
+                except Exception as e:
+                    failed += 1
+                    progress.report('❌', f"{filename}: {e}")
+    finally:
+        # Also on Ctrl+C, so a re-run skips what did upload
+        checkpoint.flush()
+
+    return uploaded, len(to_skip), failed, len(conflicts)
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description='Migrate local markdown notes to a JugaadPress book in Google Drive')
+    parser.add_argument('--book', help='book name (prompted if omitted)')
+    parser.add_argument('--pages-dir', default='pages', help='directory of .md files (default: pages)')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent uploads (default: 8)')
+    parser.add_argument('--rate', type=float, default=8, help='max Drive requests per second (default: 8)')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE,
+                        help=f'checkpoint manifest path (default: {CHECKPOINT_FILE})')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='replace Drive pages of the same name that have different content')
+    return parser.parse_args()
+
 def migrate():
     """Main migration function"""
+    args = parse_args()
+
     print("=" * 60)
     print("  JugaadPress - Migrate Local Notes to Google Drive")
     print("=" * 60)
     print()
 
     # Check if pages/ directory exists
-    pages_dir = 'pages'
+    pages_dir = args.pages_dir
     if not os.path.exists(pages_dir):
         print(f"❌ Error: {pages_dir}/ directory not found!")
         sys.exit(1)
 
     # Get list of .md files
-    md_files = [f for f in os.listdir(pages_dir) if f.endswith('.md')]
+    md_files = sorted(f for f in os.listdir(pages_dir) if f.endswith('.md'))
 
     if not md_files:
         print(f"❌ No .md files found in {pages_dir}/")
         sys.exit(1)
 
-    print(f"📄 Found {len(md_files)} markdown files:")
-    for f in sorted(md_files):
-        print(f"   • {f}")
+    print(f"📄 Found {len(md_files)} markdown files")
     print()
 
     # Get book name
-    book_name = input("📚 Enter book name (e.g., 'My Japanese Notes'): ").strip()
+    book_name = (args.book or input("📚 Enter book name (e.g., 'My Japanese Notes'): ")).strip()
     if not book_name:
         print("❌ Book name cannot be empty!")
         sys.exit(1)
 
     print()
     print("🔐 Authenticating with Google Drive...")
-    service = authenticate()
+    creds = get_credentials()
+    service = build('drive', 'v3', credentials=creds)
     print("✓ Authenticated!")
     print()
 
@@ -148,49 +461,71 @@ def migrate():
     print(f"   ✓ /JugaadPress/{book_name}/ ({book_folder_id})")
     print()
 
-    # Create settings files
+    # Create settings files (only if missing, so re-runs don't duplicate them)
     print("⚙️  Creating settings files...")
 
-    # Global settings (if not exists)
-    global_settings = {
-        "sender_email": "",
-        "gmail_app_password": "",
-        "kindle_email": ""
-    }
-    try:
+    if find_file(service, '.user_settings.json', root_folder_id):
+        print("   ℹ️  .user_settings.json already exists")
+    else:
+        global_settings = {
+            "sender_email": "",
+            "gmail_app_password": "",
+            "kindle_email": ""
+        }
         upload_json(service, '.user_settings.json', global_settings, root_folder_id)
         print("   ✓ .user_settings.json")
-    except:
-        print("   ℹ️  .user_settings.json already exists")
 
-    # Book settings
-    book_settings = {
-        "title": book_name,
-        "cover": None
-    }
-    upload_json(service, '.book_settings.json', book_settings, book_folder_id)
-    print("   ✓ .book_settings.json")
+    if find_file(service, '.book_settings.json', book_folder_id):
+        print("   ℹ️  .book_settings.json already exists")
+    else:
+        book_settings = {
+            "title": book_name,
+            "cover": None
+        }
+        upload_json(service, '.book_settings.json', book_settings, book_folder_id)
+        print("   ✓ .book_settings.json")
     print()
 
     # Migrate files
-    print(f"📤 Uploading {len(md_files)} files to Drive...")
-    for filename in sorted(md_files):
-        filepath = os.path.join(pages_dir, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+    local_files = []
+    for filename in md_files:
+        with open(os.path.join(pages_dir, filename), 'r', encoding='utf-8') as f:
+            local_files.append((filename, f.read()))
+
+    print(f"📤 Uploading {len(md_files)} files to Drive "
+          f"({args.workers} workers, {args.rate:g} req/s)...")
+    checkpoint = Checkpoint(args.checkpoint)
+    started = time.monotonic()
+    uploaded, skipped, failed, conflicts = migrate_pages(
+        creds, book_name, book_folder_id, local_files, checkpoint,
+        workers=args.workers, rate=args.rate, overwrite=args.overwrite
+    )
+    elapsed = time.monotonic() - started
 
-        upload_file(service, filename, content, book_folder_id)
-        print(f"   ✓ {filename}")
+    if uploaded:
+        # The app's page manifest no longer matches the folder
+        mark_manifest_stale(service, book_folder_id)
 
     print()
     print("=" * 60)
-    print("✅ Migration Complete!")
+    if failed:
+        print(f"⚠️  Migration finished with {failed} failures - re-run to retry them")
+    else:
+        print("✅ Migration Complete!")
     print("=" * 60)
     print()
     print("📊 Summary:")
     print(f"   • Book: {book_name}")
-    print(f"   • Files migrated: {len(md_files)}")
+    print(f"   • Files uploaded: {uploaded}")
+    print(f"   • Files skipped (already in Drive): {skipped}")
+    if failed:
+        print(f"   • Files failed: {failed}")
+    if conflicts:
+        print(f"   • Files left alone (different content in Drive): {conflicts}")
+        print("     Re-run with --overwrite to replace them")
+    print(f"   • Time: {format_duration(elapsed)}")
     print(f"   • Drive folder: /JugaadPress/{book_name}/")
+    print(f"   • Checkpoint: {args.checkpoint}")
     print()
     print("🎯 Next Steps:")
     print("   1. Run: python app.py")
@@ -201,6 +536,9 @@ def migrate():
     print("   You can safely delete it after verifying migration.")
     print()
 
+    if failed:
+        sys.exit(1)
+
 if __name__ == '__main__':
     try:
         migrate()
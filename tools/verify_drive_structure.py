@@ -3,29 +3,64 @@
 Verify Google Drive folder structure for JugaadPress
 
 Checks:
-- /JugaadPress/ folder exists
+- /JugaadPress/ folder exists (and isn't duplicated)
 - Books are properly structured
-- Settings files are present
-- No orphaned files
+- Settings files are present and valid
+- No duplicate books or pages, stray non-.md files or orphaned pages
+
+Books are scanned concurrently with paginated listings. The scanning engine
+(DriveScanner) is also used by app.py for the /api/health/drive check.
+
+Usage:
+    python tools/verify_drive_structure.py [--json] [--workers 8]
 """
 
 import os
 import sys
 import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload
 from io import BytesIO
 
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+ROOT_FOLDER_NAME = 'JugaadPress'
+
+# Non-page files the app keeps in the root and in each book folder
+ROOT_FILES = {'.user_settings.json'}
+BOOK_FILES = {'.book_settings.json', '.book_index.json', '.book_delivery.json'}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Drive answers 403 for rate limits as well as for missing permissions
+RETRY_403_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+MAX_RETRIES = 4
+
+def is_retryable(error):
+    """Whether a Drive error is a rate limit or server error worth retrying"""
+    if error.resp.status in RETRY_STATUSES:
+        return True
+    if error.resp.status == 403:
+        details = error.error_details if isinstance(error.error_details, list) else []
+        return any(isinstance(detail, dict) and detail.get('reason') in RETRY_403_REASONS
+                   for detail in details)
+    return False
+
 def authenticate():
     """Authenticate with Google Drive"""
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
     creds = None
     if os.path.exists('token.json'):
         creds = Credentials.from_authorized_user_file('token.json', SCOPES)
@@ -39,28 +74,35 @@ def authenticate():
             with open('token.json', 'w') as token:
                 token.write(creds.to_json())
 
-    return build('drive', 'v3', credentials=creds)
-
-def find_folder(service, name, parent_id=None):
-    """Find folder by name"""
-    query = f"name='{name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
+    return build('drive', 'v3', credentials=creds), creds
+
+def list_files(service, query, fields='id, name, mimeType'):
+    """List all files matching a query, following pagination"""
+    files = []
+    page_token = None
+    while True:
+        results = service.files().list(
+            q=query,
+            spaces='drive',
+            fields=f'nextPageToken, files({fields})',
+            pageSize=1000,
+            pageToken=page_token
+        ).execute()
+        files.extend(results.get('files', []))
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return files
+
+def find_folders(service, name, parent_id=None):
+    """Find all folders with a name"""
+    query = f"name='{name}' and mimeType='{FOLDER_MIME}' and trashed=false"
     if parent_id:
         query += f" and '{parent_id}' in parents"
-
-    results = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-    folders = results.get('files', [])
-    return folders[0] if folders else None
+    return list_files(service, query, 'id, name')
 
 def list_files_in_folder(service, folder_id):
     """List all files in a folder"""
-    query = f"'{folder_id}' in parents and trashed=false"
-    results = service.files().list(
-        q=query,
-        spaces='drive',
-        fields='files(id, name, mimeType)',
-        pageSize=1000
-    ).execute()
-    return results.get('files', [])
+    return list_files(service, f"'{folder_id}' in parents and trashed=false", 'id, name, mimeType, size')
 
 def download_json(service, file_id):
     """Download and parse JSON file"""
@@ -75,101 +117,250 @@ def download_json(service, file_id):
 
         content = file_buffer.getvalue().decode('utf-8')
         return json.loads(content)
-    except:
+    except Exception:
         return None
 
-def verify():
-    """Main verification function"""
-    print("=" * 60)
-    print("  JugaadPress - Verify Drive Structure")
-    print("=" * 60)
-    print()
-
-    print("🔐 Authenticating...")
-    service = authenticate()
-    print("✓ Authenticated!")
-    print()
-
-    errors = []
+def find_duplicates(names):
+    """Return names that occur more than once, sorted"""
+    seen = set()
+    duplicates = set()
+    for name in names:
+        if name in seen:
+            duplicates.add(name)
+        seen.add(name)
+    return sorted(duplicates)
+
+def validate_user_settings(settings):
+    """Return (errors, warnings) for parsed .user_settings.json"""
+    if not isinstance(settings, dict):
+        return ['.user_settings.json is corrupted'], []
     warnings = []
-
-    # Check root folder
-    print("📁 Checking /JugaadPress/ folder...")
-    root_folder = find_folder(service, 'JugaadPress')
-
-    if not root_folder:
-        errors.append("❌ /JugaadPress/ folder not found!")
-        print("❌ /JugaadPress/ folder not found!")
+    if not settings.get('kindle_email'):
+        warnings.append('kindle_email not configured')
+    return [], warnings
+
+def validate_book_settings(settings):
+    """Return a list of problems with parsed .book_settings.json"""
+    if not isinstance(settings, dict):
+        return ['.book_settings.json is corrupted']
+    problems = []
+    if not isinstance(settings.get('title'), str) or not settings['title'].strip():
+        problems.append('.book_settings.json has no title')
+    cover = settings.get('cover')
+    if cover is not None and not (isinstance(cover, str) and cover.startswith('data:image')):
+        problems.append('.book_settings.json cover is not an image data URI')
+    return problems
+
+# ============================================================================
+# SCANNER
+# ============================================================================
+
+class DriveScanner:
+    """Concurrent consistency scanner for a user's JugaadPress Drive folder.
+
+    service_factory is called once per worker thread. A plain googleapiclient
+    service isn't thread-safe, so it must return a new one each time unless
+    the service is (like the app's, which sends through an AuthorizedHttpPool).
+    """
+
+    def __init__(self, service_factory, workers=8):
+        self.service_factory = service_factory
+        self.workers = workers
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.drive_calls = 0
+
+    def _service(self):
+        if not hasattr(self._local, 'service'):
+            self._local.service = self.service_factory()
+        return self._local.service
+
+    def _call(self, func, *args):
+        """Run a Drive helper on this thread's service, retrying transient errors"""
+        for attempt in range(MAX_RETRIES):
+            with self._lock:
+                self.drive_calls += 1
+            try:
+                return func(self._service(), *args)
+            except HttpError as e:
+                if not is_retryable(e) or attempt == MAX_RETRIES - 1:
+                    raise
+                time.sleep(min(16, 2 ** attempt) + random.random())
+
+    def scan(self):
+        """Scan the Drive structure and return a JSON-serialisable report"""
+        started = time.monotonic()
+        report = {
+            'ok': False,
+            'root_folder': None,
+            'duplicate_root_folders': [],
+            'user_settings': {'present': False, 'valid': False},
+            'books': [],
+            'duplicate_books': [],
+            'orphans': [],
+            'errors': [],
+            'warnings': [],
+        }
+
+        roots = self._call(find_folders, ROOT_FOLDER_NAME)
+        if not roots:
+            report['errors'].append(f'/{ROOT_FOLDER_NAME}/ folder not found')
+            report['stats'] = self._stats(report, started)
+            return report
+
+        root = roots[0]
+        report['root_folder'] = {'id': root['id'], 'name': root['name']}
+        if len(roots) > 1:
+            report['duplicate_root_folders'] = [r['id'] for r in roots[1:]]
+            report['errors'].append(f'{len(roots)} /{ROOT_FOLDER_NAME}/ folders found; the app only uses one')
+
+        root_files = self._call(list_files_in_folder, root['id'])
+        book_folders = [f for f in root_files
+                        if f['mimeType'] == FOLDER_MIME and not f['name'].startswith('.')]
+
+        for name in find_duplicates(f['name'] for f in book_folders):
+            report['duplicate_books'].append(name)
+            report['errors'].append(f'Duplicate book folders named "{name}"')
+
+        # Files in the root that aren't books or the global settings
+        for f in root_files:
+            if f['mimeType'] != FOLDER_MIME and f['name'] not in ROOT_FILES:
+                report['orphans'].append({'id': f['id'], 'name': f['name'], 'location': 'root'})
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            user_settings_file = [f for f in root_files if f['name'] == '.user_settings.json']
+            user_settings_future = (pool.submit(self._call, download_json, user_settings_file[0]['id'])
+                                    if user_settings_file else None)
+            orphan_pages_future = pool.submit(self._call, list_files,
+                                              "name contains '.md' and trashed=false", 'id, name, parents')
+            book_reports = list(pool.map(self._scan_book, book_folders))
+
+            if len(user_settings_file) > 1:
+                report['errors'].append('Multiple .user_settings.json files in root')
+            if user_settings_future:
+                report['user_settings']['present'] = True
+                errors, warnings = validate_user_settings(user_settings_future.result())
+                report['user_settings']['valid'] = not errors
+                report['errors'].extend(errors)
+                report['warnings'].extend(warnings)
+            else:
+                report['warnings'].append('.user_settings.json not found (will be created on first save)')
+
+            # Pages the app can see whose folder isn't a live book
+            book_ids = {b['id'] for b in book_folders}
+            reported = {o['id'] for o in report['orphans']}
+            for f in orphan_pages_future.result():
+                if f['id'] in reported or not f['name'].endswith('.md'):
+                    continue
+                if not book_ids.intersection(f.get('parents', [])):
+                    report['orphans'].append({'id': f['id'], 'name': f['name'], 'location': 'outside books'})
+
+        report['books'] = book_reports
+        for book in book_reports:
+            report['errors'].extend(f"{book['name']}: {e}" for e in book['errors'])
+            report['warnings'].extend(f"{book['name']}: {w}" for w in book['warnings'])
+
+        if not book_folders:
+            report['warnings'].append('No books found')
+        if report['orphans']:
+            report['warnings'].append(f"{len(report['orphans'])} orphaned files")
+
+        report['ok'] = not report['errors']
+        report['stats'] = self._stats(report, started)
+        return report
+
+    def _scan_book(self, book):
+        """Check one book folder"""
+        files = self._call(list_files_in_folder, book['id'])
+        pages = [f for f in files if f['name'].endswith('.md') and f['mimeType'] != FOLDER_MIME]
+        settings_files = [f for f in files if f['name'] == '.book_settings.json']
+
+        result = {
+            'name': book['name'],
+            'id': book['id'],
+            'pages': len(pages),
+            'bytes': sum(int(f.get('size') or 0) for f in pages),
+            'settings': 'missing',
+            'duplicate_pages': find_duplicates(f['name'] for f in pages),
+            'stray_files': sorted(f['name'] for f in files
+                                  if not f['name'].endswith('.md') and f['name'] not in BOOK_FILES),
+            'errors': [],
+            'warnings': [],
+        }
+
+        if settings_files:
+            problems = validate_book_settings(self._call(download_json, settings_files[0]['id']))
+            result['settings'] = 'invalid' if problems else 'ok'
+            result['errors'].extend(problems)
+            if len(settings_files) > 1:
+                result['errors'].append('Multiple .book_settings.json files')
+        else:
+            result['errors'].append('Missing .book_settings.json')
+
+        for name in result['duplicate_pages']:
+            result['errors'].append(f'Duplicate pages named "{name}"')
+        if result['stray_files']:
+            result['warnings'].append(f"Stray non-markdown files: {', '.join(result['stray_files'])}")
+        if not pages:
+            result['warnings'].append('No markdown files')
+
+        return result
+
+    def _stats(self, report, started):
+        return {
+            'books': len(report['books']),
+            'pages': sum(b['pages'] for b in report['books']),
+            'drive_calls': self.drive_calls,
+            'elapsed_ms': round((time.monotonic() - started) * 1000),
+        }
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def print_report(report):
+    """Print a human-readable report"""
+    root = report['root_folder']
+    if not root:
+        print(f"❌ /{ROOT_FOLDER_NAME}/ folder not found!")
         print()
         print("🔧 Fix: Run migration tool:")
         print("   python tools/migrate_local_to_drive.py")
         return
 
-    print(f"✓ Found: /JugaadPress/ ({root_folder['id']})")
+    print(f"✓ Found: /{ROOT_FOLDER_NAME}/ ({root['id']})")
+    if report['user_settings']['present']:
+        print("✓ .user_settings.json found")
     print()
 
-    # Check global settings
-    print("⚙️  Checking global settings...")
-    root_files = list_files_in_folder(service, root_folder['id'])
-    settings_file = next((f for f in root_files if f['name'] == '.user_settings.json'), None)
-
-    if settings_file:
-        settings = download_json(service, settings_file['id'])
-        if settings:
-            print("✓ .user_settings.json found")
-            if not settings.get('sender_email'):
-                warnings.append("⚠️  sender_email not configured")
-            if not settings.get('kindle_email'):
-                warnings.append("⚠️  kindle_email not configured")
-        else:
-            errors.append("❌ .user_settings.json is corrupted")
-    else:
-        warnings.append("⚠️  .user_settings.json not found (will be created on first save)")
-
+    print("📚 Books:")
+    for book in report['books']:
+        symbol = '❌' if book['errors'] else '✓'
+        print(f"  {symbol} {book['name']}: {book['pages']} pages, settings {book['settings']}")
+    if not report['books']:
+        print("  ⚠️  No books found")
     print()
 
-    # Check books
-    print("📚 Checking books...")
-    book_folders = [f for f in root_files if f['mimeType'] == 'application/vnd.google-apps.folder']
-
-    if not book_folders:
-        warnings.append("⚠️  No books found")
-        print("⚠️  No books found")
-        print()
-    else:
-        for book in book_folders:
-            print(f"\n  📖 {book['name']}:")
-            book_files = list_files_in_folder(service, book['id'])
-
-            # Check book settings
-            book_settings = next((f for f in book_files if f['name'] == '.book_settings.json'), None)
-            if book_settings:
-                print(f"     ✓ .book_settings.json")
-            else:
-                errors.append(f"❌ {book['name']}: Missing .book_settings.json")
-                print(f"     ❌ Missing .book_settings.json")
-
-            # Count pages
-            md_files = [f for f in book_files if f['name'].endswith('.md')]
-            print(f"     ✓ {len(md_files)} pages")
-
-            if len(md_files) == 0:
-                warnings.append(f"⚠️  {book['name']}: No markdown files")
-
+    stats = report['stats']
+    print(f"🔎 Scanned {stats['books']} books / {stats['pages']} pages "
+          f"with {stats['drive_calls']} Drive calls in {stats['elapsed_ms'] / 1000:.1f}s")
     print()
     print("=" * 60)
 
     # Summary
+    errors = report['errors']
+    warnings = report['warnings']
+
     if errors:
         print("❌ ERRORS FOUND:")
         for error in errors:
-            print(f"   {error}")
+            print(f"   ❌ {error}")
         print()
 
     if warnings:
         print("⚠️  WARNINGS:")
         for warning in warnings:
-            print(f"   {warning}")
+            print(f"   ⚠️  {warning}")
         print()
 
     if not errors and not warnings:
@@ -183,8 +374,40 @@ def verify():
     else:
         print("❌ Please fix errors before using the app")
 
-    print("=" * 60)
-    print()
+def verify():
+    """Main verification function"""
+    parser = argparse.ArgumentParser(description='Verify the JugaadPress folder structure in Google Drive')
+    parser.add_argument('--json', action='store_true', help='print a machine-readable JSON report')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent Drive requests (default: 8)')
+    args = parser.parse_args()
+
+    from googleapiclient.discovery import build
+
+    if not args.json:
+        print("=" * 60)
+        print("  JugaadPress - Verify Drive Structure")
+        print("=" * 60)
+        print()
+        print("🔐 Authenticating...")
+
+    _, creds = authenticate()
+
+    if not args.json:
+        print("✓ Authenticated!")
+        print()
+
+    scanner = DriveScanner(lambda: build('drive', 'v3', credentials=creds), workers=args.workers)
+    report = scanner.scan()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+        print("=" * 60)
+        print()
+
+    if not report['ok']:
+        sys.exit(1)
 
 if __name__ == '__main__':
     try: